@@ -0,0 +1,297 @@
+"""
+Benchmark suite for the provider -> encode -> broadcast pipeline.
+
+Stages:
+- sources: TestProvider, a synthetic Assetto Corsa page (anonymous mmap) and
+  synthetic OutGauge datagrams, each driven through the real FrameScheduler,
+  TelemetryData and encoders at the target rate.
+- server: the real WebSocketServer with a growing number of local clients.
+
+Reports tick latency p50/p99/p99.9, jitter against the target rate, CPU and
+allocations per frame and delivered throughput, and saves everything as JSON
+so runs can be compared between releases:
+
+    python bench.py --out bench_results.json
+    python bench.py --fps 360 --clients 1,50,200 --formats json,binary
+"""
+import argparse
+import asyncio
+import json
+import mmap
+import platform
+import socket
+import struct
+import sys
+import threading
+import time
+import tracemalloc
+
+from core import encoding
+from core.scheduler import FrameScheduler
+from core.timing import clock
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    pick = lambda pct: ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100.0))] * 1000.0
+    return {
+        "p50_ms": pick(50),
+        "p99_ms": pick(99),
+        "p99_9_ms": pick(99.9),
+        "max_ms": ordered[-1] * 1000.0,
+        "mean_ms": sum(ordered) / len(ordered) * 1000.0,
+    }
+
+
+# --- Synthetic sources ---
+
+def make_test_source(fps):
+    from providers.test_provider import TestProvider
+    return TestProvider(rate=fps), None
+
+
+def make_ac_source(fps):
+    """AssettoCorsaProvider reading an anonymous mmap that a 'game' updates every tick"""
+    from providers.assetto_corsa import AssettoCorsaProvider, PHYSICS_LAYOUT, STATIC_LAYOUT, GRAPHICS_LAYOUT
+    provider = AssettoCorsaProvider()
+    provider.mm_physics = mmap.mmap(-1, PHYSICS_LAYOUT.size)
+    provider.mm_static = mmap.mmap(-1, STATIC_LAYOUT.size)
+    provider.mm_graphics = mmap.mmap(-1, GRAPHICS_LAYOUT.size)
+    struct.pack_into("<i", provider.mm_static, 412, 8500)
+    physics = struct.Struct("<ifffiiff")
+    state = {"packet": 0}
+
+    def game_step():
+        state["packet"] += 1
+        n = state["packet"]
+        physics.pack_into(provider.mm_physics, 0, n, 0.8, 0.0, 30.0, 4, 5000 + n % 3000, 0.01, 120.0 + n % 50)
+
+    return provider, game_step
+
+
+def make_outgauge_source(fps):
+    """BeamNGProvider fed with OutGauge datagrams over loopback UDP"""
+    from providers.beamng import BeamNGProvider
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    provider = BeamNGProvider(port=port)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    packet = bytearray(96)
+    state = {"n": 0}
+
+    def game_step():
+        state["n"] += 1
+        struct.pack_into("<I4sHBBff", packet, 0, state["n"], b"car", 0, 4, 0, 30.0 + state["n"] % 20, 5000.0)
+        sender.sendto(packet, ("127.0.0.1", port))
+
+    return provider, game_step
+
+
+SOURCES = {
+    "test": make_test_source,
+    "ac_mmap": make_ac_source,
+    "outgauge_udp": make_outgauge_source,
+}
+
+
+def bench_source(name, fps, frames, formats):
+    provider, game_step = SOURCES[name](fps)
+    encoded = {"bytes": 0}
+    seq = [0]
+
+    def publish(telemetry, captured_at):
+        data = telemetry.to_dict()
+        seq[0] += 1
+        for fmt in formats:
+            encoded["bytes"] += len(encoding.encode(fmt, data, seq[0]))
+
+    scheduler = FrameScheduler(provider, publish, fps=fps, mode="fixed")
+    period = 1.0 / fps
+    latency, jitter = [], []
+
+    # Warm up caches / first connection
+    for _ in range(10):
+        if game_step:
+            game_step()
+        scheduler.tick()
+
+    cpu_start = time.process_time()
+    wall_start = clock()
+    next_tick = clock()
+    for _ in range(frames):
+        delay = next_tick - clock()
+        if delay > 0:
+            time.sleep(delay)
+        if game_step:
+            game_step()
+        start = clock()
+        jitter.append(abs(start - next_tick))
+        scheduler.tick()
+        latency.append(clock() - start)
+        next_tick += period
+    wall = clock() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    # Allocations: a separate short pass, tracemalloc slows everything down
+    sample = min(frames, 500)
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    peaks = []
+    for _ in range(sample):
+        if game_step:
+            game_step()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        scheduler.tick()
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    retained = sys.getallocatedblocks() - blocks_before
+
+    return {
+        "source": name,
+        "target_fps": fps,
+        "frames": frames,
+        "achieved_fps": frames / wall,
+        "tick": percentiles(latency),
+        "jitter": percentiles(jitter),
+        "cpu_us_per_frame": cpu / frames * 1e6,
+        "peak_alloc_bytes_per_frame": sum(peaks) / len(peaks),
+        "retained_blocks_per_frame": retained / sample,
+        "encoded_bytes_per_frame": encoded["bytes"] / max(seq[0], 1),
+        "provider": provider.stats(),
+    }
+
+
+# --- Server throughput ---
+
+async def _clients(port, count, fmt, duration, received, ready):
+    import websockets
+    connections = [await websockets.connect(f"ws://127.0.0.1:{port}/?format={fmt}", max_queue=None)
+                   for _ in range(count)]
+    ready.set()
+
+    async def drain(ws, i):
+        try:
+            while True:
+                message = await ws.recv()
+                if isinstance(message, bytes) or not message.startswith('{"type"'):
+                    received[i] += 1
+        except Exception:
+            pass
+
+    tasks = [asyncio.ensure_future(drain(ws, i)) for i, ws in enumerate(connections)]
+    await asyncio.sleep(duration)
+    for ws in connections:
+        await ws.close()
+    for task in tasks:
+        task.cancel()
+
+
+def bench_server(server, port, clients, fps, duration, fmt):
+    from providers.test_provider import TestProvider
+    provider = TestProvider(rate=fps)
+    received = [0] * clients
+    ready = threading.Event()
+    thread = threading.Thread(target=lambda: asyncio.run(_clients(port, clients, fmt, duration + 0.5, received, ready)),
+                              daemon=True)
+    thread.start()
+    ready.wait(30)
+    time.sleep(0.2)
+
+    fanout = server.fanout
+    delivery_before = fanout.delivery_latency.count
+    dropped_before = sum(slot.dropped for slot in fanout.slots)
+    cpu_start = time.process_time()
+    sent = 0
+    period = 1.0 / fps
+    next_tick = start = clock()
+    latency = []
+    while clock() - start < duration:
+        delay = next_tick - clock()
+        if delay > 0:
+            time.sleep(delay)
+        t0 = clock()
+        server.broadcast(provider.get_telemetry().to_dict(), t0)
+        latency.append(clock() - t0)
+        sent += 1
+        next_tick += period
+    cpu = time.process_time() - cpu_start
+    dropped = sum(slot.dropped for slot in fanout.slots) - dropped_before
+    # Only this stage's deliveries; the tracker keeps a window that spans earlier stages
+    new = min(len(fanout.delivery_latency.samples), fanout.delivery_latency.count - delivery_before)
+    samples = list(fanout.delivery_latency.samples)[-new:] if new > 0 else []
+    thread.join()
+
+    delivered = sum(received)
+    return {
+        "clients": clients,
+        "format": fmt,
+        "target_fps": fps,
+        "frames_published": sent,
+        "messages_delivered": delivered,
+        "delivered_per_s": delivered / duration,
+        "delivery_ratio": delivered / (sent * clients) if sent and clients else 0.0,
+        "dropped": dropped,
+        "tick": percentiles(latency),
+        "end_to_end": percentiles(samples),
+        "cpu_us_per_frame": cpu / max(sent, 1) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SimRacing Connector benchmark suite")
+    parser.add_argument("--fps", type=int, default=360, help="Target rate")
+    parser.add_argument("--frames", type=int, default=2000, help="Frames per source benchmark")
+    parser.add_argument("--sources", default=",".join(SOURCES), help="Comma separated sources")
+    parser.add_argument("--formats", default="json,binary", help="Encodings to run per frame")
+    parser.add_argument("--clients", default="1,10,100", help="Client counts for the server benchmark (empty to skip)")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per server stage")
+    parser.add_argument("--out", default="bench_results.json", help="JSON results file")
+    args = parser.parse_args()
+
+    formats = [f for f in args.formats.split(",") if f]
+    results = {
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "sources": [],
+        "server": [],
+    }
+
+    for name in [s for s in args.sources.split(",") if s]:
+        result = bench_source(name, args.fps, args.frames, formats)
+        results["sources"].append(result)
+        print(f"{name:>13}: tick p50 {result['tick']['p50_ms']:.3f}ms p99 {result['tick']['p99_ms']:.3f}ms "
+              f"p99.9 {result['tick']['p99_9_ms']:.3f}ms | jitter p99 {result['jitter']['p99_ms']:.3f}ms | "
+              f"cpu {result['cpu_us_per_frame']:.1f}us/frame | peak alloc {result['peak_alloc_bytes_per_frame']:.0f}B/frame")
+
+    counts = [int(c) for c in args.clients.split(",") if c]
+    if counts:
+        from interfaces.websocket_server import WebSocketServer
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        server = WebSocketServer(port=port)
+        server.start_server()
+        time.sleep(0.5)
+        for fmt in formats:
+            for count in counts:
+                result = bench_server(server, port, count, args.fps, args.duration, fmt)
+                results["server"].append(result)
+                tick, e2e = result["tick"], result["end_to_end"]
+                print(f"{count:>5} clients ({fmt}): {result['delivered_per_s']:.0f} msg/s "
+                      f"({result['delivery_ratio']:.1%} of frames) | tick p50 {tick.get('p50_ms', 0):.3f}ms "
+                      f"p99 {tick.get('p99_ms', 0):.3f}ms p99.9 {tick.get('p99_9_ms', 0):.3f}ms | "
+                      f"e2e p99 {e2e.get('p99_ms', 0):.2f}ms | "
+                      f"dropped {result['dropped']} | cpu {result['cpu_us_per_frame']:.0f}us/frame")
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
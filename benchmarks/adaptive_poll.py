@@ -0,0 +1,90 @@
+"""
+Poll rate benchmark: fixed --fps, --mode event and --fps auto against a
+synthetic source that produces frames at a known rate (AC physics ~333 Hz,
+iRacing 60 Hz...) with some timing jitter.
+
+For each scheduler mode it reports the polls per second and the CPU they
+cost, the duplicate ratio (polls that found no new frame), the source rate
+the scheduler measured, the share of source frames never published, and the
+delay from a frame's arrival to its publication.
+
+Run from the repository root:
+    python -m benchmarks.adaptive_poll
+    python -m benchmarks.adaptive_poll --rate 60 --duration 10
+"""
+import argparse
+import bisect
+import random
+import statistics
+import threading
+import time
+
+from core.scheduler import FrameScheduler
+from core.telemetry import TelemetryData
+from core.timing import clock
+from providers import GameProvider
+
+
+class SyntheticSource(GameProvider):
+    """frame_id counts the frames whose (jittered) arrival time has passed"""
+
+    def __init__(self, rate, jitter, duration):
+        self.game_name = "Synthetic"
+        self.frame = TelemetryData(self.game_name, True)
+        start = clock() + 0.05
+        count = int(rate * (duration + 1))
+        self.arrivals = [start + k / rate + random.uniform(0, jitter) for k in range(count)]
+        self.arrivals.sort()
+
+    def get_telemetry(self):
+        self.frame_id = bisect.bisect_right(self.arrivals, clock())
+        return self.frame
+
+
+def measure(mode, fps, rate, jitter, duration, poll_hz):
+    source = SyntheticSource(rate, jitter, duration)
+    delays, published = [], []
+
+    def publish(telemetry, captured_at):
+        frame_id = source.frame_id
+        if frame_id and (not published or frame_id != published[-1]):
+            published.append(frame_id)
+            delays.append(captured_at - source.arrivals[frame_id - 1])
+
+    scheduler = FrameScheduler(source, publish, fps=fps, mode=mode, poll_hz=poll_hz)
+    timer = threading.Timer(duration, scheduler.stop)
+    cpu = time.process_time()
+    timer.start()
+    scheduler.run()
+    cpu = time.process_time() - cpu
+
+    stats = scheduler.stats()
+    seen = len(set(published))
+    total = published[-1] - published[0] + 1 if published else 0
+    delays.sort()
+    return {
+        "mode": f"{mode} {fps}" if mode == "fixed" else mode,
+        "polls_per_s": round((stats["frames_published"] + stats["frames_duplicate"]) / duration),
+        "cpu_pct": round(100 * cpu / duration, 1),
+        "duplicate_ratio": round(stats["duplicate_ratio"], 3),
+        "source_hz": round(stats["source_hz"], 1) if stats["source_hz"] else None,
+        "missed_pct": round(100 * (1 - seen / total), 1) if total else None,
+        "delay_avg_ms": round(statistics.mean(delays) * 1e3, 2) if delays else None,
+        "delay_p99_ms": round(delays[int(len(delays) * 0.99)] * 1e3, 2) if delays else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fixed, event and auto poll rates against a synthetic source")
+    parser.add_argument("--rate", type=float, default=333.0, help="Source frames per second")
+    parser.add_argument("--jitter", type=float, default=0.0005, help="Arrival jitter (seconds, uniform)")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--poll-hz", type=int, default=1000)
+    args = parser.parse_args()
+
+    for mode, fps in (("fixed", 60), ("fixed", 500), ("event", 60), ("auto", 60)):
+        print(measure(mode, fps, args.rate, args.jitter, args.duration, args.poll_hz))
+
+
+if __name__ == "__main__":
+    main()
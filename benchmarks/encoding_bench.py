@@ -0,0 +1,35 @@
+"""
+Bytes per frame and encode/decode cost of the WebSocket wire formats.
+
+Run from the repository root:
+    python -m benchmarks.encoding_bench
+"""
+import json
+import timeit
+
+from core import encoding
+from providers.test_provider import TestProvider
+
+
+def main(number=50000):
+    telemetry = TestProvider().get_telemetry().to_dict()
+
+    codecs = [
+        ("json", lambda: encoding.encode_json(telemetry), json.loads),
+        ("binary", lambda: encoding.encode_binary(telemetry, 1), encoding.decode_binary),
+    ]
+    if encoding.msgpack is not None:
+        codecs.append(("msgpack", lambda: encoding.encode_msgpack(telemetry), encoding.msgpack.unpackb))
+    else:
+        print("msgpack not installed, skipping")
+
+    print(f"{'format':>8} {'bytes':>6} {'encode ns':>10} {'decode ns':>10}")
+    for name, encode, decode in codecs:
+        payload = encode()
+        enc = min(timeit.repeat(encode, number=number, repeat=5)) / number
+        dec = min(timeit.repeat(lambda: decode(payload), number=number, repeat=5)) / number
+        print(f"{name:>8} {len(payload):>6} {enc * 1e9:>10.0f} {dec * 1e9:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Load test for interfaces.fanout: 500 in-process clients, some slow and some
+stalled, fed at 120 Hz. Compares tick timing of the fan-out engine with the
+old "create a send task per client, then asyncio.wait" broadcast.
+
+The clients are local stand-ins for websockets (an async send()), so the test
+measures the broadcaster itself, not the network stack.
+
+Exits non-zero unless, with the fan-out engine, the median tick stays near the
+target period, healthy clients receive (nearly) every frame and stay within
+the slot depth, and stalled clients drop frames instead.
+
+Run from the repository root:
+    python -m benchmarks.fanout_load
+"""
+import asyncio
+import statistics
+
+from core import encoding
+from core.timing import clock
+from interfaces.fanout import FanOut
+from providers.test_provider import TestProvider
+
+
+class LocalClient:
+    def __init__(self, delay=0.0, stalled=False):
+        self.delay = delay
+        self.stalled = stalled
+        self.received = 0
+
+    async def send(self, message):
+        if self.stalled:
+            await asyncio.Event().wait()  # Dead consumer: never completes
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        else:
+            await asyncio.sleep(0)
+        self.received += 1
+
+
+def make_clients(count):
+    clients = []
+    for i in range(count):
+        if i % 100 == 0:
+            clients.append(LocalClient(stalled=True))
+        elif i % 10 == 0:
+            clients.append(LocalClient(delay=0.05))
+        else:
+            clients.append(LocalClient())
+    return clients
+
+
+async def run_fanout(clients, ticks, rate):
+    fanout = FanOut(depth=1)
+    slots = [fanout.add(client, "json" if i % 2 else "binary") for i, client in enumerate(clients)]
+    pumps = [asyncio.ensure_future(fanout.pump(slot)) for slot in slots]
+
+    async def publish(telemetry, seq):
+        fanout.publish(telemetry, seq, clock())
+
+    intervals = await tick_loop(publish, ticks, rate)
+    await asyncio.sleep(0.01) # Let healthy pumps send the last frame
+    for pump in pumps:
+        pump.cancel()
+    return intervals, fanout.stats(), slots
+
+
+async def run_legacy(clients, ticks, rate):
+    async def publish(telemetry, seq):
+        message = encoding.encode_json(telemetry)
+        tasks = [asyncio.create_task(c.send(message)) for c in clients]
+        # The old loop waited for every send; bound it so stalled clients don't hang the test
+        await asyncio.wait(tasks, timeout=0.1)
+        for task in tasks:
+            task.cancel()
+
+    return await tick_loop(publish, ticks, rate), None
+
+
+async def tick_loop(publish, ticks, rate):
+    provider = TestProvider(rate=rate)
+    period = 1.0 / rate
+    intervals = []
+    next_tick = last = clock()
+    for seq in range(1, ticks + 1):
+        await publish(provider.get_telemetry().to_dict(), seq)
+        now = clock()
+        intervals.append(now - last)
+        last = now
+        next_tick += period
+        await asyncio.sleep(max(0.0, next_tick - clock()))
+    return intervals[1:]
+
+
+def report(name, intervals, rate):
+    ordered = sorted(intervals)
+    p = lambda pct: ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000
+    print(f"{name:>7}: target {1000 / rate:.2f}ms | p50 {p(50):.2f}ms p99 {p(99):.2f}ms "
+          f"max {ordered[-1] * 1000:.2f}ms | jitter (stdev) {statistics.pstdev(intervals) * 1000:.2f}ms")
+    return p(50)
+
+
+def check(clients, slots, p50_ms, ticks, rate, depth=1):
+    """Failures of the fan-out run, empty when it behaved"""
+    failures = []
+    target_ms = 1000 / rate
+    if p50_ms > target_ms * 1.15:
+        failures.append(f"tick p50 {p50_ms:.2f}ms, target {target_ms:.2f}ms")
+    healthy = [(c, s) for c, s in zip(clients, slots) if not c.stalled and not c.delay]
+    stalled = [(c, s) for c, s in zip(clients, slots) if c.stalled]
+    fewest = min(c.received for c, _ in healthy)
+    if fewest < ticks * 0.95:
+        failures.append(f"a healthy client received {fewest} of {ticks} frames")
+    lag = max(s.lag for _, s in healthy)
+    if lag > depth:
+        failures.append(f"a healthy client lags {lag} frames behind (slot depth {depth})")
+    if any(s.dropped < ticks - depth - 1 for _, s in stalled):
+        failures.append("a stalled client did not drop its frames")
+    return failures
+
+
+def main(count=500, ticks=600, rate=120):
+    print(f"{count} clients ({count // 100} stalled, {count // 10 - count // 100} slow), {rate} Hz")
+    intervals, _ = asyncio.run(run_legacy(make_clients(count), ticks, rate))
+    report("legacy", intervals, rate)
+    clients = make_clients(count)
+    intervals, stats, slots = asyncio.run(run_fanout(clients, ticks, rate))
+    p50_ms = report("fanout", intervals, rate)
+    print(f"fanout: dropped {stats['dropped']} frames, max lag {stats['max_lag']}, "
+          f"publish p99 {stats['fanout']['p99_ms']:.2f}ms, delivery p99 {stats['delivery']['p99_ms']:.2f}ms")
+    failures = check(clients, slots, p50_ms, ticks, rate)
+    if failures:
+        raise SystemExit("FAIL: " + "; ".join(failures))
+    print("OK: ticks on target, healthy clients keep up, stalled clients drop frames")
+
+
+if __name__ == "__main__":
+    main()
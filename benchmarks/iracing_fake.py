@@ -0,0 +1,188 @@
+"""
+Offline check and benchmark for providers.iracing.IRacingProvider.
+
+FakeIRSDK reproduces the part of pyirsdk's surface the provider uses
+(is_initialized / is_connected / startup / shutdown, freeze_var_buffer_latest,
+_header.session_info_update, _var_headers_dict, _var_buffer_latest, ir[name]) over an in-memory var
+buffer laid out like iRacing's, so the provider runs on Linux without the sim.
+
+Checks that the bulk (offset) path and the name-lookup fallback produce the
+same frames, that session info is only read when session_info_update changes
+(and read again until it parses), and times a tick on both paths.
+
+Run from the repository root:
+    python -m benchmarks.iracing_fake
+    python -m benchmarks.iracing_fake --ticks 100000
+"""
+import argparse
+import math
+import struct
+import time
+
+from providers.iracing import IRacingProvider, VARS, VAR_TYPES
+
+# Variable -> irsdk VarType (VAR_TYPES index)
+TYPES = {"SessionTick": 2, "IsOnTrack": 1, "Gear": 2, "LapCompleted": 2}
+
+
+class FakeVarHeader:
+    def __init__(self, name, type, offset, count=1):
+        self.name = name
+        self.type = type
+        self.offset = offset
+        self.count = count
+
+
+class FakeVarBuffer:
+    """pyirsdk VarBuffer: get_memory() / buf_offset, frozen as a copy"""
+
+    def __init__(self, memory, offset, length):
+        self.memory = memory
+        self._buf_offset = offset
+        self.length = length
+        self.frozen = None
+
+    def freeze(self):
+        self.frozen = bytes(self.memory[self._buf_offset:self._buf_offset + self.length])
+
+    def get_memory(self):
+        return self.frozen if self.frozen is not None else self.memory
+
+    @property
+    def buf_offset(self):
+        return 0 if self.frozen is not None else self._buf_offset
+
+
+class FakeHeader:
+    """pyirsdk Header: the session info counter lives here, not on IRSDK"""
+
+    def __init__(self):
+        self.session_info_update = 1
+
+
+class FakeIRSDK:
+    def __init__(self, internals=True, skip=()):
+        self.internals = internals
+        self.is_initialized = False
+        self.is_connected = True
+        self._header = FakeHeader()
+        self.session_lookups = 0
+        self.session_ready = True # False: DriverInfo not parsed yet, ir['DriverInfo'] is None
+        self.redline = 7500.0
+
+        # Scatter the variables through the buffer with gaps, like the real one
+        headers = {}
+        offset = 16
+        for name in VARS:
+            if name in skip:
+                continue
+            type = TYPES.get(name, 4)
+            headers[name] = FakeVarHeader(name, type, offset)
+            offset += struct.calcsize(VAR_TYPES[type]) + 4
+        self.headers = headers
+        self.memory = bytearray(64 + offset)
+        self.buffer = FakeVarBuffer(self.memory, 64, offset)
+        self.latest = None
+
+    def startup(self):
+        self.is_initialized = True
+        return True
+
+    def shutdown(self):
+        self.is_initialized = False
+
+    def __getattr__(self, name):
+        # pyirsdk internals, hidden to exercise the name-lookup fallback
+        if name == "_var_headers_dict" and self.internals:
+            return self.headers
+        if name == "_var_buffer_latest" and self.internals:
+            return self.latest
+        raise AttributeError(name)
+
+    def freeze_var_buffer_latest(self):
+        self.buffer.frozen = None
+        self.buffer.freeze()
+        self.latest = self.buffer
+
+    def __getitem__(self, key):
+        header = self.headers.get(key)
+        if header is not None:
+            return struct.unpack_from(VAR_TYPES[header.type], self.buffer.get_memory(),
+                                      self.buffer.buf_offset + header.offset)[0]
+        self.session_lookups += 1
+        if key == "DriverInfo" and self.session_ready:
+            return {"DriverCarSLRedline": self.redline}
+        return None
+
+    def write(self, tick):
+        """Fills the live buffer for one sim tick"""
+        for name, header in self.headers.items():
+            if name == "SessionTick":
+                value = tick
+            elif name == "IsOnTrack":
+                value = True
+            elif header.type == 2:
+                value = tick // 600 % 7
+            else:
+                value = math.sin(tick / 60 + len(name))
+            struct.pack_into(VAR_TYPES[header.type], self.memory, 64 + header.offset, value)
+
+
+def run(ticks, internals, session_every):
+    ir = FakeIRSDK(internals=internals)
+    provider = IRacingProvider(ir=ir)
+    frames = []
+    elapsed = 0.0
+    for tick in range(ticks):
+        if tick and tick % session_every == 0:
+            ir._header.session_info_update += 1
+            ir.redline += 100
+        ir.write(tick)
+        start = time.perf_counter()
+        frame = provider.get_telemetry()
+        elapsed += time.perf_counter() - start
+        if tick < 1000:
+            frames.append(frame.to_tuple())
+    return provider, ir, frames, elapsed / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="iRacing provider check against a fake pyirsdk")
+    parser.add_argument("--ticks", type=int, default=20000)
+    parser.add_argument("--session-every", type=int, default=5000,
+                        help="Ticks between session info updates")
+    args = parser.parse_args()
+
+    bulk, bulk_ir, bulk_frames, bulk_tick = run(args.ticks, True, args.session_every)
+    names, names_ir, name_frames, name_tick = run(args.ticks, False, args.session_every)
+
+    updates = bulk_ir._header.session_info_update
+    print({"path": "bulk", "tick_us": bulk_tick * 1e6, **bulk.stats(), "session_lookups": bulk_ir.session_lookups})
+    print({"path": "names", "tick_us": name_tick * 1e6, **names.stats(), "session_lookups": names_ir.session_lookups})
+    assert bulk_frames == name_frames, "bulk and name-lookup paths disagree"
+    assert bulk.stats()["session_info_reads"] == updates, "session info read more often than it changed"
+    assert bulk.stats()["name_reads"] == 0 and names.stats()["bulk_reads"] == 0
+
+    # A variable the car does not have stays at 0 instead of breaking the bulk read
+    partial = IRacingProvider(ir=FakeIRSDK(skip=("RRshockDefl",)))
+    partial.ir.write(1)
+    assert partial.get_telemetry().suspension_travel[3] == 0
+
+    # Session info not parsed on the first read: picked up once it is, and again after a car change
+    late = IRacingProvider(ir=FakeIRSDK())
+    late.ir.session_ready = False
+    late.ir.write(1)
+    assert late.get_telemetry().max_rpm == 0
+    late.ir.session_ready = True
+    late.ir.write(2)
+    assert late.get_telemetry().max_rpm == 7500.0, "redline not read once the session info parsed"
+    late.ir.redline = 9000.0
+    late.ir._header.session_info_update += 1
+    late.ir.write(3)
+    assert late.get_telemetry().max_rpm == 9000.0, "redline not refreshed after a session info update"
+    print(f"OK: identical frames, {updates} session reads for {updates} session updates, "
+          f"{name_tick / bulk_tick:.1f}x faster per tick")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Sampling jitter and broadcast latency: threaded stations vs --isolate.
+
+Starts main.py with --stations test stations, connects --clients WebSocket
+clients spread over them, lets it run, then reads /stats. For each mode it
+reports how late scheduler ticks start against their deadline (sampling
+jitter, from the scheduler in-process or in the station process) and capture
+to sent latency over all clients (broadcast latency, handoff included when
+isolated).
+
+Run from the repository root:
+    python -m benchmarks.isolation_jitter
+    python -m benchmarks.isolation_jitter --stations 8 --clients 400 --fps 120 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+import websockets
+
+
+async def client(url, stop, received):
+    try:
+        async with websockets.connect(url, max_queue=4) as ws:
+            while not stop.is_set():
+                await ws.recv()
+                received[0] += 1
+    except (OSError, websockets.exceptions.ConnectionClosed):
+        pass
+
+
+async def load(port, names, clients, duration):
+    stop = asyncio.Event()
+    received = [0]
+    tasks = [asyncio.ensure_future(client(f"ws://127.0.0.1:{port}/{names[i % len(names)]}", stop, received))
+             for i in range(clients)]
+    await asyncio.sleep(duration)
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return received[0]
+
+
+def wait_listening(port, timeout=30.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            return json.load(urllib.request.urlopen(f"http://127.0.0.1:{port}/stats", timeout=1))
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError("Connector did not start")
+
+
+def run(args, isolate, port):
+    names = [f"s{i}" for i in range(args.stations)]
+    command = [sys.executable, "main.py", "--port", str(port), "--fps", str(args.fps)]
+    for name in names:
+        command += ["--game", f"{name}=test"]
+    if isolate:
+        command.append("--isolate")
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_listening(port)
+        time.sleep(args.warmup)
+        received = asyncio.run(load(port, names, args.clients, args.duration))
+        stats = json.load(urllib.request.urlopen(f"http://127.0.0.1:{port}/stats", timeout=5))
+    finally:
+        process.terminate()
+        process.wait()
+
+    if isolate:
+        schedulers = {name: stats["isolated"][name]["station"] for name in names}
+    else:
+        schedulers = stats["schedulers"]
+    delivery = [stats["streams"][name]["latency"]["end_to_end"] for name in names]
+    jitter = [schedulers[name]["jitter"] for name in names]
+    return {
+        "mode": "isolated" if isolate else "threaded",
+        "stations": args.stations,
+        "clients": args.clients,
+        "received_per_s": received / args.duration,
+        "jitter_avg_ms": statistics.mean(j["avg_ms"] for j in jitter),
+        "jitter_p99_ms": max(j["p99_ms"] for j in jitter),
+        "broadcast_avg_ms": statistics.mean(d["avg_ms"] for d in delivery),
+        "broadcast_p99_ms": max(d["p99_ms"] for d in delivery),
+        "loop_lag_p99_ms": stats["loop_lag"]["p99_ms"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Threaded vs isolated stations under fan-out load")
+    parser.add_argument("--stations", type=int, default=8)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--port", type=int, default=8795)
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    for isolate in (False, True):
+        print(run(args, isolate, args.port + isolate))
+
+
+if __name__ == "__main__":
+    main()
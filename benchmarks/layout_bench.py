@@ -0,0 +1,66 @@
+"""
+Per-frame read cost of the Assetto Corsa provider: the old read()+slice+unpack
+path against a precompiled Layout of the same seven fields reading straight
+from the mmap. The provider's full PHYSICS_LAYOUT (every schema channel) is
+timed as well, for reference.
+
+Run from the repository root:
+    python -m benchmarks.layout_bench
+"""
+import mmap
+import struct
+import timeit
+
+from core.layout import Layout
+from providers.assetto_corsa import PHYSICS_LAYOUT, STATIC_LAYOUT
+
+# The fields the original provider read, at the provider's offsets: like-for-like with read_legacy
+LEGACY_FIELDS = ("packet_id", "gas", "brake", "gear", "rpm", "steer_angle", "speed_kmh")
+LEGACY_LAYOUT = Layout([field for field in PHYSICS_LAYOUT.fields if field[0] in LEGACY_FIELDS],
+                       size=PHYSICS_LAYOUT.size)
+
+
+def make_pages():
+    physics = mmap.mmap(-1, PHYSICS_LAYOUT.size)
+    physics[0:32] = struct.pack("<ifffiiff", 1234, 0.8, 0.1, 12.5, 4, 6500, 0.02, 187.3)
+    static = mmap.mmap(-1, STATIC_LAYOUT.size)
+    static[412:416] = struct.pack("<i", 8500)
+    return physics, static
+
+
+def read_legacy(physics, static):
+    # Same operations as the original AssettoCorsaProvider.get_telemetry
+    physics.seek(0)
+    data = physics.read(712)
+    packet_id = struct.unpack('i', data[0:4])[0]
+    gas = struct.unpack('f', data[4:8])[0]
+    brake = struct.unpack('f', data[8:12])[0]
+    gear = struct.unpack('i', data[16:20])[0]
+    rpm = struct.unpack('i', data[20:24])[0]
+    steer = struct.unpack('f', data[24:28])[0]
+    speed = struct.unpack('f', data[28:32])[0]
+    static.seek(0)
+    static.read(756)
+    return packet_id, gas, brake, gear, rpm, steer, speed
+
+
+def read_layout(physics, static):
+    # Static page is read once per session, so it is not part of the frame
+    return LEGACY_LAYOUT.unpack(physics)
+
+
+def read_full(physics, static):
+    return PHYSICS_LAYOUT.unpack(physics)
+
+
+def main(number=200000):
+    physics, static = make_pages()
+    assert read_legacy(physics, static) == read_layout(physics, static)
+
+    for name, fn in (("legacy", read_legacy), ("layout", read_layout), ("full", read_full)):
+        seconds = min(timeit.repeat(lambda: fn(physics, static), number=number, repeat=5))
+        print(f"{name:>8}: {seconds / number * 1e9:8.1f} ns/frame")
+
+
+if __name__ == "__main__":
+    main()
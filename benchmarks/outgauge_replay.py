@@ -0,0 +1,141 @@
+"""
+Local UDP replay harness for providers.beamng.BeamNGProvider.
+
+A sender thread plays OutGauge (and OutSim) packets to loopback at a fixed
+rate, 1000 packets per second by default, while a FrameScheduler polls the
+provider in event mode on another thread, as the connector does. Packets are
+either synthetic or taken from a raw BeamNG recording
+(python data_logger.py record --game beamng --raw).
+
+Reports packets sent/received/coalesced, frames published, how often the
+stream read as disconnected while packets were flowing (flicker) and the
+latency from sendto() to the frame being published. Exits non-zero if a
+packet was lost or the stream flickered to disconnected.
+
+Run from the repository root:
+    python -m benchmarks.outgauge_replay
+    python -m benchmarks.outgauge_replay --rate 1000 --outsim --duration 5
+    python -m benchmarks.outgauge_replay --capture beamng_raw.strec
+"""
+import argparse
+import math
+import socket
+import threading
+import time
+
+from core.recorder import SessionReader
+from core.scheduler import FrameScheduler
+from core.timing import clock, LatencyTracker
+from providers.beamng import BeamNGProvider, OUTGAUGE_LAYOUT, OUTSIM_LAYOUT
+
+OUTGAUGE_PORT = 45444
+OUTSIM_PORT = 45123
+
+
+def synthetic_packets(count):
+    for i in range(count):
+        speed = 30 + 10 * math.sin(i / 200)
+        yield OUTGAUGE_LAYOUT.struct.pack(0, b"car", 0, 4, 0, speed, 4000 + i % 3000, 0.0, 90.0, 0.5, 3.0,
+                                          100.0, 0, 0, 0.8, 0.0, 0.0, b"", b"")
+
+
+def captured_packets(path):
+    reader = SessionReader(path)
+    if reader.kind != "raw":
+        raise SystemExit(f"{path} is not a raw recording")
+    packets = [page[:OUTGAUGE_LAYOUT.size] for _, page in reader.rows()]
+    reader.close()
+    return packets
+
+
+def sender(packets, rate, duration, outsim, sent_at, stop):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    period = 1.0 / rate
+    deadline = clock() + duration
+    next_send = clock()
+    i = 0
+    while clock() < deadline and not stop.is_set():
+        delay = next_send - clock()
+        if delay > 0:
+            time.sleep(delay)
+        # The Time field carries the packet number, so the reader can look up when it was sent
+        packet = bytearray(packets[i % len(packets)])
+        packet[0:4] = i.to_bytes(4, "little")
+        sent_at.append(clock())
+        sock.sendto(packet, ("127.0.0.1", OUTGAUGE_PORT))
+        if outsim:
+            sock.sendto(OUTSIM_LAYOUT.struct.pack(i, 0.01, 0.02, 0.3, i / 1000, 0.0, 0.0, 1.0, 2.0, 9.8,
+                                                  0.0, 30.0, 0.0, 0, 0, 0), ("127.0.0.1", OUTSIM_PORT))
+        i += 1
+        next_send += period
+    sock.close()
+
+
+def run(packets, rate, duration, poll_hz, outsim):
+    provider = BeamNGProvider(port=OUTGAUGE_PORT, outsim_port=OUTSIM_PORT if outsim else 0)
+    sent_at = []
+    latency = LatencyTracker(window=100000)
+    state = {"connected_once": False, "flicker": 0}
+
+    def publish(telemetry, captured_at):
+        if not telemetry.connected:
+            if state["connected_once"]:
+                state["flicker"] += 1
+            return
+        state["connected_once"] = True
+        packet = provider.last_packet
+        if packet is not None:
+            number = int.from_bytes(packet[0:4], "little")
+            if number < len(sent_at):
+                latency.add(clock() - sent_at[number])
+
+    scheduler = FrameScheduler(provider, publish, mode="event", poll_hz=poll_hz)
+    poller = threading.Thread(target=scheduler.run, daemon=True)
+    poller.start()
+
+    stop = threading.Event()
+    thread = threading.Thread(target=sender, args=(packets, rate, duration, outsim, sent_at, stop))
+    start = clock()
+    thread.start()
+    thread.join()
+    elapsed = clock() - start
+    time.sleep(0.05) # Let the last packets land
+    scheduler.stop()
+    poller.join()
+
+    stats = provider.stats()
+    provider.close()
+    return {
+        "rate": rate,
+        "achieved_pps": len(sent_at) / elapsed,
+        "sent": len(sent_at),
+        "received": stats["outgauge"]["received"],
+        "lost": len(sent_at) - stats["outgauge"]["received"],
+        "coalesced": stats["outgauge"]["coalesced"],
+        "frames_published": scheduler.frames_published,
+        "flicker": state["flicker"],
+        "latency": latency.summary(),
+        "outsim": stats.get("outsim"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OutGauge/OutSim UDP replay harness")
+    parser.add_argument("--rate", type=int, default=1000, help="Packets per second")
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--poll-hz", type=int, default=2000, help="Scheduler poll rate")
+    parser.add_argument("--outsim", action="store_true", help="Also send OutSim motion packets")
+    parser.add_argument("--capture", help="Raw BeamNG .strec recording to replay instead of synthetic packets")
+    args = parser.parse_args()
+
+    packets = captured_packets(args.capture) if args.capture else list(synthetic_packets(1000))
+    result = run(packets, args.rate, args.duration, args.poll_hz, args.outsim)
+    print(result)
+    if result["lost"] or result["flicker"]:
+        raise SystemExit(f"FAIL: {result['lost']} packets lost, {result['flicker']} disconnected frames "
+                         f"while packets were flowing at {args.rate}/s")
+    print(f"OK: no packet lost, no flicker at {args.rate} packets/s")
+
+
+if __name__ == "__main__":
+    main()
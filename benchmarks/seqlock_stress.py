@@ -0,0 +1,113 @@
+"""
+Concurrent-writer stress run for core.seqlock.SeqlockReader.
+
+A writer thread updates an anonymous mmap field by field (so frames can be
+observed half-written) while the main thread polls it. Every field of frame N
+holds the value N, so a read is torn when the fields disagree.
+
+Writer styles:
+- single: one packet counter written after the payload (Assetto Corsa packetId)
+- dual: Begin/End version counters around the payload (rFactor 2 plugin)
+- none: no counter at all, read in compare mode (rFactor 1 plugin)
+
+period=0 is the worst case, where the writer never pauses between frames: the
+dual counters still reject every torn frame. Without a Begin counter (single,
+none) a writer descheduled mid-frame for longer than core.seqlock.SETTLE
+cannot be told apart from a finished one, so those runs are only reported.
+
+The run fails (non-zero exit) if the seqlock reader accepts a torn frame with
+dual counters at any period, or in single / none style with a paced writer.
+
+Run from the repository root:
+    python -m benchmarks.seqlock_stress
+"""
+import mmap
+import struct
+import sys
+import threading
+import time
+
+from core.layout import Layout
+from core.seqlock import SeqlockReader
+
+FIELDS = 6
+FIELD = struct.Struct("<f")
+COUNTER = struct.Struct("<i")
+
+
+PACED = 0.001 # Writer period of the runs every style must pass, about a game's physics rate
+
+
+def writer(mm, style, field_base, period, stop):
+    frame = 0
+    while not stop.is_set():
+        if period:
+            time.sleep(period)
+        frame += 1
+        if style == "dual":
+            COUNTER.pack_into(mm, 0, frame)      # begin
+        for i in range(FIELDS):
+            FIELD.pack_into(mm, field_base + i * 4, float(frame))
+        if style == "dual":
+            COUNTER.pack_into(mm, 4, frame)      # end
+        elif style == "single":
+            COUNTER.pack_into(mm, 0, frame)      # packetId after the payload
+
+
+def run(style, reader_mode, period, duration):
+    field_base = {"dual": 8, "single": 4, "none": 0}[style]
+    mm = mmap.mmap(-1, 256)
+    layout = Layout([(f"f{i}", field_base + i * 4, "f") for i in range(FIELDS)], size=256)
+
+    if reader_mode == "raw":
+        reader = None
+    elif style == "dual":
+        reader = SeqlockReader(layout, begin=0, end=4)
+    elif style == "single":
+        reader = SeqlockReader(layout, begin=0)
+    else:
+        reader = SeqlockReader(layout)
+
+    stop = threading.Event()
+    thread = threading.Thread(target=writer, args=(mm, style, field_base, period, stop), daemon=True)
+    thread.start()
+
+    polls = accepted = torn_accepted = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        polls += 1
+        values = layout.unpack(mm) if reader is None else reader.read(mm)
+        if values is None:
+            continue
+        accepted += 1
+        if min(values) != max(values):
+            torn_accepted += 1
+
+    stop.set()
+    thread.join()
+    result = {"style": style, "reader": reader_mode, "period": period, "polls": polls,
+              "accepted": accepted, "torn_accepted": torn_accepted}
+    if reader is not None:
+        result.update(reader.stats())
+    return result
+
+
+def main(duration=2.0):
+    # Force frequent GIL hand-offs so the writer is often preempted mid-frame
+    sys.setswitchinterval(1e-6)
+    failures = []
+    for period in (PACED, 0):
+        for style in ("single", "dual", "none"):
+            for reader_mode in ("raw", "seqlock"):
+                result = run(style, reader_mode, period, duration)
+                print(result)
+                checked = reader_mode == "seqlock" and (style == "dual" or period == PACED)
+                if checked and result["torn_accepted"]:
+                    failures.append(f"{style} at period {period}: {result['torn_accepted']} torn frames accepted")
+    if failures:
+        raise SystemExit("FAIL: " + "; ".join(failures))
+    print("OK: no torn frame accepted with dual counters, or with a single counter / compare at a paced rate")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Reader/writer stress run for interfaces.shm (shared-memory output).
+
+A writer process publishes frames as fast as it can (or at --rate) while
+reader processes poll the region in parallel, so reads really do overlap
+writes. Every float field of frame N holds N, so an accepted frame is torn
+when its fields disagree. A small ring (--slots) makes the writer lap the
+readers constantly, the worst case for the per-slot seqlock.
+
+Reports, per reader: frames accepted, torn reads rejected, torn frames
+accepted (must be 0), frames missed, and writer-to-reader latency. Exits non-zero
+if any torn frame was accepted or a reader accepted nothing.
+
+Run from the repository root:
+    python -m benchmarks.shm_stress
+    python -m benchmarks.shm_stress --slots 4 --readers 3 --duration 5
+    python -m benchmarks.shm_stress --rate 360 --mode latest
+"""
+import argparse
+import multiprocessing
+import time
+
+from core.telemetry import TelemetryData
+from core.timing import clock, LatencyTracker
+from interfaces.shm import ShmWriter, ShmReader
+
+FLOAT_FIELDS = ("speed_kmh", "rpm", "throttle", "accel_lat", "lap_time", "wheel_load", "tyre_temp")
+
+
+def writer(name, slots, rate, duration, ready):
+    shm = ShmWriter(name, slots)
+    frame = TelemetryData("stress", True)
+    ready.set()
+    period = 1.0 / rate if rate else 0.0
+    next_write = clock()
+    deadline = clock() + duration
+    while clock() < deadline:
+        value = float((shm.seq + 1) % 16777216) # Exact in float32
+        frame.update(True, speed_kmh=value, rpm=value, throttle=value, accel_lat=value, lap_time=value,
+                     wheel_load=(value,) * 4, tyre_temp=(value,) * 4)
+        shm.write(frame.to_dict())
+        if period:
+            next_write += period
+            delay = next_write - clock()
+            if delay > 0:
+                time.sleep(delay)
+    time.sleep(0.2) # Let the readers finish before the region goes away
+    shm.close()
+
+
+def consistent(frame):
+    expected = float(frame["seq"] % 16777216)
+    for name in FLOAT_FIELDS:
+        value = frame[name]
+        if isinstance(value, tuple):
+            if any(v != expected for v in value):
+                return False
+        elif value != expected:
+            return False
+    return True
+
+
+def reader(name, mode, duration, results):
+    shm = ShmReader(name)
+    latency = LatencyTracker(window=100000)
+    accepted = torn_accepted = polls = 0
+    deadline = clock() + duration
+    while clock() < deadline:
+        polls += 1
+        frames = shm.new() if mode == "ring" else [shm.latest()]
+        now = clock()
+        for frame in frames:
+            if frame is None:
+                continue
+            accepted += 1
+            if not consistent(frame):
+                torn_accepted += 1
+            latency.add(now - frame["captured_at"])
+    result = {"mode": mode, "polls": polls, "accepted": accepted, "torn_accepted": torn_accepted,
+              "latency": latency.summary()}
+    result.update(shm.stats())
+    shm.close()
+    results.put(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared-memory output stress test")
+    parser.add_argument("--name", default="simracing-stress")
+    parser.add_argument("--slots", type=int, default=8, help="Ring size; small rings lap the readers")
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--mode", choices=["ring", "latest"], default="ring",
+                        help="ring: every frame with new(), latest: newest frame with latest()")
+    parser.add_argument("--rate", type=float, default=0, help="Writer frames per second, 0 = flat out")
+    parser.add_argument("--duration", type=float, default=3.0)
+    args = parser.parse_args()
+
+    ready = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    write = multiprocessing.Process(target=writer, args=(args.name, args.slots, args.rate, args.duration + 0.5, ready))
+    write.start()
+    ready.wait()
+    reads = [multiprocessing.Process(target=reader, args=(args.name, args.mode, args.duration, results))
+             for _ in range(args.readers)]
+    for process in reads:
+        process.start()
+    outcomes = []
+    for _ in reads:
+        outcomes.append(results.get())
+        print(outcomes[-1])
+    for process in reads + [write]:
+        process.join()
+
+    torn = sum(result["torn_accepted"] for result in outcomes)
+    if torn or not all(result["accepted"] for result in outcomes):
+        raise SystemExit(f"FAIL: {torn} torn frames accepted, "
+                         f"frames accepted per reader {[result['accepted'] for result in outcomes]}")
+    print(f"OK: {sum(result['accepted'] for result in outcomes)} frames accepted, none torn")
+
+
+if __name__ == "__main__":
+    main()
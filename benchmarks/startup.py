@@ -0,0 +1,102 @@
+"""
+Cold-start benchmark for the connector: import time of main.py, and time from
+process start until the server listens and until a WebSocket client receives
+the first frame.
+
+Every trial runs in a fresh interpreter. "lazy" is main.py as it is (only the
+selected provider is imported, through providers.registry); "eager" imports
+every built-in provider module first, like main.py used to.
+
+Run from the repository root:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --trials 20 --game test
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import websockets
+
+from providers import registry
+
+EAGER = "; ".join(f"import {info.target.partition(':')[0]}" for info in registry.BUILTIN.values())
+
+IMPORT_TIME = "import time; t = time.perf_counter(); {prelude}; import main; print(time.perf_counter() - t)"
+
+RUN_MAIN = "import sys, runpy; {prelude}; sys.argv = ['main.py'] + sys.argv[1:]; runpy.run_path('main.py', run_name='__main__')"
+
+
+def import_time(prelude):
+    output = subprocess.run([sys.executable, "-c", IMPORT_TIME.format(prelude=prelude or "pass")],
+                            capture_output=True, text=True, check=True).stdout
+    return float(output)
+
+
+def wait_listening(port, timeout=10.0):
+    """Polls with bare TCP connects: cheap, so the probe does not steal CPU from the starting connector"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return
+        except OSError:
+            time.sleep(0.001)
+    raise TimeoutError("Connector did not start listening")
+
+
+async def first_frame(port):
+    """Time the first telemetry frame arrives on a new WebSocket connection"""
+    async with websockets.connect(f"ws://127.0.0.1:{port}") as ws:
+        while True:
+            message = json.loads(await ws.recv())
+            if "connected" in message:
+                return time.perf_counter()
+
+
+def time_to_first_frame(prelude, game, port):
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", RUN_MAIN.format(prelude=prelude or "pass"),
+                                "--game", game, "--port", str(port)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_listening(port)
+        listening = time.perf_counter() - start
+        return listening, asyncio.run(first_frame(port)) - start
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summary(values):
+    values = sorted(values)
+    return {"median_ms": statistics.median(values) * 1e3, "min_ms": values[0] * 1e3, "max_ms": values[-1] * 1e3}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Connector import and time-to-first-frame benchmark")
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument("--game", default="test")
+    parser.add_argument("--port", type=int, default=8790)
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "main.py", "--list-games"], stdout=subprocess.DEVNULL, check=True)
+    print({"list_games_ms": (time.perf_counter() - start) * 1e3})
+
+    for label, prelude in (("lazy", ""), ("eager", EAGER)):
+        imports = [import_time(prelude) for _ in range(args.trials)]
+        runs = [time_to_first_frame(prelude, args.game, args.port + i) for i in range(args.trials)]
+        print({"providers": label, "import_main": summary(imports),
+               "listening": summary([listening for listening, _ in runs]),
+               "first_frame": summary([frame for _, frame in runs])})
+
+
+if __name__ == "__main__":
+    main()
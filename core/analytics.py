@@ -0,0 +1,362 @@
+"""
+Lap and session analytics computed from the published frames.
+
+Live (LapAnalytics): one update() per frame on the station's thread, O(1) per
+tick. The current lap and its sectors are running sums. The delta to the best
+lap reads a reference array indexed by lap distance:
+
+    reference[i]   seconds into the lap at lap_distance_pct == i / resolution
+
+The current lap fills its own array as it goes (interpolated between ticks)
+and becomes the reference when it is a new best. A lap ends when
+lap_distance_pct wraps, at the interpolated crossing time. Providers without
+lap distance only get lap times and aggregates, from their lap counter.
+
+Offline (analyze): the same laps, sectors and deltas for a whole normalized
+recording, vectorized with numpy over the unwrapped distance (laps + pct).
+
+Lap summaries:
+
+    {"type": "lap", "game": "...", "lap": 3, "time": 92.415, "valid": true, "best": true,
+     "delta": -0.512, "sectors": [30.2, 31.9, 30.3], "max_speed_kmh": 261.4, "min_speed_kmh": 74.0,
+     "avg_speed_kmh": 162.8, "full_throttle_pct": 61.2, "braking_pct": 14.7,
+     "brake_points": [0.112, 0.367, ...], "brake_point_spread": 0.0021}
+
+"lap" counts the laps completed since the start of the stream or file.
+"delta" is the time against the best lap before this one. "brake_points" are
+the lap positions where the brake went past the threshold (none without lap
+distance), and the spread is how far they landed from the best lap's, on
+average, as a fraction of the lap.
+Only valid laps can become the best. A lap is invalid when it was not driven
+from line to line: it has a gap of more than GAP seconds, or the car moved
+backwards (a reset or a return to the pits).
+"""
+from array import array
+from core.recorder import SessionReader
+
+DELTA_INTERVAL = 0.1 # Live delta messages, at most this often
+GAP = 1.0            # Seconds without a frame that make a lap invalid
+WRAP = -0.5          # lap_distance_pct step that means the car crossed the line
+REWIND = -0.05       # Smaller backward steps are noise, larger ones a reset
+
+
+def _summary(game_name, number, time, valid, best, previous_best, sectors, sampled, max_speed, min_speed,
+             speed_time, throttle_time, brake_time, brake_points, best_brake_points):
+    """The lap summary message, from the aggregates of one lap (shared by live and offline)"""
+    spread = None
+    if brake_points and best_brake_points:
+        spread = sum(min(abs(p - q) for q in best_brake_points) for p in brake_points) / len(brake_points)
+    sampled = sampled or 1.0
+    return {
+        "type": "lap",
+        "game": game_name,
+        "lap": number,
+        "time": round(time, 3),
+        "valid": bool(valid),
+        "best": bool(best),
+        "delta": round(time - previous_best, 3) if previous_best is not None else None,
+        "sectors": [round(s, 3) for s in sectors],
+        "max_speed_kmh": round(max_speed, 1),
+        "min_speed_kmh": round(min_speed, 1),
+        "avg_speed_kmh": round(speed_time / sampled, 1),
+        "full_throttle_pct": round(100.0 * throttle_time / sampled, 1),
+        "braking_pct": round(100.0 * brake_time / sampled, 1),
+        "brake_points": [round(p, 4) for p in brake_points],
+        "brake_point_spread": round(spread, 4) if spread is not None else None,
+    }
+
+
+class LapAnalytics:
+    """
+    Laps, sectors and the live delta to the best lap for one stream.
+
+    update() returns the summary of a lap when a frame completes it. live()
+    returns the current lap's delta message at most every delta_interval:
+
+        {"type": "delta", "game": "...", "lap": 4, "sector": 1, "distance": 0.4172,
+         "time": 38.552, "delta": -0.214, "predicted": 91.903}
+
+    delta and predicted are None until there is a best lap.
+    """
+
+    def __init__(self, game_name="", distance=True, sectors=3, resolution=1000, brake_threshold=0.1,
+                 full_throttle=0.98, delta_interval=DELTA_INTERVAL):
+        if sectors < 1 or resolution < sectors:
+            raise ValueError("sectors must be at least 1 and at most resolution")
+        self.game_name = game_name
+        self.distance = distance # False: laps from the lap counter only, no sectors or delta
+        self.sectors = sectors
+        self.resolution = resolution
+        self.brake_threshold = brake_threshold
+        self.full_throttle = full_throttle
+        self.delta_interval = delta_interval
+
+        self.current = array("d", bytes(8 * (resolution + 1))) # This lap's reference, filled as it goes
+        self.reference = None # The best valid lap's
+        self.best_time = None
+        self.best_brake_points = ()
+        self.laps = 0
+        self.last = None      # Summary of the last completed lap
+        self.prev = None      # (t, distance, speed, throttle, brake, lap) of the previous frame
+        self.next_delta = 0.0
+        self._start(None)
+
+    def _start(self, start):
+        """Starts a lap at clock time `start`; None waits for the next line crossing"""
+        self.start = start
+        self.valid = start is not None
+        self.current[0] = 0.0
+        self.filled = 1 # Next reference bin; bin 0 is the line
+        self.sector = 0
+        self.sector_start = 0.0
+        self.sector_times = []
+        self.sampled = 0.0
+        self.max_speed = 0.0
+        self.min_speed = None
+        self.speed_time = 0.0
+        self.throttle_time = 0.0
+        self.brake_time = 0.0
+        self.brake_points = []
+        self.delta = None
+
+    def _advance(self, e0, d0, e1, d1):
+        """Moves the lap from (e0 s, d0) to (e1 s, d1): reference bins and sector splits, interpolated"""
+        if d1 <= d0:
+            return
+        scale = (e1 - e0) / (d1 - d0)
+        res = self.resolution
+        last = min(int(d1 * res), res)
+        current = self.current
+        for i in range(self.filled, last + 1):
+            current[i] = e0 + (i / res - d0) * scale
+        self.filled = max(self.filled, last + 1)
+        sector = min(int(d1 * self.sectors), self.sectors - 1)
+        while self.sector < sector:
+            self.sector += 1
+            split = e0 + (self.sector / self.sectors - d0) * scale
+            self.sector_times.append(split - self.sector_start)
+            self.sector_start = split
+
+    def _finish(self, end):
+        time = end - self.start
+        self.laps += 1
+        previous_best = self.best_time
+        best = self.valid and (previous_best is None or time < previous_best)
+        sectors = ()
+        if self.distance:
+            sectors = self.sector_times + [time - self.sector_start]
+        summary = _summary(self.game_name, self.laps, time, self.valid, best, previous_best, sectors, self.sampled,
+                           self.max_speed, self.min_speed or 0.0, self.speed_time, self.throttle_time,
+                           self.brake_time, self.brake_points, self.best_brake_points)
+        if best:
+            self.best_time = time
+            self.best_brake_points = tuple(self.brake_points)
+            if self.distance:
+                spare = self.reference or array("d", bytes(8 * (self.resolution + 1)))
+                self.reference, self.current = self.current, spare
+        self.last = summary
+        return summary
+
+    def update(self, frame: dict, now):
+        """Adds a published frame; returns the lap summary when it completed a lap, else None"""
+        if not frame["connected"]:
+            if self.prev is not None:
+                self.prev = None
+                self._start(None) # A lap with the game gone in the middle is not timed
+            return None
+        distance, speed, brake = frame["lap_distance_pct"], frame["speed_kmh"], frame["brake"]
+        prev = self.prev
+        self.prev = (now, distance, speed, frame["throttle"], brake, frame["lap"])
+        if prev is None:
+            return None
+        t0, d0, speed0, throttle0, brake0, lap0 = prev
+        dt = now - t0
+
+        # The previous frame's values hold until this one
+        if self.start is not None:
+            self.sampled += dt
+            self.speed_time += speed0 * dt
+            if throttle0 >= self.full_throttle:
+                self.throttle_time += dt
+            if brake0 >= self.brake_threshold:
+                self.brake_time += dt
+            if speed0 > self.max_speed:
+                self.max_speed = speed0
+            if self.min_speed is None or speed0 < self.min_speed:
+                self.min_speed = speed0
+
+        summary = None
+        if self.distance:
+            step = distance - d0
+            if step < WRAP:
+                cross = t0 + (1.0 - d0) / (distance + 1.0 - d0) * dt
+                if self.start is not None:
+                    self._advance(t0 - self.start, d0, cross - self.start, 1.0)
+                    summary = self._finish(cross)
+                self._start(cross)
+                self._advance(0.0, 0.0, now - cross, distance)
+            elif self.start is not None:
+                if step < REWIND:
+                    self.valid = False
+                self._advance(t0 - self.start, d0, now - self.start, distance)
+        elif frame["lap"] != lap0:
+            if frame["lap"] > lap0 and self.start is not None:
+                summary = self._finish(now)
+            self._start(now if frame["lap"] > lap0 else None) # A lower count is a new session
+
+        if self.start is None:
+            return summary
+        if dt > GAP:
+            self.valid = False
+        if self.distance and brake >= self.brake_threshold and brake0 < self.brake_threshold:
+            self.brake_points.append(distance)
+
+        reference = self.reference
+        if reference is not None and self.distance:
+            x = distance * self.resolution
+            i = min(int(x), self.resolution - 1)
+            self.delta = now - self.start - (reference[i] + (reference[i + 1] - reference[i]) * (x - i))
+        return summary
+
+    def live(self, now):
+        """The current lap's delta message, or None if one went out less than delta_interval ago"""
+        if self.start is None or now < self.next_delta:
+            return None
+        self.next_delta = now + self.delta_interval
+        delta = self.delta
+        return {
+            "type": "delta",
+            "game": self.game_name,
+            "lap": self.laps + 1,
+            "sector": self.sector,
+            "distance": round(self.prev[1], 4),
+            "time": round(now - self.start, 3),
+            "delta": round(delta, 3) if delta is not None else None,
+            "predicted": round(self.best_time + delta, 3) if delta is not None else None,
+        }
+
+    def stats(self):
+        return {
+            "laps": self.laps,
+            "best_time": self.best_time,
+            "lap": self.laps + 1 if self.start is not None else None,
+            "valid": self.valid,
+            "delta": self.delta,
+        }
+
+
+def analyze_columns(t, distance, speed, throttle, brake, lap, game_name="", use_distance=True, sectors=3,
+                    resolution=1000, brake_threshold=0.1, full_throttle=0.98):
+    """
+    analyze() on numpy arrays (one value per frame, time-ordered), so other
+    sources than .strec files can be analyzed too.
+    """
+    import numpy as np
+
+    t = np.asarray(t, dtype=np.float64)
+    distance = np.asarray(distance, dtype=np.float64)
+    speed = np.asarray(speed, dtype=np.float64)
+    throttle = np.asarray(throttle, dtype=np.float64)
+    brake = np.asarray(brake, dtype=np.float64)
+    result = {"laps": [], "reference": None, "deltas": None}
+    if len(t) < 2:
+        return result
+
+    step = np.diff(distance)
+    if use_distance:
+        # Unwrapped distance: laps completed + position, never moving backwards
+        unwrapped = np.maximum.accumulate(distance + np.concatenate(([0], np.cumsum(step < WRAP))))
+        lines = np.arange(np.floor(unwrapped[0]) + 1, np.floor(unwrapped[-1]) + 1)
+        line_times = np.interp(lines, unwrapped, t)
+    else:
+        line_times = t[np.flatnonzero(np.diff(lap) > 0) + 1]
+    count = len(line_times) - 1
+    if count < 1:
+        return result
+    times = np.diff(line_times)
+
+    # Lap of every frame (-1 / count = before the first line / after the last one)
+    frame_lap = np.searchsorted(line_times, t, side="right") - 1
+    inside = (frame_lap >= 0) & (frame_lap < count)
+    laps = frame_lap[inside]
+    weights = np.diff(t, append=t[-1])[inside]
+    sampled = np.bincount(laps, weights, count)
+    speed_time = np.bincount(laps, speed[inside] * weights, count)
+    throttle_time = np.bincount(laps, (throttle[inside] >= full_throttle) * weights, count)
+    brake_time = np.bincount(laps, (brake[inside] >= brake_threshold) * weights, count)
+    max_speed = np.zeros(count)
+    min_speed = np.full(count, np.inf)
+    np.maximum.at(max_speed, laps, speed[inside])
+    np.minimum.at(min_speed, laps, speed[inside])
+    min_speed[np.isinf(min_speed)] = 0.0
+
+    # Checks made when a frame arrives count for the lap that frame is in
+    later = frame_lap[1:]
+    later_inside = (later >= 0) & (later < count)
+    bad = (np.diff(t) > GAP) | ((step >= WRAP) & (step < REWIND) if use_distance else False)
+    valid = np.bincount(later[bad & later_inside], minlength=count)[:count] == 0
+    onsets = np.flatnonzero((brake[1:] >= brake_threshold) & (brake[:-1] < brake_threshold) & later_inside) + 1
+    if not use_distance:
+        onsets = onsets[:0] # Brake points are lap positions
+    onset_laps = frame_lap[onsets]
+
+    sector_times = [()] * count
+    elapsed = None
+    if use_distance:
+        starts = lines[:-1, None]
+        splits = np.interp(starts + np.arange(sectors + 1) / sectors, unwrapped, t)
+        sector_times = np.diff(splits, axis=1)
+        elapsed = np.interp(starts + np.arange(resolution + 1) / resolution, unwrapped, t) - line_times[:-1, None]
+
+    best = None
+    best_brake_points = ()
+    for i in range(count):
+        brake_points = distance[onsets[onset_laps == i]].tolist()
+        previous_best = times[best] if best is not None else None
+        is_best = valid[i] and (best is None or times[i] < times[best])
+        result["laps"].append(_summary(game_name, i + 1, float(times[i]), valid[i], is_best, previous_best,
+                                       sector_times[i], sampled[i], max_speed[i], min_speed[i], speed_time[i],
+                                       throttle_time[i], brake_time[i], brake_points, best_brake_points))
+        if is_best:
+            best = i
+            best_brake_points = brake_points
+    if elapsed is not None and best is not None:
+        result["reference"] = elapsed[best]
+        result["deltas"] = elapsed - elapsed[best]
+    return result
+
+
+def analyze(path, sectors=3, resolution=1000, brake_threshold=0.1, full_throttle=0.98):
+    """
+    Laps of a normalized recording, vectorized over the whole file (needs numpy).
+    Returns {"laps": [summary, ...], "reference": the best lap's reference array,
+    "deltas": (laps, resolution + 1) array of each lap's time minus the best
+    lap's at the same distance}; reference and deltas are None without a valid
+    lap or lap distance. Raises ValueError for raw recordings.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise RuntimeError("Offline lap analysis requires: pip install numpy")
+
+    names = ("t", "lap_distance_pct", "speed_kmh", "throttle", "brake", "lap")
+    parts = {name: [] for name in names}
+    reader = SessionReader(path)
+    try:
+        if reader.kind != "normalized":
+            raise ValueError(f"{path} is a raw recording; lap analysis needs normalized fields")
+        for chunk in range(len(reader.index)):
+            columns = reader.columns_of(chunk)
+            for name in names:
+                parts[name].append(np.asarray(columns[name]).astype(np.float64))
+            del columns # The views point into the mapping, which close() unmaps
+        metadata = reader.metadata
+    finally:
+        reader.close()
+
+    columns = {name: np.concatenate(values) if values else np.zeros(0) for name, values in parts.items()}
+    channels = metadata.get("channels")
+    use_distance = "lap_distance_pct" in channels if channels else bool(columns["lap_distance_pct"].any())
+    return analyze_columns(columns["t"], columns["lap_distance_pct"], columns["speed_kmh"], columns["throttle"],
+                           columns["brake"], columns["lap"], metadata.get("game_name", ""), use_distance,
+                           sectors, resolution, brake_threshold, full_throttle)
@@ -0,0 +1,102 @@
+"""
+Connection lifecycle shared by the game providers.
+
+    disconnected -> probing        first look for the game
+    probing -> probing             not there yet, next look after an exponential backoff
+    probing -> connected           first new frame
+    connected -> stale             no new frame for stale_after (paused, in a menu, alt-tabbed)
+    stale -> connected             frames move again
+    stale -> probing               still nothing after lost_after (if set): the game is gone
+    connected / stale -> probing   read error: the provider closes its handles and probes again
+
+Providers report what they saw (found a frame, nothing new, failed to open, read
+error); Connection decides the state and when to look again. Every transition is
+queued as an event for the scheduler to hand to clients, so a missing game costs
+one probe per backoff step instead of a failed open (and an exception) per tick.
+"""
+from collections import deque
+from core.timing import clock
+
+DISCONNECTED = "disconnected"
+PROBING = "probing"
+CONNECTED = "connected"
+STALE = "stale"
+STATES = (DISCONNECTED, PROBING, CONNECTED, STALE)
+
+
+class Connection:
+    def __init__(self, game_name, backoff_min=0.1, backoff_max=2.0, stale_after=1.0, lost_after=None):
+        self.game_name = game_name
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.stale_after = stale_after
+        self.lost_after = lost_after
+
+        self.state = DISCONNECTED
+        self.since = clock()
+        self.backoff = backoff_min
+        self.next_probe = 0.0 # clock() time of the next attempt while probing
+        self.last_frame = 0.0
+        self.events = deque(maxlen=64) # Transitions not yet handed out (drained by the scheduler)
+
+        self.probes = 0
+        self.connects = 0
+        self.disconnects = 0
+
+    @property
+    def connected(self):
+        """True while the game is attached, stale included"""
+        return self.state == CONNECTED or self.state == STALE
+
+    def due(self, now):
+        """Whether a provider that is not connected should look for the game now"""
+        return now >= self.next_probe
+
+    def _set(self, state, now, reason=None):
+        if state == self.state:
+            return
+        self.events.append({"type": "connection", "game": self.game_name, "state": state,
+                            "previous": self.state, "reason": reason, "after": now - self.since})
+        self.state = state
+        self.since = now
+
+    def missing(self, now, reason=None):
+        """A probe found no game (or no new frame yet): back off before the next one"""
+        self.probes += 1
+        self.next_probe = now + self.backoff
+        self.backoff = min(self.backoff * 2, self.backoff_max)
+        self._set(PROBING, now, reason)
+
+    def frame(self, now, new=True):
+        """A read succeeded; new=False when the game's frame counter did not move"""
+        if new:
+            self.last_frame = now
+            if self.state != CONNECTED:
+                if not self.connected:
+                    self.probes += 1
+                    self.connects += 1
+                self.backoff = self.backoff_min
+                self._set(CONNECTED, now)
+            return
+        idle = now - self.last_frame
+        if self.state == CONNECTED and idle >= self.stale_after:
+            self._set(STALE, now, f"no new frame for {idle:.1f}s")
+        elif self.state == STALE and self.lost_after is not None and idle >= self.lost_after:
+            self.lost(now, f"no new frame for {idle:.1f}s")
+
+    def lost(self, now, reason=None):
+        """The game went away or a read failed: probe again right after the shortest backoff"""
+        self.disconnects += 1
+        self.backoff = self.backoff_min
+        self.next_probe = now + self.backoff
+        self._set(PROBING, now, reason)
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "state_seconds": clock() - self.since,
+            "probes": self.probes,
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "backoff": self.backoff,
+        }
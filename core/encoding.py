@@ -0,0 +1,216 @@
+import json
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Wire formats a client can negotiate (WebSocket subprotocol or ?format=)
+FORMATS = ("json", "binary", "msgpack")
+SUBPROTOCOLS = {
+    "simracing.json": "json",
+    "simracing.binary": "binary",
+    "simracing.msgpack": "msgpack",
+}
+
+# --- Binary frame ---
+# Header (16 bytes, little-endian):
+#   magic    2s  b"ST"
+#   version  B   SCHEMA_VERSION
+#   flags    B   bit0 = connected, bit1 = keyframe (all fields present)
+#   seq      I   frame sequence number
+#   mask     Q   bit i set = WIRE_FIELDS[i] is present in the payload (64 fields max)
+# Payload: the present fields, packed in WIRE_FIELDS order. Array fields
+# (count > 1, e.g. per-wheel FL, FR, RL, RR) are `count` consecutive values.
+MAGIC = b"ST"
+SCHEMA_VERSION = 4
+FLAG_CONNECTED = 0x01
+FLAG_KEYFRAME = 0x02
+
+HEADER = struct.Struct("<2sBBIQ")
+
+# (name, struct code, count). Append only: the position is the mask bit.
+WIRE_FIELDS = (
+    ("speed_kmh", "f", 1),
+    ("rpm", "f", 1),
+    ("max_rpm", "f", 1),
+    ("gear", "b", 1),
+    ("throttle", "f", 1),
+    ("brake", "f", 1),
+    ("clutch", "f", 1),
+    ("steering_angle", "f", 1),
+    # Schema 2: motion
+    ("accel_long", "f", 1),
+    ("accel_lat", "f", 1),
+    ("accel_vert", "f", 1),
+    ("yaw_rate", "f", 1),
+    ("pitch_rate", "f", 1),
+    ("roll_rate", "f", 1),
+    ("heading", "f", 1),
+    ("pitch", "f", 1),
+    ("roll", "f", 1),
+    # Schema 2: per wheel (FL, FR, RL, RR)
+    ("wheel_slip", "f", 4),
+    ("wheel_load", "f", 4),
+    ("suspension_travel", "f", 4),
+    ("tyre_temp", "f", 4),
+    # Schema 2: lap / session
+    ("lap", "h", 1),
+    ("lap_time", "f", 1),
+    ("last_lap_time", "f", 1),
+    ("best_lap_time", "f", 1),
+    ("lap_distance_pct", "f", 1),
+    # Schema 3: dashboard
+    ("fuel", "f", 1),
+    ("engine_temp", "f", 1),
+    ("dash_lights", "I", 1),
+    # Schema 4: derived channels
+    ("speed_accel", "f", 1),
+    ("redline_pct", "f", 1),
+    ("gear_shift", "b", 1),
+)
+WIRE_NAMES = tuple(name for name, _, _ in WIRE_FIELDS)
+WIRE_ARRAYS = {name: count for name, _, count in WIRE_FIELDS if count > 1}
+# One scalar column per value, arrays as name[i] (session recordings, CSV)
+WIRE_COLUMNS = tuple((f"{name}[{i}]" if count > 1 else name, code)
+                     for name, code, count in WIRE_FIELDS for i in range(count))
+WIRE_DEFAULTS = {name: (0,) * count if count > 1 else 0 for name, _, count in WIRE_FIELDS}
+FULL_MASK = (1 << len(WIRE_FIELDS)) - 1
+if len(WIRE_FIELDS) > 64:
+    raise RuntimeError("WIRE_FIELDS outgrew the 64-bit field mask")
+
+_payloads = {}
+
+
+def _payload(mask):
+    """(struct, [(name, index or slice)]) for a field mask, compiled once and cached"""
+    payload = _payloads.get(mask)
+    if payload is None:
+        fmt = "<"
+        positions = []
+        index = 0
+        for i, (name, code, count) in enumerate(WIRE_FIELDS):
+            if mask >> i & 1:
+                fmt += f"{count}{code}" if count > 1 else code
+                positions.append((name, slice(index, index + count) if count > 1 else index))
+                index += count
+        payload = _payloads[mask] = (struct.Struct(fmt), positions)
+    return payload
+
+
+def flattener(getter):
+    """
+    Compiles a function returning every wire value as one flat tuple, arrays
+    spread in place: flattener("t[{!r}]") for dicts, flattener("t.{}") for objects.
+    Generated once, so the cost per frame does not grow with Python-level loops.
+    """
+    parts = []
+    for name, _, count in WIRE_FIELDS:
+        value = getter.format(name)
+        parts.append(f"*{value}" if count > 1 else value)
+    namespace = {}
+    exec(f"def flatten(t):\n    return ({', '.join(parts)},)\n", namespace)
+    return namespace["flatten"]
+
+
+_flatten_dict = flattener("t[{!r}]")
+
+FRAME = struct.Struct(HEADER.format + _payload(FULL_MASK)[0].format[1:])
+
+
+def schema(channels=None):
+    """
+    Describes the binary layout and, given the provider's channels, which
+    fields carry real data (the rest stay at their defaults).
+    Sent to binary/msgpack clients when they connect and on request.
+    """
+    return {
+        "type": "schema",
+        "version": SCHEMA_VERSION,
+        "header": HEADER.format,
+        "fields": [[name, code, count] for name, code, count in WIRE_FIELDS],
+        "channels": list(channels) if channels is not None else list(WIRE_NAMES),
+    }
+
+
+def encode_json(telemetry: dict):
+    return json.dumps(telemetry)
+
+
+def encode_msgpack(telemetry: dict):
+    if msgpack is None:
+        raise RuntimeError("MessagePack support requires: pip install msgpack")
+    return msgpack.packb(telemetry)
+
+
+def wire_values(telemetry: dict):
+    """Every wire value of a frame dict as one flat tuple (WIRE_COLUMNS order)"""
+    try:
+        return _flatten_dict(telemetry)
+    except KeyError:
+        # Partial dict (older recording, hand-built frame): missing fields are 0
+        return _flatten_dict({**WIRE_DEFAULTS, **telemetry})
+
+
+def encode_binary(telemetry: dict, seq):
+    """Full (keyframe) binary frame"""
+    flags = FLAG_KEYFRAME | (FLAG_CONNECTED if telemetry.get("connected") else 0)
+    return FRAME.pack(MAGIC, SCHEMA_VERSION, flags, seq & 0xFFFFFFFF, FULL_MASK, *wire_values(telemetry))
+
+
+def encode_binary_fields(fields: dict, connected, seq, keyframe=False):
+    """Binary frame carrying only the given fields (names outside WIRE_FIELDS are ignored)"""
+    mask = 0
+    values = []
+    for i, name in enumerate(WIRE_NAMES):
+        if name in fields:
+            mask |= 1 << i
+            if name in WIRE_ARRAYS:
+                values.extend(fields[name])
+            else:
+                values.append(fields[name])
+    flags = (FLAG_KEYFRAME if keyframe else 0) | (FLAG_CONNECTED if connected else 0)
+    return HEADER.pack(MAGIC, SCHEMA_VERSION, flags, seq & 0xFFFFFFFF, mask) + \
+        _payload(mask)[0].pack(*values)
+
+
+def decode_binary(data, offset=0):
+    """
+    Decodes a binary frame into a dict with 'seq', 'connected', 'keyframe' and the present fields.
+    data may be any buffer (bytes, mmap...); the frame starts at offset.
+    """
+    magic, version, flags, seq, mask = HEADER.unpack_from(data, offset)
+    if magic != MAGIC:
+        raise ValueError("Not a telemetry frame")
+    if version != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported schema version {version} (expected {SCHEMA_VERSION})")
+
+    payload, positions = _payload(mask)
+    values = payload.unpack_from(data, offset + HEADER.size)
+    result = {name: values[position] for name, position in positions}
+    result["seq"] = seq
+    result["connected"] = bool(flags & FLAG_CONNECTED)
+    result["keyframe"] = bool(flags & FLAG_KEYFRAME)
+    return result
+
+
+def encode(fmt, telemetry: dict, seq):
+    if fmt == "binary":
+        return encode_binary(telemetry, seq)
+    if fmt == "msgpack":
+        return encode_msgpack(telemetry)
+    return encode_json(telemetry)
+
+
+def encode_fields(fmt, fields: dict, connected, seq, keyframe):
+    """Encodes a partial (subscribed / delta) frame"""
+    if fmt == "binary":
+        return encode_binary_fields(fields, connected, seq, keyframe)
+    message = dict(fields)
+    message["connected"] = connected
+    message["seq"] = seq
+    message["keyframe"] = keyframe
+    if fmt == "msgpack":
+        return encode_msgpack(message)
+    return encode_json(message)
@@ -0,0 +1,153 @@
+"""
+Fixed-size columnar history of a stream, for late-joining clients.
+
+One preallocated array per wire column (arrays as name[i], like recordings)
+plus a time column, written in place as a ring. Queries copy the requested
+columns for the last N seconds, optionally reduce them to M points, and
+return them as packed float32 arrays:
+
+    header  <2sBBI  magic b"SH", version, reserved, points
+    t       float32[points]  seconds relative to the newest sample (<= 0)
+    column  float32[points]  one per requested column, in the order of the reply
+"""
+import array
+import struct
+import threading
+from core import encoding
+from core.timing import clock
+
+MAGIC = b"SH"
+VERSION = 1
+HEADER = struct.Struct("<2sBBI")
+
+COLUMNS = ("connected",) + tuple(name for name, _ in encoding.WIRE_COLUMNS)
+REDUCERS = {
+    "mean": lambda values: sum(values) / len(values),
+    "min": min,
+    "max": max,
+    "last": lambda values: values[-1],
+}
+
+
+def _writer():
+    """Compiles write(columns, i, connected, values): one row stored across every column, no loop"""
+    names = [f"c{n}" for n in range(len(COLUMNS))]
+    stores = "".join(f"\n    {name}[i] = values[{n}]" for n, name in enumerate(names[1:]))
+    source = (f"def write(columns, i, connected, values):\n"
+              f"    {', '.join(names)}, = columns\n"
+              f"    c0[i] = connected{stores}\n")
+    namespace = {}
+    exec(source, namespace)
+    return namespace["write"]
+
+
+_write = _writer()
+
+
+def resolve_columns(fields):
+    """Field names ('wheel_load' -> its 4 columns) or column names -> column names. Raises ValueError."""
+    if not fields:
+        return COLUMNS
+    columns = []
+    for name in fields:
+        if name in encoding.WIRE_ARRAYS:
+            columns.extend(f"{name}[{i}]" for i in range(encoding.WIRE_ARRAYS[name]))
+        elif name in COLUMNS:
+            columns.append(name)
+        else:
+            raise ValueError(f"Unknown field: {name}")
+    return tuple(columns)
+
+
+def decode(message: bytes, columns):
+    """Binary history reply -> {"t": [...], column: [...]} (for clients and tests)"""
+    magic, version, _, points = HEADER.unpack_from(message)
+    if magic != MAGIC:
+        raise ValueError("Not a history message")
+    values = array.array("f", message[HEADER.size:])
+    names = ("t",) + tuple(columns)
+    return {name: values[i * points:(i + 1) * points].tolist() for i, name in enumerate(names)}
+
+
+class History:
+    """
+    Ring of the last `capacity` frames of one stream. append() runs on the
+    provider's thread, query() on the server's loop; a lock only covers the
+    in-place write and the copy of the queried range.
+    """
+
+    def __init__(self, capacity=16384):
+        if capacity <= 0:
+            raise ValueError("History capacity must be positive")
+        self.capacity = capacity
+        self.times = array.array("d", bytes(8 * capacity))
+        self.columns = [array.array("f", bytes(4 * capacity)) for _ in COLUMNS]
+        self.count = 0 # Frames ever appended; the next write goes to count % capacity
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, telemetry: dict, t=None):
+        values = encoding.wire_values(telemetry)
+        with self.lock:
+            i = self.count % self.capacity
+            self.times[i] = clock() if t is None else t
+            _write(self.columns, i, 1.0 if telemetry.get("connected") else 0.0, values)
+            self.count += 1
+
+    def _ordered(self, column, start, end):
+        """Logical range [start, end) of the ring (absolute frame numbers) as one array"""
+        a, b = start % self.capacity, end % self.capacity
+        if end > start and b <= a:
+            return column[a:] + column[:b]
+        return column[a:b]
+
+    def query(self, fields=None, seconds=30.0, points=None, reduce="mean"):
+        """
+        The last `seconds` of the given fields, reduced to at most `points`
+        points by index buckets. Returns (columns, points, encoded message).
+        Raises ValueError for unknown fields or reducers.
+        """
+        columns = resolve_columns(fields)
+        if reduce not in REDUCERS:
+            raise ValueError(f"Unknown reduce '{reduce}' (expected one of {', '.join(REDUCERS)})")
+        indexes = [COLUMNS.index(name) for name in columns]
+
+        with self.lock:
+            end = self.count
+            first = end - len(self)
+            if end == first:
+                return columns, 0, HEADER.pack(MAGIC, VERSION, 0, 0)
+            newest = self.times[(end - 1) % self.capacity]
+            # Times only grow: binary search for the first frame inside the window
+            low, high = first, end - 1
+            while low < high:
+                mid = (low + high) // 2
+                if self.times[mid % self.capacity] < newest - seconds:
+                    low = mid + 1
+                else:
+                    high = mid
+            times = self._ordered(self.times, low, end)
+            data = [self._ordered(self.columns[i], low, end) for i in indexes]
+
+        count = len(times)
+        if points and count > points:
+            reducer = REDUCERS[reduce]
+            step = count / points
+            bounds = [(int(j * step), int((j + 1) * step)) for j in range(points)]
+            times = array.array("d", (times[b - 1] for _, b in bounds))
+            data = [array.array("f", (reducer(column[a:b]) for a, b in bounds)) for column in data]
+            count = points
+
+        relative = array.array("f", (t - newest for t in times))
+        parts = [HEADER.pack(MAGIC, VERSION, 0, count), relative.tobytes()]
+        parts.extend(column.tobytes() for column in data)
+        return columns, count, b"".join(parts)
+
+    def stats(self):
+        size = len(self)
+        span = 0.0
+        if size > 1:
+            span = self.times[(self.count - 1) % self.capacity] - self.times[(self.count - size) % self.capacity]
+        return {"frames": size, "capacity": self.capacity, "seconds": span}
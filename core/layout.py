@@ -0,0 +1,76 @@
+import json
+import struct
+
+
+class Layout:
+    """
+    Declarative memory layout: a table of (name, offset, format[, count])
+    compiled once into a single little-endian struct.Struct.
+
+    unpack() reads every field with one unpack_from() call straight from an
+    mmap, bytes or memoryview, so no intermediate copies are made.
+    Gaps between fields become pad bytes. Array fields (count > 1) come back
+    as consecutive values in the flat tuple; use slices[name] to pick them.
+    """
+
+    def __init__(self, fields, size=None):
+        self.fields = sorted((self._normalize(f) for f in fields), key=lambda f: f[1])
+        self.names = tuple(f[0] for f in self.fields)
+        self.slices = {}
+
+        fmt = "<"
+        cursor = 0
+        index = 0
+        for name, offset, code, count in self.fields:
+            if offset < cursor:
+                raise ValueError(f"Field '{name}' at offset {offset} overlaps the previous field")
+            if offset > cursor:
+                fmt += f"{offset - cursor}x"
+            fmt += f"{count}{code}" if count > 1 else code
+            cursor = offset + struct.calcsize("<" + code) * count
+            self.slices[name] = slice(index, index + count) if count > 1 else index
+            index += count
+
+        self.struct = struct.Struct(fmt)
+        self.size = size if size is not None else self.struct.size
+        if self.struct.size > self.size:
+            raise ValueError(f"Layout needs {self.struct.size} bytes but the page is {self.size}")
+
+    @staticmethod
+    def _normalize(field):
+        if len(field) == 3:
+            name, offset, code = field
+            count = 1
+        else:
+            name, offset, code, count = field
+        return (name, int(offset), code, int(count))
+
+    def unpack(self, buffer, offset=0):
+        """Reads all fields from buffer (mmap, bytes, memoryview) as a flat tuple"""
+        return self.struct.unpack_from(buffer, offset)
+
+    def read(self, buffer, offset=0):
+        """Reads all fields into a dict (arrays become tuples). Slower than unpack()."""
+        values = self.struct.unpack_from(buffer, offset)
+        return {name: (tuple(values[s]) if isinstance(s, slice) else values[s])
+                for name, s in self.slices.items()}
+
+    def to_json(self):
+        return {
+            "size": self.size,
+            "fields": [[name, offset, code, count] for name, offset, code, count in self.fields],
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["fields"], size=data.get("size"))
+
+    @classmethod
+    def load(cls, path):
+        """Loads a layout file (e.g. written by rfactor_inspect.py)"""
+        with open(path) as f:
+            return cls.from_json(json.load(f))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_json(), f, indent=2)
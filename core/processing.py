@@ -0,0 +1,340 @@
+"""
+Server-side signal processing, between the provider and every consumer.
+
+Runs once per tick on the station's thread, so filtered and derived channels
+are computed once and shared by the WebSocket clients, sinks and recorder.
+Every step is O(1) per tick: filters keep a couple of floats of state and
+the derivative reads a preallocated ring buffer.
+"""
+import math
+from core.telemetry import DEFAULTS, ARRAYS
+from core.timing import clock, LatencyTracker
+
+GRAVITY = 9.80665
+
+# Channels computed here, and the provider channels each one needs
+DERIVED = {
+    "speed_accel": ("speed_kmh",),
+    "redline_pct": ("rpm", "max_rpm"),
+    "gear_shift": ("gear",),
+}
+
+# Float channels that may be filtered, interpolated or averaged. Angles that
+# wrap, lap progress and lap times jump between values and are left alone.
+_STEPPED = ("heading", "last_lap_time", "best_lap_time", "lap_distance_pct", "gear_shift")
+CONTINUOUS = tuple(name for name, default in DEFAULTS.items()
+                   if (isinstance(default, float) or name in ARRAYS) and name not in _STEPPED)
+
+
+def derived_channels(channels):
+    """Derived channels available for a provider's channel list"""
+    return tuple(name for name, needs in DERIVED.items() if all(need in channels for need in needs))
+
+
+def _alpha(dt, cutoff):
+    tau = 1.0 / (2.0 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class Ring:
+    """Fixed number of (time, value) samples, allocated once"""
+
+    def __init__(self, size):
+        self.size = size
+        self.times = [0.0] * size
+        self.values = [0.0] * size
+        self.count = 0
+
+    def push(self, t, value):
+        i = self.count % self.size
+        self.times[i] = t
+        self.values[i] = value
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def __getitem__(self, n):
+        """n-th sample from the oldest one kept (0 = oldest)"""
+        i = (self.count - len(self) + n) % self.size
+        return self.times[i], self.values[i]
+
+    def clear(self):
+        self.count = 0
+
+
+class LowPass:
+    """First-order low-pass filter with a cutoff in Hz, correct for any tick spacing"""
+
+    def __init__(self, cutoff=5.0):
+        if cutoff <= 0:
+            raise ValueError("cutoff must be positive")
+        self.cutoff = cutoff
+        self.reset()
+
+    def reset(self):
+        self.value = None
+        self.last_time = None
+
+    def __call__(self, x, t):
+        if self.value is None:
+            self.value, self.last_time = x, t
+            return x
+        dt = t - self.last_time
+        if dt > 0:
+            self.value += _alpha(dt, self.cutoff) * (x - self.value)
+            self.last_time = t
+        return self.value
+
+
+class OneEuro:
+    """
+    1€ filter (Casiez et al.): heavy smoothing when the signal is still, little
+    lag when it moves fast. min_cutoff sets the jitter at rest, beta the speed
+    response.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.0, d_cutoff=1.0):
+        if min_cutoff <= 0 or d_cutoff <= 0 or beta < 0:
+            raise ValueError("min_cutoff and d_cutoff must be positive, beta >= 0")
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self.value = None
+        self.derivative = 0.0
+        self.last_time = None
+
+    def __call__(self, x, t):
+        if self.value is None:
+            self.value, self.last_time = x, t
+            return x
+        dt = t - self.last_time
+        if dt <= 0:
+            return self.value
+        self.derivative += _alpha(dt, self.d_cutoff) * ((x - self.value) / dt - self.derivative)
+        cutoff = self.min_cutoff + self.beta * abs(self.derivative)
+        self.value += _alpha(dt, cutoff) * (x - self.value)
+        self.last_time = t
+        return self.value
+
+
+class ArrayFilter:
+    """One filter per element of a per-wheel array"""
+
+    def __init__(self, factory, count):
+        self.filters = [factory() for _ in range(count)]
+
+    def reset(self):
+        for f in self.filters:
+            f.reset()
+
+    def __call__(self, values, t):
+        return tuple(f(x, t) for f, x in zip(self.filters, values))
+
+
+FILTERS = {"lowpass": LowPass, "one_euro": OneEuro}
+
+
+def parse_filter(spec):
+    """
+    'field=kind[:option=value,...]' -> (field, filter), e.g.
+    'speed_kmh=lowpass:cutoff=5' or 'accel_lat=one_euro:min_cutoff=1,beta=0.05'.
+    Raises ValueError for a bad spec.
+    """
+    field, sep, rest = spec.partition("=")
+    if not sep:
+        raise ValueError(f"Expected field=filter, got '{spec}'")
+    if field not in CONTINUOUS:
+        raise ValueError(f"'{field}' can't be filtered (expected one of {', '.join(CONTINUOUS)})")
+    kind, _, rest = rest.partition(":")
+    if kind not in FILTERS:
+        raise ValueError(f"Unknown filter '{kind}' (expected one of {', '.join(FILTERS)})")
+    params = {}
+    for item in filter(None, rest.split(",")):
+        key, _, value = item.partition("=")
+        params[key] = float(value)
+    try:
+        factory = lambda: FILTERS[kind](**params)
+        factory() # Validate the parameters now
+    except TypeError as e:
+        raise ValueError(f"Invalid filter '{spec}': {e}")
+    if field in ARRAYS:
+        return field, ArrayFilter(factory, len(DEFAULTS[field]))
+    return field, factory()
+
+
+class Processor:
+    """
+    Filters and derived channels for one station, applied to each published
+    frame dict in place.
+
+    new_frame is False when the scheduler re-publishes a frame the game has
+    not updated yet (fixed mode faster than the game). Those ticks repeat the
+    last processed values or, with upsample, interpolate between the last two
+    game frames. Interpolation delays the output by one game frame.
+    """
+
+    def __init__(self, filters=None, upsample=False, accel_window=0.1, shift_hold=0.1, ring_size=256):
+        self.filters = dict(filters or {})
+        self.upsample = upsample
+        self.accel_window = accel_window
+        self.shift_hold = shift_hold
+
+        self.speed = Ring(ring_size) # (time, m/s) for speed_accel
+        self.tail = 0                # oldest sample inside accel_window, as an absolute count
+        self.last_gear = None
+        self.shift = 0
+        self.shift_until = 0.0
+
+        self.output = {}             # processed values of the last game frame
+        self.previous = None         # (time, values) of the frame before, for upsampling
+        self.current = None
+        self.latency = LatencyTracker()
+
+    def reset(self):
+        for f in self.filters.values():
+            f.reset()
+        self.speed.clear()
+        self.tail = 0
+        self.last_gear = None
+        self.shift = 0
+        self.output = {}
+        self.previous = self.current = None
+
+    def _derive(self, frame, now):
+        rpm, max_rpm = frame["rpm"], frame["max_rpm"]
+        frame["redline_pct"] = min(1.0, max(0.0, rpm / max_rpm)) if max_rpm > 0 else 0.0
+
+        speed = self.speed
+        speed.push(now, frame["speed_kmh"] / 3.6)
+        # Move the tail up to the oldest sample still inside the window: amortized O(1)
+        first = speed.count - len(speed)
+        self.tail = max(self.tail, first)
+        while self.tail < speed.count - 1 and speed.times[(self.tail + 1) % speed.size] <= now - self.accel_window:
+            self.tail += 1
+        t0, v0 = speed.times[self.tail % speed.size], speed.values[self.tail % speed.size]
+        frame["speed_accel"] = (speed.values[(speed.count - 1) % speed.size] - v0) / (now - t0) / GRAVITY \
+            if now > t0 else 0.0
+
+        gear = frame["gear"]
+        if self.last_gear is not None and gear != self.last_gear:
+            self.shift = 1 if gear > self.last_gear else -1
+            self.shift_until = now + self.shift_hold
+        self.last_gear = gear
+        if self.shift and now >= self.shift_until:
+            self.shift = 0
+        frame["gear_shift"] = self.shift
+
+    def process(self, frame: dict, now, new_frame=True):
+        """Processes a frame dict in place and returns it"""
+        start = clock()
+        if not frame["connected"]:
+            if self.output:
+                self.reset()
+            return frame
+
+        if new_frame:
+            self._derive(frame, now)
+            for name, f in self.filters.items():
+                frame[name] = f(frame[name], now)
+            self.output = {name: frame[name] for name in self.filters}
+            self.output.update(speed_accel=frame["speed_accel"], redline_pct=frame["redline_pct"])
+            if self.upsample:
+                self.previous = self.current
+                self.current = (now, {name: frame[name] for name in CONTINUOUS})
+                if self.previous is not None:
+                    frame.update(self.previous[1])
+        else:
+            frame.update(self.output)
+            if self.shift and now >= self.shift_until:
+                self.shift = 0
+            frame["gear_shift"] = self.shift
+            if self.upsample and self.previous is not None:
+                self._interpolate(frame, now)
+
+        self.latency.add(clock() - start)
+        return frame
+
+    def _interpolate(self, frame, now):
+        t0, before = self.previous
+        t1, after = self.current
+        x = min(1.0, (now - t1) / (t1 - t0)) if t1 > t0 else 1.0
+        for name, a in before.items():
+            b = after[name]
+            if isinstance(a, tuple):
+                frame[name] = tuple(p + (q - p) * x for p, q in zip(a, b))
+            else:
+                frame[name] = a + (b - a) * x
+
+    def stats(self):
+        return {"filters": list(self.filters), "upsample": self.upsample, "latency": self.latency.summary()}
+
+
+class Decimator:
+    """
+    Downsamples a stream to `rate` Hz by averaging every frame of each 1/rate
+    window (instead of picking whichever frame happens to be last). One
+    decimator serves every client subscribed at that rate.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.interval = 1.0 / rate
+        self.window_end = None
+        self.sums = {}
+        self.count = 0
+        self.connected = None
+        self.output = None
+        self.seq = 0 # Bumped for every new output frame
+
+    def _emit(self, frame, now):
+        output = dict(frame)
+        if self.count > 1:
+            n = self.count
+            for name, total in self.sums.items():
+                output[name] = tuple(v / n for v in total) if isinstance(total, list) else total / n
+        self.output = output
+        self.seq += 1
+        self.sums = {}
+        self.count = 0
+        self.window_end = (self.window_end or now) + self.interval
+        if self.window_end <= now:
+            self.window_end = now + self.interval
+
+    def add(self, frame: dict, now):
+        """Adds a frame; returns True when a window closed and output was updated"""
+        connected = frame.get("connected")
+        if connected != self.connected:
+            # Connection changes go out at once, without averaging across them
+            self.connected = connected
+            self.sums, self.count = {}, 0
+            self._emit(frame, now)
+            return True
+        if not connected:
+            if now >= self.window_end:
+                self._emit(frame, now)
+                return True
+            return False
+
+        sums = self.sums
+        for name in CONTINUOUS:
+            value = frame.get(name)
+            if value is None:
+                continue
+            total = sums.get(name)
+            if total is None:
+                sums[name] = list(value) if isinstance(value, tuple) else value
+            elif isinstance(value, tuple):
+                for i, v in enumerate(value):
+                    total[i] += v
+            else:
+                sums[name] = total + value
+        self.count += 1
+
+        if now >= self.window_end:
+            self._emit(frame, now)
+            return True
+        return False
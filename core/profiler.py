@@ -0,0 +1,60 @@
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for the running connector: a helper thread looks at
+    every other thread's Python stack every `interval` seconds. Nothing is
+    instrumented, so it costs nothing until a profile is requested, and only
+    the sampling thread's own GIL time while one is being taken.
+    """
+
+    def __init__(self, interval=0.001, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.lock = threading.Lock() # One profile at a time
+
+    def sample(self, seconds):
+        """Samples for `seconds`; returns Counter of (thread name, frames root first)"""
+        with self.lock:
+            counts = Counter()
+            me = threading.get_ident()
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    stack = []
+                    while frame is not None and len(stack) < self.max_depth:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                        frame = frame.f_back
+                    stack.reverse()
+                    counts[(names.get(ident, str(ident)), tuple(stack))] += 1
+                time.sleep(self.interval)
+            return counts
+
+
+def collapsed(counts):
+    """Folded stacks, one 'thread;frame;frame count' line each (flamegraph.pl / speedscope input)"""
+    lines = [f"{thread};{';'.join(stack)} {count}" for (thread, stack), count in counts.most_common()]
+    return "\n".join(lines) + "\n"
+
+
+def top(counts, limit=30):
+    """Functions by samples spent in them (self) and under them (total)"""
+    own, total = Counter(), Counter()
+    samples = sum(counts.values()) or 1
+    for (_, stack), count in counts.items():
+        if stack:
+            own[stack[-1]] += count
+        for frame in set(stack):
+            total[frame] += count
+    lines = [f"{'self%':>7} {'total%':>7}  function ({samples} samples)"]
+    for frame, count in own.most_common(limit):
+        lines.append(f"{100.0 * count / samples:7.2f} {100.0 * total[frame] / samples:7.2f}  {frame}")
+    return "\n".join(lines) + "\n"
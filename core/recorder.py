@@ -0,0 +1,408 @@
+"""
+Session recording format (.strec) with a background writer and a reader.
+
+File layout (little-endian):
+    header   b"STREC" | version (B) | JSON length (I) | JSON metadata
+    chunk*   b"CHNK" | records (I) | t_first (d) | t_last (d) | raw length (I) | stored length (I) | payload
+    index    b"INDX" | count (I) | count x (offset (Q), records (I), t_first (d), t_last (d))
+    footer   index offset (Q) | b"SEND"
+
+A chunk payload is columnar: every column's values are stored contiguously
+(the "t" column first), optionally compressed as a whole. Two kinds of
+recording exist:
+- "normalized": the TelemetryData wire fields, one column per value
+  (see core.encoding.WIRE_COLUMNS; per-wheel arrays become name[0..3])
+- "raw": fixed-size snapshots of a provider's shared-memory page / datagram
+
+A file without an index (the recorder was killed) is still readable: the
+reader scans the chunks sequentially instead.
+"""
+import array
+import json
+import mmap
+import queue
+import struct
+import threading
+import time
+import zlib
+
+from core import encoding
+
+MAGIC = b"STREC"
+VERSION = 1
+FILE_HEADER = struct.Struct("<5sBI")
+CHUNK_HEADER = struct.Struct("<4sIddII")
+CHUNK_MAGIC = b"CHNK"
+INDEX_HEADER = struct.Struct("<4sI")
+INDEX_MAGIC = b"INDX"
+INDEX_ENTRY = struct.Struct("<QIdd")
+FOOTER = struct.Struct("<Q4s")
+FOOTER_MAGIC = b"SEND"
+
+NORMALIZED_COLUMNS = (("t", "d"), ("connected", "B")) + encoding.WIRE_COLUMNS
+
+CODECS = ("none", "zlib", "zstd", "lz4")
+
+
+def _codec(name):
+    """Returns (compress, decompress(data, raw_length)) for a codec name"""
+    if name == "none":
+        return (lambda data: data), (lambda data, size: data)
+    if name == "zlib":
+        return (lambda data: zlib.compress(data, 1)), (lambda data, size: zlib.decompress(data))
+    if name == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd compression requires: pip install zstandard")
+        compressor = zstandard.ZstdCompressor(level=3)
+        decompressor = zstandard.ZstdDecompressor()
+        return compressor.compress, (lambda data, size: decompressor.decompress(data, max_output_size=size))
+    if name == "lz4":
+        try:
+            import lz4.frame
+        except ImportError:
+            raise RuntimeError("lz4 compression requires: pip install lz4")
+        return lz4.frame.compress, (lambda data, size: lz4.frame.decompress(data))
+    raise ValueError(f"Unknown codec: {name} (expected one of {', '.join(CODECS)})")
+
+
+class SessionRecorder:
+    """
+    Appends records to a .strec file from a background thread.
+
+    record() / record_page() only put the sample on a bounded queue, so the
+    publish loop never waits for the disk. If the writer falls behind, samples
+    are dropped and counted instead of blocking. A sample the file can't hold
+    (a value outside its column's type) is skipped and counted as an error; an
+    error writing the file stops the writer, and both show up in stats().
+    """
+
+    def __init__(self, path, kind="normalized", page_size=0, codec="none",
+                 chunk_records=1024, game_name="", queue_size=8192, channels=None):
+        if kind not in ("normalized", "raw"):
+            raise ValueError(f"Unknown recording kind: {kind}")
+        if kind == "raw" and page_size <= 0:
+            raise ValueError("Raw recordings need a page_size")
+
+        self.path = path
+        self.kind = kind
+        self.page_size = page_size
+        self.codec = codec
+        self.compress, _ = _codec(codec)
+        self.chunk_records = chunk_records
+        self.game_name = game_name
+        self.channels = list(channels) if channels is not None else None
+
+        if kind == "normalized":
+            self.columns = NORMALIZED_COLUMNS
+            self.names = tuple(name for name, _ in self.columns[1:])
+            self.casts = tuple(float if code in "fd" else int for _, code in self.columns[1:])
+        else:
+            self.columns = (("t", "d"), ("page", f"{page_size}s"))
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.file = None
+        self.index = []
+        self.started = None
+
+        self.recorded = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+        self.failed = False # The writer stopped on an error; later samples are dropped
+        self.bytes_written = 0
+
+    def start(self):
+        self.file = open(self.path, "wb")
+        self.started = time.perf_counter()
+        metadata = {
+            "kind": self.kind,
+            "columns": [list(c) for c in self.columns],
+            "page_size": self.page_size,
+            "codec": self.codec,
+            "game_name": self.game_name,
+            "channels": self.channels,
+            "schema_version": encoding.SCHEMA_VERSION,
+            "started_at": time.time(),
+        }
+        blob = json.dumps(metadata).encode()
+        self._write(FILE_HEADER.pack(MAGIC, VERSION, len(blob)) + blob)
+        self._reset_buffers()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def _reset_buffers(self):
+        self.times = array.array("d")
+        if self.kind == "normalized":
+            self.buffers = [array.array(code) for _, code in self.columns[1:]]
+        else:
+            self.pages = bytearray()
+
+    def _offer(self, item):
+        if self.failed:
+            self.dropped += 1
+            return
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def record(self, telemetry: dict, t=None):
+        """Queues a normalized frame (TelemetryData.to_dict())"""
+        if t is None:
+            t = time.perf_counter()
+        self._offer((t - self.started, (telemetry.get("connected", False),) + encoding.wire_values(telemetry)))
+
+    def record_page(self, page, t=None):
+        """Queues a raw page snapshot (bytes)"""
+        if t is None:
+            t = time.perf_counter()
+        self._offer((t - self.started, page))
+
+    def close(self, timeout=10.0):
+        if self.thread is None:
+            return
+        if self.thread.is_alive():
+            try:
+                self.queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass # Writer stuck on the disk; it is a daemon thread
+            self.thread.join(timeout)
+        self.thread = None
+
+    # --- Writer thread ---
+
+    def _run(self):
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    break
+                try:
+                    self._append(*item)
+                except (OverflowError, ValueError, TypeError) as e:
+                    self._error(e) # e.g. a gear or lap number outside its column's type
+                    continue
+                if len(self.times) >= self.chunk_records:
+                    self._flush()
+            self._flush()
+            self._write_index()
+        except Exception as e:
+            self.failed = True
+            self._error(e)
+        finally:
+            self.file.close()
+
+    def _error(self, e):
+        self.errors += 1
+        self.last_error = f"{type(e).__name__}: {e}"
+
+    def _append(self, t, values):
+        if self.kind == "normalized":
+            count = len(self.times)
+            try:
+                for buffer, cast, value in zip(self.buffers, self.casts, values):
+                    buffer.append(cast(value))
+            except Exception:
+                for buffer in self.buffers: # Keep the columns the same length
+                    del buffer[count:]
+                raise
+        else:
+            page = values[:self.page_size]
+            self.pages += page
+            if len(page) < self.page_size:
+                self.pages += bytes(self.page_size - len(page))
+        self.times.append(t)
+        self.recorded += 1
+
+    def _flush(self):
+        count = len(self.times)
+        if not count:
+            return
+        # array.tobytes() is native order; the format assumes a little-endian host
+        parts = [self.times.tobytes()]
+        if self.kind == "normalized":
+            parts.extend(buffer.tobytes() for buffer in self.buffers)
+        else:
+            parts.append(bytes(self.pages))
+        raw = b"".join(parts)
+        stored = self.compress(raw)
+
+        offset = self.file.tell()
+        t_first, t_last = self.times[0], self.times[-1]
+        self._write(CHUNK_HEADER.pack(CHUNK_MAGIC, count, t_first, t_last, len(raw), len(stored)))
+        self._write(stored)
+        self.index.append((offset, count, t_first, t_last))
+        self._reset_buffers()
+
+    def _write_index(self):
+        offset = self.file.tell()
+        self._write(INDEX_HEADER.pack(INDEX_MAGIC, len(self.index)))
+        self._write(b"".join(INDEX_ENTRY.pack(*entry) for entry in self.index))
+        self._write(FOOTER.pack(offset, FOOTER_MAGIC))
+
+    def _write(self, data):
+        self.file.write(data)
+        self.bytes_written += len(data)
+
+    def stats(self):
+        return {
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "failed": self.failed,
+            "queued": self.queue.qsize(),
+            "bytes_written": self.bytes_written,
+        }
+
+
+class SessionReader:
+    """
+    Memory-maps a .strec file. columns(i) returns the columns of chunk i as
+    memoryviews; for uncompressed files they point straight into the mapping.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, length = FILE_HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a session recording")
+        if version != VERSION:
+            raise ValueError(f"Unsupported recording version {version}")
+        self.metadata = json.loads(self.mm[FILE_HEADER.size:FILE_HEADER.size + length])
+        self.data_start = FILE_HEADER.size + length
+
+        self.kind = self.metadata["kind"]
+        self.columns = [tuple(c) for c in self.metadata["columns"]]
+        self.page_size = self.metadata.get("page_size", 0)
+        _, self.decompress = _codec(self.metadata["codec"])
+        self.index = self._read_index()
+
+    def _read_index(self):
+        size = len(self.mm)
+        if size >= self.data_start + FOOTER.size:
+            offset, magic = FOOTER.unpack_from(self.mm, size - FOOTER.size)
+            if magic == FOOTER_MAGIC:
+                index_magic, count = INDEX_HEADER.unpack_from(self.mm, offset)
+                if index_magic == INDEX_MAGIC:
+                    start = offset + INDEX_HEADER.size
+                    return [INDEX_ENTRY.unpack_from(self.mm, start + i * INDEX_ENTRY.size) for i in range(count)]
+
+        # No index (recording was interrupted): scan the chunks
+        index = []
+        offset = self.data_start
+        while offset + CHUNK_HEADER.size <= size:
+            magic, count, t_first, t_last, raw_length, stored_length = CHUNK_HEADER.unpack_from(self.mm, offset)
+            if magic != CHUNK_MAGIC or offset + CHUNK_HEADER.size + stored_length > size:
+                break
+            index.append((offset, count, t_first, t_last))
+            offset += CHUNK_HEADER.size + stored_length
+        return index
+
+    def __len__(self):
+        return sum(entry[1] for entry in self.index)
+
+    @property
+    def duration(self):
+        return self.index[-1][3] - self.index[0][2] if self.index else 0.0
+
+    def columns_of(self, chunk):
+        """{name: memoryview} for one chunk. Raw pages come back as one flat byte view (records * page_size)."""
+        offset, count = self.index[chunk][0], self.index[chunk][1]
+        _, _, _, _, raw_length, stored_length = CHUNK_HEADER.unpack_from(self.mm, offset)
+        start = offset + CHUNK_HEADER.size
+        stored = memoryview(self.mm)[start:start + stored_length]
+        payload = memoryview(self.decompress(stored, raw_length))
+
+        columns = {}
+        cursor = 0
+        for name, code in self.columns:
+            if code.endswith("s"):
+                width = int(code[:-1])
+                columns[name] = payload[cursor:cursor + count * width]
+            else:
+                width = struct.calcsize(code)
+                columns[name] = payload[cursor:cursor + count * width].cast(code)
+            cursor += count * width
+        return columns
+
+    def rows(self):
+        """Yields one tuple per record, in column order"""
+        for chunk in range(len(self.index)):
+            columns = self.columns_of(chunk)
+            if self.kind == "raw":
+                pages = columns["page"]
+                width = self.page_size
+                for i, t in enumerate(columns["t"]):
+                    yield t, pages[i * width:(i + 1) * width].tobytes()
+            else:
+                yield from zip(*columns.values())
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+
+def create_recorder(provider, path, raw=False, codec="none", channels=None):
+    """
+    Starts a recorder for a provider's frames: its raw page snapshots, or the
+    normalized fields (tagged with the channels it fills). Raises RuntimeError
+    when a raw recording is asked of a provider without a raw page.
+    """
+    if raw:
+        if not provider.page_size:
+            raise RuntimeError(f"{provider.game_name} has no raw page to record")
+        recorder = SessionRecorder(path, kind="raw", page_size=provider.page_size, codec=codec,
+                                   game_name=provider.game_name)
+    else:
+        recorder = SessionRecorder(path, codec=codec, game_name=provider.game_name,
+                                   channels=channels or provider.channels)
+    return recorder.start()
+
+
+def to_csv(reader: SessionReader, path):
+    """Writes a recording as CSV. Raw pages become one float32 column per 4-byte offset."""
+    import csv
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        if reader.kind == "raw":
+            floats = struct.Struct(f"<{reader.page_size // 4}f")
+            writer.writerow(["Time"] + [f"Offset_{i * 4}" for i in range(floats.size // 4)])
+            for t, page in reader.rows():
+                writer.writerow((t,) + floats.unpack_from(page))
+        else:
+            writer.writerow([name for name, _ in reader.columns])
+            writer.writerows(reader.rows())
+
+
+def to_parquet(reader: SessionReader, path):
+    """Writes a recording as Parquet (needs pyarrow). Raw pages become fixed-size binary."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires: pip install pyarrow")
+
+    types = {"d": pa.float64(), "f": pa.float32(), "b": pa.int8(), "B": pa.uint8(), "h": pa.int16(), "i": pa.int32(),
+             "I": pa.uint32()}
+    fields = []
+    for name, code in reader.columns:
+        fields.append(pa.field(name, pa.binary(int(code[:-1])) if code.endswith("s") else types[code]))
+    schema = pa.schema(fields)
+
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in range(len(reader.index)):
+            columns = reader.columns_of(chunk)
+            arrays = []
+            count = len(columns["t"])
+            for field, view in zip(schema, columns.values()):
+                buffer = pa.py_buffer(view.cast("B") if view.format != "B" else view)
+                arrays.append(pa.Array.from_buffers(field.type, count, [None, buffer]))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
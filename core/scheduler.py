@@ -0,0 +1,206 @@
+import threading
+import time
+from collections import deque
+from core.timing import clock, LatencyTracker, Cadence
+from core.telemetry import TelemetryData
+
+
+class FrameScheduler:
+    """
+    Drives a provider and hands its frames to a publish callback.
+
+    Modes:
+    - fixed: sample every 1/fps seconds and publish every sample (legacy behaviour).
+    - event: poll at poll_hz and publish only when the provider reports a new
+      game frame (provider.frame_id changed). Duplicate frames are dropped.
+      Providers without a frame signal fall back to publishing at fps.
+    - auto: like event, but the poll rate follows the source. The scheduler
+      measures how often new frames arrive (core.timing.Cadence) and polls
+      once per source period, just before the next frame is due. A poll that
+      finds a new frame moves the next one a little earlier, a poll that finds
+      nothing moves it later and retries soon after, so polls settle on the
+      source's phase. poll_hz caps the poll rate. Until the rate is known it
+      polls like event mode, and while the source is paused once per period.
+
+    Every mode measures the source rate from the provider's frame_id, so
+    stats() reports it next to the duplicate ratio.
+
+    In every mode a disconnected provider is published once, when it goes
+    down, and not on every tick. If it has a core.connection.Connection the
+    loop sleeps until its next probe, and connection events go to on_event.
+    """
+
+    def __init__(self, provider, publish, fps=60, mode="fixed", poll_hz=1000, on_event=None):
+        if mode not in ("fixed", "event", "auto"):
+            raise ValueError(f"Unknown scheduler mode: {mode}")
+        self.provider = provider
+        self.publish = publish
+        self.on_event = on_event
+        self.mode = mode
+        self.interval = 1.0 / fps
+        self.poll_interval = 1.0 / poll_hz
+
+        self.last_frame_id = None
+        self.last_connected = None
+        self.last_publish = 0.0
+        self.latest = None
+        self.running = False
+        self.wake = threading.Event() # Cuts idle waits short on stop()
+
+        self.cadence = Cadence()
+        self.seen_frame_id = None
+        self.seen_at = 0.0   # When the last new game frame was first seen
+        self.fresh = False   # The last tick saw a new game frame
+        self.lead = 0.0      # auto: how long before the expected frame the next poll goes
+        self.misses = 0      # auto: polls since the last new frame
+        self.ticks = deque(maxlen=256) # Recent tick times, for the poll rate
+
+        self.frames_published = 0
+        self.frames_duplicate = 0
+        self.frames_idle = 0 # Ticks while disconnected, not published
+        self.overruns = 0 # Ticks that started after their deadline
+        self.read_latency = LatencyTracker()
+        self.jitter = LatencyTracker() # How late each tick started against its deadline
+
+    def _is_new_frame(self, telemetry: TelemetryData, now):
+        # Connection state changes always go out, so clients see them immediately
+        if telemetry.connected != self.last_connected:
+            return True
+        if not telemetry.connected:
+            return False
+
+        frame_id = self.provider.frame_id
+        if frame_id is None:
+            # No "new data" signal from this provider, publish at the nominal rate
+            return now - self.last_publish >= self.interval
+        return frame_id != self.last_frame_id
+
+    def tick(self):
+        """Reads one sample and publishes it if needed. Returns True if published."""
+        start = clock()
+        telemetry = self.provider.get_telemetry()
+        now = clock()
+        self.read_latency.add(now - start)
+        self.latest = telemetry
+        self.ticks.append(start)
+        self._observe(telemetry, now)
+
+        connection = self.provider.connection
+        if connection is not None and connection.events:
+            while connection.events:
+                event = connection.events.popleft()
+                if self.on_event:
+                    self.on_event(event)
+
+        if not telemetry.connected and self.last_connected is False:
+            self.frames_idle += 1
+            return False
+        if self.mode != "fixed":
+            if not self._is_new_frame(telemetry, now):
+                self.frames_duplicate += 1
+                return False
+        elif (not self.fresh and telemetry.connected and self.last_connected
+              and self.provider.frame_id is not None):
+            # Fixed rate still publishes it, but count the repeat so oversampling shows up
+            self.frames_duplicate += 1
+
+        self.last_frame_id = self.provider.frame_id
+        self.last_connected = telemetry.connected
+        self.last_publish = now
+        self.frames_published += 1
+        # start is when the frame was captured; the publisher measures the rest
+        self.publish(telemetry, start)
+        return True
+
+    def _observe(self, telemetry, now):
+        """Feeds the source cadence: frame counters give the number of frames since the last one seen"""
+        frame_id = self.provider.frame_id
+        self.fresh = False
+        if not telemetry.connected or frame_id is None:
+            self.seen_frame_id = None
+            self.cadence.reset()
+            return
+        if frame_id == self.seen_frame_id:
+            return
+        steps = 1
+        if isinstance(frame_id, int) and isinstance(self.seen_frame_id, int) and frame_id > self.seen_frame_id:
+            steps = frame_id - self.seen_frame_id
+        self.cadence.add(now, steps)
+        self.seen_frame_id = frame_id
+        self.seen_at = now
+        self.fresh = True
+
+    def _next_poll(self, deadline):
+        """auto mode: deadline of the next poll after the one scheduled at `deadline`"""
+        period = self.cadence.period
+        if period is None:
+            return deadline + (self.poll_interval if self.provider.frame_id is not None else self.interval)
+        if self.fresh:
+            if self.misses == 0:
+                self.lead = min(self.lead + period / 64, period / 2) # Found it at once: it may have waited, go earlier
+            self.misses = 0
+            return max(self.seen_at + period - self.lead, deadline + self.poll_interval)
+        self.misses += 1
+        if self.misses == 1:
+            # Too early. Backing off 4x faster than creeping forward settles at ~1 early poll in 5 frames.
+            self.lead = max(self.lead - period / 16, 0.0)
+        if deadline - self.seen_at > 4 * period:
+            return deadline + max(self.poll_interval, period) # Paused or stalled: poll at the source's rate
+        return deadline + max(self.poll_interval, period / 16)
+
+    def run(self, on_tick=None):
+        """Ticks until stop() is called (from any thread)"""
+        period = self.interval if self.mode == "fixed" else self.poll_interval
+        next_tick = clock()
+        self.running = True
+        self.wake.clear()
+        while self.running:
+            self.jitter.add(max(0.0, clock() - next_tick))
+            self.tick()
+            if on_tick:
+                on_tick(self)
+
+            # Absolute deadlines so the schedule does not drift with read time
+            next_tick = self._next_poll(next_tick) if self.mode == "auto" else next_tick + period
+            connection = self.provider.connection
+            if connection is not None and not connection.connected and connection.next_probe > next_tick:
+                # Nothing to read until the next probe: sleep through the backoff
+                self.wake.wait(connection.next_probe - clock())
+                next_tick = clock()
+                continue
+            sleep_time = next_tick - clock()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            else:
+                self.overruns += 1
+                next_tick = clock()
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+
+    @property
+    def poll_rate(self):
+        """Ticks per second over the recent ticks"""
+        ticks = self.ticks
+        if len(ticks) < 2 or ticks[-1] <= ticks[0]:
+            return 0.0
+        return (len(ticks) - 1) / (ticks[-1] - ticks[0])
+
+    def stats(self):
+        # Fixed mode publishes its duplicates, the other modes drop them
+        total = self.frames_published + (self.frames_duplicate if self.mode != "fixed" else 0)
+        return {
+            "mode": self.mode,
+            "source_hz": self.cadence.rate,
+            "poll_hz": self.poll_rate,
+            "frames_published": self.frames_published,
+            "frames_duplicate": self.frames_duplicate,
+            "frames_idle": self.frames_idle,
+            "duplicate_ratio": self.frames_duplicate / total if total else 0.0,
+            "overruns": self.overruns,
+            "lead_ms": self.lead * 1000.0 if self.mode == "auto" else None,
+            "read": self.read_latency.summary(),
+            "jitter": self.jitter.summary(),
+            "provider": self.provider.stats(),
+        }
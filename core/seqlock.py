@@ -0,0 +1,112 @@
+import struct
+import time
+
+SETTLE = 1e-5 # Seconds a read of a page without Begin/End counters waits before checking it again
+
+
+class SeqlockReader:
+    """
+    Consistent, change-detecting reads of a Layout from a page that the game
+    writes concurrently (seqlock style).
+
+    Counter mode (begin/end offsets given): the "end" counter is read before the
+    fields and the "begin" counter after them; the read is only accepted when both
+    match. With a writer that bumps Begin, writes, then bumps End (rFactor 2 style)
+    this catches every overlapping write. With a single packet counter (AC packetId)
+    pass only `begin`: the counter alone would miss a write still in progress, so
+    the fields are unpacked from a snapshot of the page, and the read is accepted
+    only if the counter and the page bytes are unchanged after yielding the CPU
+    once (a writer caught mid-frame gets to run and moves the bytes).
+
+    Compare mode (no counters): the page bytes are snapshotted, unpacked from the
+    snapshot, and compared with the live page again after yielding the CPU.
+
+    read() returns the unpacked tuple, or None when the page has not changed
+    since the last accepted read (skipped) or every retry was torn (failed).
+    """
+
+    def __init__(self, layout, begin=None, end=None, counter_format="i", max_retries=3):
+        self.layout = layout
+        self.max_retries = max_retries
+        self.counter = struct.Struct("<" + counter_format)
+        self.begin = begin
+        self.end = end if end is not None else begin
+        self.single = begin is not None and self.end == begin # One counter: verify the bytes too
+        self.last_version = None
+        self.last_snapshot = None
+
+        self.reads = 0
+        self.torn = 0
+        self.retried = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def reset(self):
+        """Forget the last version, e.g. after reopening the page"""
+        self.last_version = None
+        self.last_snapshot = None
+
+    def read(self, buffer):
+        if self.begin is None:
+            return self._read_compare(buffer)
+        return self._read_counter(buffer)
+
+    def _read_counter(self, buffer):
+        unpack_counter = self.counter.unpack_from
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retried += 1
+            version, = unpack_counter(buffer, self.end)
+            if version == self.last_version:
+                self.skipped += 1
+                return None
+
+            if self.single:
+                size = self.layout.struct.size
+                snapshot = buffer[0:size]
+                values = self.layout.unpack(snapshot)
+                time.sleep(SETTLE)
+                consistent = buffer[0:size] == snapshot
+            else:
+                values = self.layout.unpack(buffer)
+                consistent = True
+
+            if consistent and unpack_counter(buffer, self.begin)[0] == version:
+                self.last_version = version
+                self.reads += 1
+                return values
+            self.torn += 1
+
+        self.failed += 1
+        return None
+
+    def _read_compare(self, buffer):
+        size = self.layout.struct.size
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retried += 1
+            snapshot = buffer[0:size]
+            if snapshot == self.last_snapshot:
+                self.skipped += 1
+                return None
+
+            values = self.layout.unpack(snapshot)
+            time.sleep(SETTLE) # Let a writer caught mid-frame move on
+
+            if buffer[0:size] == snapshot:
+                self.last_snapshot = snapshot
+                self.reads += 1
+                return values
+            self.torn += 1
+
+        self.failed += 1
+        return None
+
+    def stats(self):
+        return {
+            "reads": self.reads,
+            "torn": self.torn,
+            "retried": self.retried,
+            "skipped": self.skipped,
+            "failed": self.failed,
+        }
@@ -1,21 +1,155 @@
-from dataclasses import dataclass, asdict
-from typing import Optional
+import json
+from core import encoding
+
+# (name, default) in wire/dict order. Adding a field here is all it takes:
+# the methods below are generated from this table, so there is no per-field
+# reflection (dataclasses.asdict) on the hot path.
+FIELDS = (
+    ("game_name", ""),
+    ("connected", False),
+    ("speed_kmh", 0.0),
+    ("rpm", 0.0),
+    ("max_rpm", 0.0),
+    ("gear", 0),
+    ("throttle", 0.0),
+    ("brake", 0.0),
+    ("clutch", 0.0),
 
-@dataclass
-class TelemetryData:
-    """Standardized Telemetry Data Structure"""
-    game_name: str
-    connected: bool
-    speed_kmh: float = 0.0
-    rpm: float = 0.0
-    max_rpm: float = 0.0
-    gear: int = 0
-    throttle: float = 0.0
-    brake: float = 0.0
-    clutch: float = 0.0
-    
     # Optional/Extended physics
-    steering_angle: float = 0.0
-    
-    def to_dict(self):
-        return asdict(self)
+    ("steering_angle", 0.0),
+
+    # Motion: accelerations in g (long +forward, lat +right, vert +up),
+    # angular rates in rad/s, orientation in rad
+    ("accel_long", 0.0),
+    ("accel_lat", 0.0),
+    ("accel_vert", 0.0),
+    ("yaw_rate", 0.0),
+    ("pitch_rate", 0.0),
+    ("roll_rate", 0.0),
+    ("heading", 0.0),
+    ("pitch", 0.0),
+    ("roll", 0.0),
+
+    # Per wheel, fixed order FL, FR, RL, RR. Tuples are replaced, never resized.
+    ("wheel_slip", (0.0,) * 4),
+    ("wheel_load", (0.0,) * 4),         # N
+    ("suspension_travel", (0.0,) * 4),  # m
+    ("tyre_temp", (0.0,) * 4),          # Celsius, core
+
+    # Lap / session: times in seconds, 0 = no time yet
+    ("lap", 0),                         # completed laps
+    ("lap_time", 0.0),
+    ("last_lap_time", 0.0),
+    ("best_lap_time", 0.0),
+    ("lap_distance_pct", 0.0),          # 0..1 around the lap
+
+    # Dashboard
+    ("fuel", 0.0),                      # 0..1 of the tank
+    ("engine_temp", 0.0),               # Celsius
+    ("dash_lights", 0),                 # bitmask of lights that are on, OutGauge DL_* bit order
+
+    # Derived by core.processing, not read from the game
+    ("speed_accel", 0.0),               # g, d(speed)/dt
+    ("redline_pct", 0.0),               # rpm / max_rpm, 0..1
+    ("gear_shift", 0),                  # +1 upshift / -1 downshift, held briefly, else 0
+)
+NAMES = tuple(name for name, _ in FIELDS)
+DEFAULTS = dict(FIELDS)
+ARRAYS = tuple(name for name, default in FIELDS if isinstance(default, tuple))
+
+# Channels every provider fills; providers with more list them in GameProvider.channels
+BASE_CHANNELS = ("speed_kmh", "rpm", "max_rpm", "gear", "throttle", "brake", "clutch", "steering_angle")
+
+_wire_values = encoding.flattener("t.{}")
+
+# C encoder, no per-call setup; output identical to json.dumps()
+_encode_json = json.JSONEncoder(check_circular=False).encode
+
+
+def _generate(cls):
+    """Compiles __init__, update and to_dict for the FIELDS table"""
+    values = NAMES[2:]
+    namespace = {}
+    init_args = ", ".join(f"{name}={DEFAULTS[name]!r}" for name in values)
+    assign = "".join(f"\n    self.{name} = {name}" for name in values)
+    source = (
+        f"def __init__(self, game_name, connected, {init_args}):\n"
+        f"    self.game_name = game_name\n"
+        f"    self.connected = connected{assign}\n"
+        f"\n"
+        f"def update(self, connected=True, {init_args}):\n"
+        f"    self.connected = connected{assign}\n"
+        f"    return self\n"
+        f"\n"
+        f"def to_dict(self):\n"
+        f"    return {{{', '.join(f'{name!r}: self.{name}' for name in NAMES)}}}\n"
+    )
+    exec(source, namespace)
+    for name in ("__init__", "update", "to_dict"):
+        setattr(cls, name, namespace[name])
+    return cls
+
+
+@_generate
+class TelemetryData:
+    """
+    Standardized Telemetry Data Structure
+
+    Slotted and mutable: a provider keeps one instance and update()s it in
+    place every frame. Consumers that keep a frame across ticks must copy it
+    (to_dict() does). Disconnected frames are the shared, immutable
+    TelemetryData.disconnected(game_name) sentinel.
+    """
+    __slots__ = NAMES
+
+    def to_tuple(self):
+        return tuple(getattr(self, name) for name in NAMES)
+
+    def to_json(self):
+        return _encode_json(self.to_dict())
+
+    def to_binary(self, seq):
+        """Full (keyframe) binary frame, see core.encoding"""
+        flags = encoding.FLAG_KEYFRAME | (encoding.FLAG_CONNECTED if self.connected else 0)
+        return encoding.FRAME.pack(encoding.MAGIC, encoding.SCHEMA_VERSION, flags, seq & 0xFFFFFFFF,
+                                   encoding.FULL_MASK, *_wire_values(self))
+
+    def copy(self):
+        frame = TelemetryData.__new__(TelemetryData)
+        for name in NAMES:
+            object.__setattr__(frame, name, getattr(self, name))
+        return frame
+
+    def __eq__(self, other):
+        if not isinstance(other, TelemetryData):
+            return NotImplemented
+        return self.to_tuple() == other.to_tuple()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "TelemetryData(" + ", ".join(f"{name}={getattr(self, name)!r}" for name in NAMES) + ")"
+
+    @staticmethod
+    def disconnected(game_name):
+        frame = _disconnected.get(game_name)
+        if frame is None:
+            frame = _disconnected[game_name] = _Disconnected(game_name, False)
+            frame._frozen = True
+        return frame
+
+
+class _Disconnected(TelemetryData):
+    """Immutable 'not connected' frame shared by every provider of a game"""
+    __slots__ = ("_frozen",)
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError("The disconnected telemetry frame is shared and cannot be modified")
+        object.__setattr__(self, name, value)
+
+    def update(self, *args, **kwargs):
+        raise AttributeError("The disconnected telemetry frame is shared and cannot be modified")
+
+
+_disconnected = {}
@@ -0,0 +1,72 @@
+import time
+from collections import deque
+
+# Monotonic, high-resolution clock used for every pipeline timestamp.
+# time.time() can jump (NTP, DST) and has ~15ms resolution on Windows.
+clock = time.perf_counter
+
+
+class LatencyTracker:
+    """Rolling window of latency samples for one pipeline stage"""
+
+    def __init__(self, window=1000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0 # Sum of every sample, not just the window (Prometheus _sum)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, pct):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100.0))
+        return ordered[index]
+
+    def summary(self):
+        """Returns count, average, p99 and max latency in milliseconds"""
+        if not self.samples:
+            return {"count": self.count, "avg_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        return {
+            "count": self.count,
+            "avg_ms": sum(self.samples) / len(self.samples) * 1000.0,
+            "p99_ms": self.percentile(99) * 1000.0,
+            "max_ms": max(self.samples) * 1000.0,
+        }
+
+
+class Cadence:
+    """
+    Update rate of a source, from the times its new frames were seen. When
+    the source's frame counter moved by more than one (frames were skipped in
+    between) the interval is split between them. The period is the time per
+    frame over a window, leaving out pauses (intervals over 4x the median),
+    so a poll rate that is not a multiple of the source's does not bias it.
+    """
+
+    def __init__(self, window=64, min_samples=8):
+        self.intervals = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.last = None
+        self.period = None # Seconds per source frame, None until min_samples intervals
+
+    def add(self, t, steps=1):
+        if self.last is not None and steps > 0:
+            self.intervals.append((t - self.last, steps))
+            if len(self.intervals) >= self.min_samples:
+                ordered = sorted(interval / n for interval, n in self.intervals)
+                limit = 4 * ordered[len(ordered) // 2]
+                kept = [(interval, n) for interval, n in self.intervals if interval / n <= limit]
+                self.period = sum(interval for interval, _ in kept) / sum(n for _, n in kept)
+        self.last = t
+
+    def reset(self):
+        """The source went away: the next frame starts a new interval, the estimate is kept"""
+        self.last = None
+
+    @property
+    def rate(self):
+        return 1.0 / self.period if self.period else None
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+from core.timing import clock
+
+
+class LoopThread:
+    """A private asyncio event loop on a daemon thread (UDP ingestion, sinks...)"""
+
+    def __init__(self, name="udp"):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self.thread.start()
+
+    def run(self, coroutine, timeout=5.0):
+        """Runs a coroutine on the loop from another thread and returns its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def stop(self, timeout=1.0):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        if not self.thread.is_alive():
+            self.loop.close()
+
+
+class DatagramCache(asyncio.DatagramProtocol):
+    """
+    Keeps only the newest datagram of an endpoint, plus when it arrived.
+
+    The event loop hands us one datagram per callback; parsing is left to the
+    reader, which only looks at the latest one. A burst of N datagrams between
+    two polls therefore costs N cheap assignments and one parse, and the ones
+    nobody saw are counted as coalesced.
+    """
+
+    def __init__(self, min_size=0):
+        self.min_size = min_size
+        self.latest = None  # (data, arrival time, sequence), replaced in one assignment
+        self.count = 0      # datagrams accepted
+        self.read_count = 0 # value of count when take() last returned data
+        self.rejected = 0   # too short to be a packet of this kind
+        self.coalesced = 0
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) < self.min_size:
+            self.rejected += 1
+            return
+        self.count += 1
+        self.latest = (data, clock(), self.count)
+
+    def take(self):
+        """(data, arrival time, sequence) of a datagram not returned before, or None"""
+        latest = self.latest # Single read: data and sequence always match
+        if latest is None or latest[2] == self.read_count:
+            return None
+        self.coalesced += latest[2] - self.read_count - 1
+        self.read_count = latest[2]
+        return latest
+
+    def age(self, now=None):
+        """Seconds since the newest datagram arrived, None if nothing arrived yet"""
+        latest = self.latest
+        if latest is None:
+            return None
+        return (now if now is not None else clock()) - latest[1]
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+    def stats(self):
+        return {"received": self.count, "coalesced": self.coalesced, "rejected": self.rejected}
+
+
+async def listen(loop, port, min_size=0, host="127.0.0.1"):
+    """Binds a DatagramCache to host:port on the running loop"""
+    _, protocol = await loop.create_datagram_endpoint(lambda: DatagramCache(min_size), local_addr=(host, port))
+    return protocol
@@ -1,56 +1,133 @@
-
-import mmap
-import struct
-import time
-import csv
+import argparse
 import datetime
-import os
+import json
+import sys
+import time
 
-def main():
-    map_name = "$rFactorShared$"
-    print(f"Waiting for rFactor Shared Memory ({map_name})...")
-    
-    mm = None
-    while mm is None:
-        try:
-            mm = mmap.mmap(-1, 2048, map_name) # Open 2KB
-            print("Connected!")
-        except FileNotFoundError:
-            time.sleep(1)
-
-    # Setup CSV
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"rfactor_telemetry_{timestamp}.csv"
-    
-    print(f"Logging data to {filename}...")
+from core.recorder import SessionReader, CODECS, create_recorder, to_csv, to_parquet
+from core.analytics import analyze
+from core.scheduler import FrameScheduler
+from providers import registry
+
+def record(args):
+    try:
+        provider = registry.create(args.game)
+    except (ValueError, RuntimeError, OSError) as e:
+        print(e)
+        sys.exit(1)
+    if provider is None:
+        print(f"Unknown game: {args.game}")
+        sys.exit(1)
+
+    filename = args.out
+    if not filename:
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"{args.game}_{'raw' if args.raw else 'telemetry'}_{timestamp}.strec"
+
+    try:
+        recorder = create_recorder(provider, filename, args.raw, args.codec)
+    except (OSError, RuntimeError) as e:
+        provider.close()
+        print(e)
+        sys.exit(1)
+    print(f"Logging {recorder.kind} data to {filename}...")
     print("Press Ctrl+C to stop.")
 
-    with open(filename, 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        
-        # Header (Offset_0, Offset_4, ...)
-        header = ["Time"] + [f"Offset_{i*4}" for i in range(128)]
-        writer.writerow(header)
-
-        try:
-            while True:
-                mm.seek(0)
-                data = mm.read(512) # Read first 512 bytes (128 floats)
-                
-                row = [time.time()]
-                for i in range(0, len(data), 4):
-                    try:
-                        val = struct.unpack('f', data[i:i+4])[0]
-                        row.append(val)
-                    except:
-                        row.append(0)
-                
-                writer.writerow(row)
-                time.sleep(0.05) # 20 Hz
-                
-        except KeyboardInterrupt:
-            print(f"\nStopped. Saved {filename}")
-            mm.close()
+    def publish(telemetry, captured_at):
+        if not telemetry.connected:
+            return
+        if args.raw:
+            page = provider.snapshot()
+            if page is not None:
+                recorder.record_page(page, captured_at)
+        else:
+            recorder.record(telemetry.to_dict(), captured_at)
+
+    # One record per new game frame, up to the poll rate
+    scheduler = FrameScheduler(provider, publish, fps=args.fps, mode="event", poll_hz=args.poll_hz)
+    last_status = [0.0]
+
+    def print_status(scheduler):
+        now = time.perf_counter()
+        if now - last_status[0] >= 1.0:
+            last_status[0] = now
+            stats = recorder.stats()
+            print(f"Recorded: {stats['recorded']} | Dropped: {stats['dropped']} | "
+                  f"{stats['bytes_written'] / 1e6:.1f} MB", end='\r')
+
+    try:
+        scheduler.run(on_tick=print_status)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recorder.close()
+        provider.close()
+        print(f"\nStopped. Saved {filename}: {recorder.stats()}")
+
+def convert(args):
+    reader = SessionReader(args.file)
+    print(f"{args.file}: {reader.kind}, {len(reader)} records, {reader.duration:.1f}s, "
+          f"codec {reader.metadata['codec']}")
+    try:
+        if args.csv:
+            to_csv(reader, args.csv)
+            print(f"Wrote {args.csv}")
+        if args.parquet:
+            to_parquet(reader, args.parquet)
+            print(f"Wrote {args.parquet}")
+    finally:
+        reader.close()
+
+def laps(args):
+    try:
+        result = analyze(args.file, sectors=args.sectors)
+    except (ValueError, RuntimeError) as e:
+        print(e)
+        sys.exit(1)
+    if not result["laps"]:
+        print(f"{args.file}: no complete lap")
+        return
+    for lap in result["laps"]:
+        sectors = " ".join(f"{s:7.3f}" for s in lap["sectors"])
+        delta = f"{lap['delta']:+.3f}" if lap["delta"] is not None else ""
+        flags = ("best" if lap["best"] else "") + ("" if lap["valid"] else " invalid")
+        print(f"Lap {lap['lap']:3d}  {lap['time']:8.3f}s  {delta:>8}  {sectors}  "
+              f"max {lap['max_speed_kmh']:5.1f} km/h  brake {lap['braking_pct']:4.1f}%  {flags}")
+    if result["deltas"] is not None:
+        worst = abs(result["deltas"]).max(axis=1)
+        print(f"Largest gap to the best lap: {worst.max():.3f}s (lap {int(worst.argmax()) + 1})")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result["laps"], f, indent=1)
+        print(f"Wrote {args.json}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Session recorder (.strec) and converter")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rec = commands.add_parser("record", help="Record a session")
+    rec.add_argument("--game", default="rfactor", help="Game to record (iracing, ac, rfactor, beamng, test)")
+    rec.add_argument("--out", help="Output file (default: <game>_<kind>_<timestamp>.strec)")
+    rec.add_argument("--raw", action="store_true", help="Record raw page snapshots instead of normalized fields")
+    rec.add_argument("--codec", choices=CODECS, default="none", help="Chunk compression")
+    rec.add_argument("--fps", type=int, default=60, help="Rate for providers without a new-frame signal")
+    rec.add_argument("--poll-hz", type=int, default=1000, help="Poll rate (caps the recording rate)")
+    rec.set_defaults(func=record)
+
+    conv = commands.add_parser("convert", help="Convert a recording to CSV / Parquet")
+    conv.add_argument("file", help=".strec file")
+    conv.add_argument("--csv", help="CSV output path")
+    conv.add_argument("--parquet", help="Parquet output path (needs pyarrow)")
+    conv.set_defaults(func=convert)
+
+    lap = commands.add_parser("laps", help="Lap times, sectors and deltas of a recording (needs numpy)")
+    lap.add_argument("file", help="Normalized .strec file")
+    lap.add_argument("--sectors", type=int, default=3, help="Sectors per lap")
+    lap.add_argument("--json", help="Also write the lap summaries to this JSON file")
+    lap.set_defaults(func=laps)
+
+    args = parser.parse_args()
+    args.func(args)
 
 if __name__ == "__main__":
     main()
@@ -3,6 +3,12 @@ import websockets
 import json
 import socket
 import argparse
+import os
+import sys
+
+# Allow running from the examples/ folder: the binary decoder lives in core/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from core.encoding import decode_binary
 
 # --- CONFIGURATION ---
 ESP_IP = "192.168.68.80" # REPLACE WITH YOUR ESP32 IP
@@ -27,18 +33,32 @@ class FanController:
         except Exception as e:
             print(f"UDP Error: {e}")
 
-async def listen_to_connector():
-    uri = "ws://localhost:8765"
+async def listen_to_connector(wire_format):
+    # Binary frames are ~4x smaller than JSON and decode with a single struct unpack
+    uri = f"ws://localhost:8765/?format={wire_format}"
     controller = FanController(ESP_IP, ESP_PORT)
     
     print(f"Connecting to SimRacing Connector at {uri}...")
     print(f"Forwarding to ESP32 at {ESP_IP}:{ESP_PORT}")
     
     async with websockets.connect(uri) as websocket:
+        # Fans only need speed, and only when it actually changes
+        await websocket.send(json.dumps({
+            "type": "subscribe",
+            "fields": ["speed_kmh"],
+            "max_rate": 20,
+            "deadband": {"speed_kmh": 0.5},
+        }))
+
         while True:
             try:
                 message = await websocket.recv()
-                data = json.loads(message)
+                if isinstance(message, bytes):
+                    data = decode_binary(message)
+                else:
+                    data = json.loads(message)
+                    if "type" in data:
+                        continue # Schema / subscription acknowledgement, not telemetry
                 
                 if data.get("connected"):
                     speed = data.get("speed_kmh", 0)
@@ -56,7 +76,11 @@ async def listen_to_connector():
                 await asyncio.sleep(1)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Wind Simulator client")
+    parser.add_argument("--format", choices=["binary", "json"], default="binary", help="Wire format to request")
+    args = parser.parse_args()
+
     try:
-        asyncio.run(listen_to_connector())
+        asyncio.run(listen_to_connector(args.format))
     except KeyboardInterrupt:
         print("\nStopped.")
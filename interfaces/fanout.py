@@ -0,0 +1,171 @@
+import asyncio
+from collections import deque
+from core.timing import clock, LatencyTracker
+from core import encoding
+from core.processing import Decimator
+
+
+class ClientSlot:
+    """
+    Bounded mailbox for one client. When it is full the oldest frame is dropped,
+    so a slow client only ever falls behind by `depth` frames and never holds
+    anybody else up.
+    """
+
+    def __init__(self, websocket, fmt, depth=1):
+        self.websocket = websocket
+        self.fmt = fmt
+        self.subscription = None # interfaces.subscription.Subscription, None = every field, every frame
+        self.pending = deque(maxlen=depth)
+        self.control = deque(maxlen=64) # Connection events and the like: never dropped for a newer frame
+        self.channels = set() # Opt-in message channels ("laps")
+        self.ready = asyncio.Event()
+
+        self.last_seq_queued = 0
+        self.last_seq_sent = 0
+        self.sent = 0
+        self.dropped = 0
+        self.latency = LatencyTracker(window=200)  # provider read -> sent to this client
+
+    def offer(self, seq, message, captured_at):
+        if self.full:
+            self.dropped += 1
+        self.pending.append((seq, message, captured_at))
+        self.last_seq_queued = seq
+        self.ready.set()
+
+    def notify(self, message):
+        self.control.append(message)
+        self.ready.set()
+
+    async def take(self):
+        """(seq, message, captured_at) of the next frame; control messages first, with seq None"""
+        while not self.pending and not self.control:
+            self.ready.clear()
+            await self.ready.wait()
+        if self.control:
+            return None, self.control.popleft(), None
+        return self.pending.popleft()
+
+    @property
+    def full(self):
+        return len(self.pending) == self.pending.maxlen
+
+    @property
+    def lag(self):
+        """Frames published but not yet sent to this client"""
+        return self.last_seq_queued - self.last_seq_sent
+
+    def stats(self):
+        latency = self.latency.summary()
+        return {
+            "format": self.fmt,
+            "subscribed": self.subscription is not None,
+            "remote": str(getattr(self.websocket, "remote_address", "")),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "lag": self.lag,
+            "queue_depth": len(self.pending),
+            "latency_avg_ms": latency["avg_ms"],
+            "latency_p99_ms": latency["p99_ms"],
+        }
+
+
+class FanOut:
+    """
+    Encodes each frame once per wire format and drops it into every client's
+    slot. Each client has one long-lived sender (pump) that drains its own slot,
+    so publishing never awaits a client and creates no tasks per tick.
+    """
+
+    def __init__(self, depth=1):
+        self.depth = depth
+        self.slots = set()
+        self.decimators = {} # rate -> Decimator shared by the resampled subscriptions at that rate
+        self.fanout_latency = LatencyTracker()   # encode + offer to every slot
+        self.encode_latency = LatencyTracker()   # encoding alone, per message
+        self.delivery_latency = LatencyTracker() # provider read -> sent, all clients
+
+    def add(self, websocket, fmt):
+        slot = ClientSlot(websocket, fmt, self.depth)
+        self.slots.add(slot)
+        return slot
+
+    def remove(self, slot):
+        self.slots.discard(slot)
+        self._prune_decimators()
+
+    def subscribe(self, slot, subscription):
+        """Sets (or clears, with None) a client's subscription"""
+        slot.subscription = subscription
+        if subscription is not None and subscription.rate and subscription.rate not in self.decimators:
+            self.decimators[subscription.rate] = Decimator(subscription.rate)
+        self._prune_decimators()
+
+    def _prune_decimators(self):
+        rates = {slot.subscription.rate for slot in self.slots if slot.subscription is not None}
+        for rate in list(self.decimators):
+            if rate not in rates:
+                del self.decimators[rate]
+
+    def publish(self, telemetry: dict, seq, captured_at=None):
+        start = clock()
+        messages = {}
+        for decimator in self.decimators.values():
+            decimator.add(telemetry, start)
+        for slot in self.slots:
+            subscription = slot.subscription
+            if subscription is None:
+                message = messages.get(slot.fmt)
+                if message is None:
+                    encode_start = clock()
+                    message = messages[slot.fmt] = encoding.encode(slot.fmt, telemetry, seq)
+                    self.encode_latency.add(clock() - encode_start)
+            else:
+                frame = telemetry
+                if subscription.rate:
+                    decimator = self.decimators[subscription.rate]
+                    if decimator.seq == subscription.decimator_seq:
+                        continue # Window still open
+                    subscription.decimator_seq = decimator.seq
+                    frame = decimator.output
+                # A dropped delta would leave the client out of date: resync with a keyframe
+                update = subscription.select(frame, start, force_keyframe=slot.full)
+                if update is None:
+                    continue
+                fields, keyframe = update
+                message = encoding.encode_fields(slot.fmt, fields, frame.get("connected"), seq, keyframe)
+            slot.offer(seq, message, captured_at)
+        self.fanout_latency.add(clock() - start)
+
+    def notify(self, message, channel=None):
+        """Queues a control message (text) for every client, or those on `channel`, ahead of their frames"""
+        for slot in self.slots:
+            if channel is None or channel in slot.channels:
+                slot.notify(message)
+
+    async def pump(self, slot):
+        """Sends queued frames to one client until its connection fails"""
+        while True:
+            seq, message, captured_at = await slot.take()
+            await slot.websocket.send(message)
+            if seq is None:
+                continue
+            slot.last_seq_sent = seq
+            slot.sent += 1
+            if captured_at is not None:
+                elapsed = clock() - captured_at
+                slot.latency.add(elapsed)
+                self.delivery_latency.add(elapsed)
+
+    def stats(self):
+        clients = [slot.stats() for slot in self.slots]
+        return {
+            "clients": len(clients),
+            "dropped": sum(c["dropped"] for c in clients),
+            "max_lag": max((c["lag"] for c in clients), default=0),
+            "fanout": self.fanout_latency.summary(),
+            "encode": self.encode_latency.summary(),
+            "delivery": self.delivery_latency.summary(),
+            "per_client": clients,
+        }
@@ -0,0 +1,239 @@
+"""
+Provider isolation: a station's provider, scheduler and processing run in a
+child process and hand their frames to the server process through an
+interfaces.shm ring, so provider reads (blocking SDK calls included) and the
+broadcaster no longer share a GIL.
+
+    child   provider -> FrameScheduler -> Processor -> ShmWriter (handoff ring)
+            connection events and stats -> multiprocessing queue
+            stop <- one-way pipe, a new one per (re)start
+    parent  Relay thread: ShmReader.new() -> sinks -> Stream
+            ProviderProcess.supervise(): restarts a child that died, with backoff
+
+Frames cross at wire precision (core.encoding.FRAME, float32), the same as
+binary clients receive.
+"""
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+import time
+from core.timing import clock, LatencyTracker
+from interfaces.shm import ShmReader
+
+STATS_INTERVAL = 1.0   # Child -> parent stats snapshots
+EVENTS_INTERVAL = 0.05 # Parent checks the child's queue this often; frames never wait for it
+
+
+def handoff_path(name, generation=0):
+    """
+    Region of a station's handoff ring: /dev/shm when there is one (Linux), else
+    the temp directory. Every (re)start gets a new file, so the parent can keep
+    the previous one mapped until the new child is ready.
+    """
+    base = f"simracing-{os.getpid()}-{name or 'default'}-{generation}"
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, base)
+
+
+def watch(stop, events, stats, scheduler):
+    """
+    Child side: sends stats snapshots, stops the scheduler on request or when the
+    parent is gone. `stop` is the read end of the parent's stop pipe: anything
+    sent on it, or its end-of-file when the parent exits, ends the loop.
+    """
+    def run():
+        parent = multiprocessing.parent_process()
+        try:
+            while not stop.poll(STATS_INTERVAL):
+                if parent is not None and not parent.is_alive():
+                    break
+                events.put(("stats", stats()))
+        finally:
+            scheduler.stop()
+    thread = threading.Thread(target=run, name="watch", daemon=True)
+    thread.start()
+    return thread
+
+
+class ProviderProcess:
+    """
+    Parent-side handle of one isolated station. target(path, events, stop, *args)
+    runs in the child: it writes frames to the ring at `path`, puts ("ready",
+    (path, game_name, channels)) on `events` once the ring exists, then ("event", dict) and
+    ("stats", dict) as they happen, and returns when `stop` (a pipe connection) becomes readable.
+
+    Stop is a pipe rather than a multiprocessing Event: setting an Event whose
+    waiter died while waiting (a crash, a kill) blocks forever, and a pipe never
+    blocks the parent whatever state the child is in.
+    """
+
+    def __init__(self, name, target, args, restart_min=0.5, restart_max=30.0):
+        self.name = name
+        self.target = target
+        self.args = args
+        self.path = None
+        self.reader_path = None
+        self.context = multiprocessing.get_context("spawn") # The only start method on Windows
+        self.events = self.context.Queue()
+        self.stop_sender = None # Write end of the current child's stop pipe
+        self.process = None
+        self.reader = None
+        self.game_name = None
+        self.channels = None
+        self.snapshot = {} # Last stats from the child
+        self.stopping = False
+
+        self.restart_min = restart_min
+        self.restart_max = restart_max
+        self.restart_delay = restart_min
+        self.restart_at = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.exit_codes = []
+        self.last_events = 0.0
+        self.handoff_latency = LatencyTracker() # Child capture -> relayed in the parent
+
+    def start(self):
+        self.path = handoff_path(self.name, self.restarts)
+        self._close_stop()
+        stop_receiver, self.stop_sender = self.context.Pipe(duplex=False)
+        self.process = self.context.Process(target=self.target, name=f"station-{self.name or 'default'}",
+                                            args=(self.path, self.events, stop_receiver) + tuple(self.args),
+                                            daemon=True)
+        self.process.start()
+        stop_receiver.close() # The child has its own copy
+        self.started_at = clock()
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def supervise(self, now=None):
+        """Restarts the child if it exited; returns a message when something happened. Call periodically."""
+        if self.stopping or self.process is None or self.process.is_alive():
+            return None
+        now = clock() if now is None else now
+        if self.restart_at is None:
+            if now - self.started_at > 60.0:
+                self.restart_delay = self.restart_min # It ran for a while: not a crash loop
+            self.exit_codes.append(self.process.exitcode)
+            self.exit_codes = self.exit_codes[-10:]
+            self.restart_at = now + self.restart_delay
+            return (f"{self.name or 'station'} process exited with code {self.process.exitcode}, "
+                    f"restarting in {self.restart_delay:.1f}s")
+        if now < self.restart_at:
+            return None
+        self.restart_at = None
+        self.restart_delay = min(self.restart_delay * 2, self.restart_max)
+        self.restarts += 1
+        self.start()
+        return f"{self.name or 'station'} process restarted (pid {self.process.pid})"
+
+    def poll_events(self, now):
+        """Drains the child's queue (at most every EVENTS_INTERVAL); returns the connection events"""
+        if now - self.last_events < EVENTS_INTERVAL:
+            return ()
+        self.last_events = now
+        events = []
+        while True:
+            try:
+                kind, value = self.events.get_nowait()
+            except queue.Empty:
+                return events
+            if kind == "ready":
+                # A (re)started child created its ring: map it, drop the previous one
+                self._close_reader()
+                self.reader_path, self.game_name, self.channels = value
+                self.reader = ShmReader(self.reader_path)
+            elif kind == "event":
+                events.append(value)
+            elif kind == "stats":
+                self.snapshot = value
+
+    def frames(self):
+        """Frames the child published since the last call, oldest first"""
+        if self.reader is None:
+            return ()
+        frames = self.reader.new()
+        if frames:
+            now = clock()
+            for frame in frames:
+                self.handoff_latency.add(now - frame["captured_at"])
+        return frames
+
+    def stop(self, timeout=2.0):
+        self.stopping = True
+        if self.process is None:
+            return
+        if self.process.is_alive():
+            try:
+                self.stop_sender.send(None)
+            except OSError:
+                pass # Died in the meantime
+            self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+        self._close_stop()
+        self._close_reader()
+        try:
+            os.unlink(self.path) # Left behind if the child crashed
+        except OSError:
+            pass
+
+    def _close_stop(self):
+        if self.stop_sender is not None:
+            self.stop_sender.close()
+            self.stop_sender = None
+
+    def _close_reader(self):
+        if self.reader is None:
+            return
+        self.reader.close()
+        self.reader = None
+        try:
+            os.unlink(self.reader_path) # Only still there if that child crashed
+        except OSError:
+            pass
+
+    def stats(self):
+        return {
+            "pid": self.process.pid if self.process else None,
+            "alive": self.alive,
+            "restarts": self.restarts,
+            "exit_codes": list(self.exit_codes),
+            "handoff": self.handoff_latency.summary(),
+            "ring": self.reader.stats() if self.reader else None,
+            "station": self.snapshot,
+        }
+
+
+class Relay:
+    """Parent-side thread that moves frames from every isolated station's ring to its consumers"""
+
+    def __init__(self, stations, interval=0.0005):
+        self.stations = stations # Objects with relay(now)
+        self.interval = interval
+        self.running = False
+        self.thread = None
+        self.polls = 0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="relay", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while self.running:
+            now = clock()
+            for station in self.stations:
+                station.relay(now)
+            self.polls += 1
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
@@ -0,0 +1,124 @@
+"""
+Prometheus text exposition (format 0.0.4) of the connector's counters,
+served on http://host:port/metrics. Everything is read from the trackers the
+pipeline already keeps, so metrics only cost anything when they are scraped.
+"""
+from core.connection import STATES
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class Exposition:
+    """Collects samples grouped by metric, then renders them with HELP/TYPE headers"""
+
+    def __init__(self):
+        self.metrics = {} # name -> (type, help, [(labels, value)])
+
+    def add(self, name, kind, help, value, **labels):
+        metric = self.metrics.setdefault(name, (kind, help, []))
+        metric[2].append((labels, value))
+
+    def latency(self, name, help, tracker, **labels):
+        """LatencyTracker as a summary in seconds: quantiles of the recent window, sum and count of all"""
+        for quantile in (50, 99):
+            self.add(name, "summary", help, tracker.percentile(quantile), quantile=quantile / 100.0, **labels)
+        self.add(name + "_sum", None, None, tracker.total, **labels)
+        self.add(name + "_count", None, None, tracker.count, **labels)
+
+    def render(self):
+        lines = []
+        for name, (kind, help, samples) in self.metrics.items():
+            if kind is not None:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape(v)}"' for key, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {float(value)!r}" if label_text else f"{name} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+
+def _numeric_leaves(stats, prefix=""):
+    """Flattens provider stats ({"outgauge": {"coalesced": 3}}) to ("outgauge_coalesced", 3)"""
+    for key, value in stats.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _numeric_leaves(value, name + "_")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, value
+
+
+def render(server, schedulers, processes=None):
+    """
+    Metrics for a WebSocketServer, its stations' schedulers ({stream name: FrameScheduler})
+    and isolated stations' processes ({stream name: interfaces.isolation.ProviderProcess})
+    """
+    out = Exposition()
+    out.latency("simracing_loop_lag_seconds", "Server event loop wake-up delay", server.loop_lag)
+
+    for name, scheduler in schedulers.items():
+        station = name or "default"
+        out.latency("simracing_provider_read_seconds", "Time spent in provider.get_telemetry()",
+                    scheduler.read_latency, station=station)
+        out.latency("simracing_tick_jitter_seconds", "How late a scheduler tick started against its deadline",
+                    scheduler.jitter, station=station)
+        out.add("simracing_frames_published_total", "counter", "Frames published",
+                scheduler.frames_published, station=station)
+        out.add("simracing_frames_duplicate_total", "counter", "Stale ticks: no new game frame since the last one",
+                scheduler.frames_duplicate, station=station)
+        out.add("simracing_tick_overruns_total", "counter", "Ticks that started after their deadline",
+                scheduler.overruns, station=station)
+        out.add("simracing_poll_hz", "gauge", "Provider polls per second, recent ticks",
+                scheduler.poll_rate, station=station)
+        if scheduler.cadence.period:
+            out.add("simracing_source_hz", "gauge", "Rate the game produces new frames at, as measured",
+                    scheduler.cadence.rate, station=station)
+        connection = scheduler.provider.connection
+        if connection is not None:
+            for state in STATES:
+                out.add("simracing_connection_state", "gauge", "1 for the provider's current connection state",
+                        1 if connection.state == state else 0, station=station, state=state)
+        for stat, value in _numeric_leaves(scheduler.provider.stats()):
+            # Provider specific: torn / retried / failed reads, coalesced datagrams...
+            out.add("simracing_provider_stat", "gauge", "Provider read counters (torn, skipped, coalesced...)",
+                    value, station=station, stat=stat)
+
+    for name, process in (processes or {}).items():
+        station = name or "default"
+        out.add("simracing_isolated_up", "gauge", "1 while an isolated station's process is running",
+                1 if process.alive else 0, station=station)
+        out.add("simracing_isolated_restarts_total", "counter", "Isolated station process restarts",
+                process.restarts, station=station)
+        out.latency("simracing_handoff_seconds", "Frame capture in the station process to relayed in the server",
+                    process.handoff_latency, station=station)
+        for stat, value in _numeric_leaves(process.snapshot):
+            # The child's own scheduler counters and latencies, as of its last snapshot (once a second)
+            out.add("simracing_isolated_stat", "gauge", "Isolated station counters, from the station process",
+                    value, station=station, stat=stat)
+
+    for name, stream in server.streams.items():
+        station = name or "default"
+        fanout = stream.fanout
+        out.add("simracing_frames_broadcast_total", "counter", "Frames handed to the fan-out",
+                stream.seq, station=station)
+        out.latency("simracing_queue_seconds", "publish() to broadcast loop wake-up",
+                    stream.queue_latency, station=station)
+        out.latency("simracing_encode_seconds", "Encoding one frame for one wire format",
+                    fanout.encode_latency, station=station)
+        out.latency("simracing_fanout_seconds", "Encoding and queueing a frame for every client",
+                    fanout.fanout_latency, station=station)
+        out.latency("simracing_delivery_seconds", "Frame capture to sent, all clients",
+                    fanout.delivery_latency, station=station)
+        out.add("simracing_clients", "gauge", "Connected clients", len(fanout.slots), station=station)
+        for slot in list(fanout.slots):
+            client = str(getattr(slot.websocket, "remote_address", ""))
+            out.add("simracing_client_queue_depth", "gauge", "Frames waiting in a client's slot",
+                    len(slot.pending), station=station, client=client)
+            out.add("simracing_client_lag_frames", "gauge", "Frames published but not yet sent to a client",
+                    slot.lag, station=station, client=client)
+            out.add("simracing_client_dropped_total", "counter", "Frames dropped because a client was slow",
+                    slot.dropped, station=station, client=client)
+            out.add("simracing_client_sent_total", "counter", "Frames sent to a client",
+                    slot.sent, station=station, client=client)
+    return out.render()
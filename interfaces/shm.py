@@ -0,0 +1,194 @@
+"""
+Shared-memory output for consumers on the same machine.
+
+The connector writes every published frame into a file under /dev/shm that
+local readers mmap. No sockets, framing or JSON on the way, and readers never
+block the writer (or each other).
+
+Region layout (little-endian):
+
+    header, 64 bytes
+        0   4s  magic b"SRSM"
+        4   H   layout version (VERSION)
+        6   H   wire schema version (core.encoding.SCHEMA_VERSION)
+        8   I   slot size
+        12  I   slot count
+        16  I   writer pid
+        24  Q   sequence number of the newest complete frame (0 = none yet)
+    slots, `slot count` x `slot size` bytes, frame n in slot n % count
+        0   Q   begin: n, written before the frame
+        8   d   captured_at (core.timing.clock(), CLOCK_MONOTONIC on Linux)
+        16  ... binary frame (core.encoding.FRAME, as sent to binary clients)
+        ... Q   end: n, written after the frame
+
+A frame is consistent when begin == end == n (seqlock per slot). Readers read
+end, then the frame, then begin, and drop the read if they differ: the writer
+lapped the ring while they were reading.
+"""
+import mmap
+import os
+import struct
+from core import encoding
+from core.timing import clock
+
+MAGIC = b"SRSM"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIII")
+HEADER_SIZE = 64
+SEQ_OFFSET = 24
+COUNTER = struct.Struct("<Q")
+STAMP = struct.Struct("<d")
+FRAME_OFFSET = 16
+SLOT_SIZE = (FRAME_OFFSET + encoding.FRAME.size + COUNTER.size + 63) // 64 * 64 # Whole cache lines
+END_OFFSET = SLOT_SIZE - COUNTER.size
+
+
+def shm_path(name):
+    """'simracing' -> /dev/shm/simracing; absolute paths are used as they are"""
+    if os.path.isabs(name):
+        return name
+    if not os.path.isdir("/dev/shm"):
+        raise RuntimeError("Shared-memory output needs /dev/shm (Linux); pass an absolute path instead")
+    return os.path.join("/dev/shm", name)
+
+
+class ShmWriter:
+    """Writes frames into the ring; called from the station's thread, one writer per region"""
+
+    def __init__(self, name="simracing", slots=256):
+        if slots <= 0:
+            raise ValueError("Slot count must be positive")
+        self.path = shm_path(name)
+        self.slots = slots
+        size = HEADER_SIZE + slots * SLOT_SIZE
+        # A new file renamed over the old one: readers still mapping a previous
+        # region keep a valid (if dead) mapping instead of faulting on a truncated
+        # file, and nobody opens a half-written header.
+        temp = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(temp, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self.mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        HEADER.pack_into(self.mm, 0, MAGIC, VERSION, encoding.SCHEMA_VERSION, SLOT_SIZE, slots, os.getpid())
+        COUNTER.pack_into(self.mm, SEQ_OFFSET, 0)
+        os.replace(temp, self.path)
+        self.seq = 0
+
+    def write(self, telemetry: dict, captured_at=None):
+        self.seq = seq = self.seq + 1
+        mm = self.mm
+        base = HEADER_SIZE + (seq % self.slots) * SLOT_SIZE
+        flags = encoding.FLAG_KEYFRAME | (encoding.FLAG_CONNECTED if telemetry.get("connected") else 0)
+        COUNTER.pack_into(mm, base, seq)
+        STAMP.pack_into(mm, base + 8, clock() if captured_at is None else captured_at)
+        encoding.FRAME.pack_into(mm, base + FRAME_OFFSET, encoding.MAGIC, encoding.SCHEMA_VERSION, flags,
+                                 seq & 0xFFFFFFFF, encoding.FULL_MASK, *encoding.wire_values(telemetry))
+        COUNTER.pack_into(mm, base + END_OFFSET, seq)
+        COUNTER.pack_into(mm, SEQ_OFFSET, seq) # Publish
+
+    def close(self, unlink=True):
+        self.mm.close()
+        if unlink:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        return {"path": self.path, "seq": self.seq, "slots": self.slots}
+
+
+class ShmReader:
+    """
+    Lock-free reader for a ShmWriter region, usable from any local process:
+
+        reader = ShmReader("simracing")
+        frame = reader.latest()     # newest frame dict, or None
+        for frame in reader.new():  # every frame since the last call (up to one ring)
+            ...
+
+    Frames are decoded straight from the mapping, without copying the page.
+    Each dict has the telemetry fields plus 'seq', 'connected' and 'captured_at'.
+    """
+
+    def __init__(self, name="simracing", max_retries=3):
+        self.path = shm_path(name)
+        with open(self.path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, schema, slot_size, slots, pid = HEADER.unpack_from(self.mm)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a connector shared-memory region (version {VERSION})")
+        if schema != encoding.SCHEMA_VERSION or slot_size != SLOT_SIZE:
+            raise ValueError(f"{self.path} uses schema {schema}, this reader schema {encoding.SCHEMA_VERSION}")
+        self.slots = slots
+        self.writer_pid = pid
+        self.max_retries = max_retries
+        self.last_seq = 0
+
+        self.reads = 0
+        self.torn = 0
+        self.missed = 0 # Frames overwritten before new() got to them
+
+    def head(self):
+        """Sequence number of the newest complete frame"""
+        return COUNTER.unpack_from(self.mm, SEQ_OFFSET)[0]
+
+    def read(self, seq):
+        """Frame `seq` if it is still in the ring and not being overwritten, else None"""
+        mm = self.mm
+        base = HEADER_SIZE + (seq % self.slots) * SLOT_SIZE
+        if COUNTER.unpack_from(mm, base + END_OFFSET)[0] != seq:
+            return None
+        captured_at, = STAMP.unpack_from(mm, base + 8)
+        frame = encoding.decode_binary(mm, base + FRAME_OFFSET)
+        if COUNTER.unpack_from(mm, base)[0] != seq:
+            self.torn += 1
+            return None
+        frame["seq"] = seq
+        frame["captured_at"] = captured_at
+        self.reads += 1
+        return frame
+
+    def latest(self):
+        """Newest frame, or None before the first one"""
+        for _ in range(self.max_retries + 1):
+            seq = self.head()
+            if seq == 0:
+                return None
+            frame = self.read(seq)
+            if frame is not None:
+                self.last_seq = seq
+                return frame
+        return None
+
+    def new(self):
+        """Every frame published since the previous call, oldest first"""
+        head = self.head()
+        start = max(self.last_seq + 1, head - self.slots + 2) # The slot after head may be mid-write
+        self.missed += max(0, start - self.last_seq - 1) if self.last_seq else 0
+        frames = []
+        for seq in range(start, head + 1):
+            frame = self.read(seq)
+            if frame is None:
+                self.missed += 1
+                continue
+            frames.append(frame)
+        self.last_seq = max(self.last_seq, head)
+        return frames
+
+    def writer_alive(self):
+        try:
+            os.kill(self.writer_pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def close(self):
+        self.mm.close()
+
+    def stats(self):
+        return {"reads": self.reads, "torn": self.torn, "missed": self.missed, "head": self.head()}
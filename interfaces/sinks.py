@@ -0,0 +1,285 @@
+import math
+from abc import ABC, abstractmethod
+import socket
+import struct
+from collections import deque
+from core.telemetry import NAMES, ARRAYS, DEFAULTS
+from core.timing import clock, LatencyTracker
+
+SINK_KINDS = ("udp", "serial", "local")
+
+CURVES = {
+    "linear": lambda x: x,
+    "square": lambda x: x * x,
+    "cube": lambda x: x * x * x,
+    "sqrt": math.sqrt,
+    "smoothstep": lambda x: x * x * (3.0 - 2.0 * x),
+}
+
+# Binary payload formats; anything else is a str.format() template
+BINARY_FORMATS = {"u8": struct.Struct("<B"), "u16": struct.Struct("<H"), "f32": struct.Struct("<f")}
+# Values the integer formats can hold; out= must fit, or pack() fails on live data
+INTEGER_RANGES = {"u8": (0, 255), "u16": (0, 65535)}
+
+
+def _range(text):
+    """'0..200' -> (0.0, 200.0)"""
+    low, sep, high = text.partition("..")
+    if not sep:
+        raise ValueError(f"Expected a range like 0..100, got '{text}'")
+    return float(low), float(high)
+
+
+class Mapping:
+    """
+    Turns one telemetry field into one output value:
+
+        field        "speed_kmh", or one wheel of an array: "wheel_slip[2]"
+        in_range     input range, normalized to 0..1 and clamped
+        curve        linear, square, cube, sqrt, smoothstep or an exponent
+        out_range    output range the curve's 0..1 is scaled to
+        smooth       exponential smoothing time constant in seconds (0 = off)
+
+    A disconnected frame holds the field defaults, so outputs fall to the
+    bottom of out_range when the game goes away.
+    """
+
+    def __init__(self, field="speed_kmh", in_range=(0.0, 1.0), curve="linear", out_range=(0.0, 100.0), smooth=0.0):
+        name, _, index = field.partition("[")
+        if name not in NAMES or name in ("game_name", "connected"):
+            raise ValueError(f"Unknown field: {field}")
+        self.field = field
+        self.name = name
+        self.index = int(index.rstrip("]")) if index else None
+        if name in ARRAYS:
+            size = len(DEFAULTS[name])
+            if self.index is None or not 0 <= self.index < size:
+                raise ValueError(f"{name} needs a wheel index 0..{size - 1}, e.g. {name}[0]")
+        elif self.index is not None:
+            raise ValueError(f"{name} is not a per-wheel field")
+        if in_range[0] == in_range[1]:
+            raise ValueError(f"Empty input range for {field}")
+        self.in_range = in_range
+        self.out_range = out_range
+        if curve in CURVES:
+            self.curve = CURVES[curve]
+        else:
+            try:
+                exponent = float(curve)
+            except ValueError:
+                raise ValueError(f"Unknown curve '{curve}' (expected one of {', '.join(CURVES)} or an exponent)")
+            if exponent <= 0.0:
+                raise ValueError(f"Curve exponent must be positive, got {curve}")
+            self.curve = lambda x: x ** exponent
+        self.smooth = smooth
+        self.value = None
+        self.last_time = None
+
+    def __call__(self, frame: dict, now):
+        raw = frame[self.name]
+        if self.index is not None:
+            raw = raw[self.index]
+        low, high = self.in_range
+        x = min(1.0, max(0.0, (raw - low) / (high - low)))
+        out_low, out_high = self.out_range
+        target = out_low + self.curve(x) * (out_high - out_low)
+
+        if self.smooth > 0.0 and self.value is not None:
+            alpha = 1.0 - math.exp(-(now - self.last_time) / self.smooth)
+            target = self.value + alpha * (target - self.value)
+        self.value = target
+        self.last_time = now
+        return target
+
+
+class Sink(ABC):
+    """
+    An output driven straight from the station's tick, without the WebSocket
+    hop: maps the frame, encodes the value and sends it only when the encoded
+    payload changed, at most `rate` times per second (0 = every change).
+
+    Latency is measured from frame capture to the end of the write.
+    """
+    kind = "local"
+    terminator = b""
+
+    def __init__(self, mapping, rate=0.0, format="{:.0f}"):
+        self.mapping = mapping
+        self.min_interval = 1.0 / rate if rate else 0.0
+        if format in INTEGER_RANGES:
+            low, high = INTEGER_RANGES[format]
+            if not all(low <= bound <= high for bound in mapping.out_range):
+                raise ValueError(f"Output range {mapping.out_range[0]:g}..{mapping.out_range[1]:g} "
+                                 f"does not fit format {format} ({low}..{high})")
+        if format in BINARY_FORMATS:
+            packer = BINARY_FORMATS[format]
+            rounded = format != "f32"
+            self.encode = lambda value: packer.pack(round(value) if rounded else value)
+        else:
+            template = format
+            try:
+                template.format(0.0) # A bad template would otherwise fail in the tick
+            except (KeyError, IndexError, ValueError) as e:
+                raise ValueError(f"{self.kind} sink for {mapping.field}: bad format '{format}' "
+                                 f"(expected u8, u16, f32 or a template like {{:.0f}}): {e!r}")
+            self.encode = lambda value: template.format(value).encode() + self.terminator
+        self.format = format
+        self.last_payload = None
+        self.last_sent = None
+
+        self.sent = 0
+        self.unchanged = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.latency = LatencyTracker()      # capture -> written
+        self.send_latency = LatencyTracker() # time spent in send()
+
+    def update(self, frame: dict, captured_at=None):
+        """Maps a published frame dict and sends it if the output changed. Returns True if sent."""
+        now = clock()
+        payload = self.encode(self.mapping(frame, captured_at if captured_at is not None else now))
+        if payload == self.last_payload:
+            self.unchanged += 1
+            return False
+        if self.min_interval and self.last_sent is not None and now - self.last_sent < self.min_interval:
+            # Keeps last_payload as is, so the change still goes out on a later tick
+            self.rate_limited += 1
+            return False
+        try:
+            self.send(payload)
+        except OSError:
+            self.errors += 1
+            return False
+        done = clock()
+        self.send_latency.add(done - now)
+        if captured_at is not None:
+            self.latency.add(done - captured_at)
+        self.last_payload = payload
+        self.last_sent = now
+        self.sent += 1
+        return True
+
+    @abstractmethod
+    def send(self, payload):
+        """Writes one encoded payload; raises OSError when it could not be sent"""
+        pass
+
+    def close(self):
+        pass
+
+    def describe(self):
+        return f"{self.kind} {self.mapping.field}"
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "field": self.mapping.field,
+            "value": self.mapping.value,
+            "sent": self.sent,
+            "unchanged": self.unchanged,
+            "rate_limited": self.rate_limited,
+            "errors": self.errors,
+            "latency": self.latency.summary(),
+            "send_latency": self.send_latency.summary(),
+        }
+
+
+class UdpSink(Sink):
+    """One datagram per change, e.g. to an ESP32 fan controller"""
+    kind = "udp"
+
+    def __init__(self, mapping, host="127.0.0.1", port=4210, **options):
+        super().__init__(mapping, **options)
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False) # A full send buffer drops the update instead of stalling the tick
+
+    def send(self, payload):
+        self.sock.sendto(payload, self.address)
+
+    def close(self):
+        self.sock.close()
+
+    def describe(self):
+        return f"udp {self.mapping.field} -> {self.address[0]}:{self.address[1]}"
+
+
+class SerialSink(Sink):
+    """Newline-terminated text (or raw binary) over a serial port, e.g. an Arduino"""
+    kind = "serial"
+    terminator = b"\n"
+
+    def __init__(self, mapping, device="/dev/ttyUSB0", baud=115200, **options):
+        super().__init__(mapping, **options)
+        try:
+            import serial
+        except ImportError:
+            raise RuntimeError("Serial sinks require: pip install pyserial")
+        self.device = device
+        # write_timeout=0: never block the tick on a full output buffer
+        self.port = serial.Serial(device, baud, timeout=0, write_timeout=0)
+
+    def send(self, payload):
+        try:
+            self.port.write(payload)
+        except Exception as e: # SerialTimeoutException / SerialException
+            raise OSError(str(e))
+
+    def close(self):
+        self.port.close()
+
+    def describe(self):
+        return f"serial {self.mapping.field} -> {self.device}"
+
+
+class LocalSink(Sink):
+    """Stand-in for hardware: keeps the last payloads it would have sent"""
+    kind = "local"
+
+    def __init__(self, mapping, history=1000, **options):
+        super().__init__(mapping, **options)
+        self.history = deque(maxlen=history)
+
+    def send(self, payload):
+        self.history.append(payload)
+
+
+def create_sink(spec):
+    """
+    'kind:option=value,...' -> (stream name or None, Sink), e.g.
+    'udp:host=192.168.68.80,port=4210,field=speed_kmh,in=0..200,out=0..100,rate=50'.
+
+    Mapping options: field, in, out, curve, smooth. Output options: rate,
+    format ('{:.0f}' template, or u8 / u16 / f32 binary), plus host/port (udp),
+    device/baud (serial), history (local). stream= picks the station.
+    Raises ValueError for a bad spec.
+    """
+    kind, _, rest = spec.partition(":")
+    if kind not in SINK_KINDS:
+        raise ValueError(f"Unknown sink '{kind}' (expected one of {', '.join(SINK_KINDS)})")
+    options = {}
+    for item in filter(None, rest.split(",")):
+        key, _, value = item.partition("=")
+        options[key] = value
+
+    try:
+        mapping = Mapping(options.pop("field", "speed_kmh"),
+                          _range(options.pop("in", "0..1")),
+                          options.pop("curve", "linear"),
+                          _range(options.pop("out", "0..100")),
+                          float(options.pop("smooth", 0.0)))
+        stream = options.pop("stream", None)
+        common = {"rate": float(options.pop("rate", 0.0)), "format": options.pop("format", "{:.0f}")}
+        if kind == "udp":
+            sink = UdpSink(mapping, options.pop("host", "127.0.0.1"), int(options.pop("port", 4210)), **common)
+        elif kind == "serial":
+            sink = SerialSink(mapping, options.pop("device", "/dev/ttyUSB0"), int(options.pop("baud", 115200)),
+                              **common)
+        else:
+            sink = LocalSink(mapping, int(options.pop("history", 1000)), **common)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid sink '{spec}': {e}")
+    if options:
+        sink.close()
+        raise ValueError(f"Unknown sink option(s) in '{spec}': {', '.join(options)}")
+    return stream, sink
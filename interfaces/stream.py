@@ -0,0 +1,103 @@
+import asyncio
+import json
+from collections import deque
+from core.timing import clock, LatencyTracker
+from core.history import History
+from interfaces.fanout import FanOut
+
+
+class Stream:
+    """
+    One provider's telemetry on the server: its own latest frame, sequence
+    numbers, clients and broadcast loop. Clients pick a stream by path
+    (ws://host:port/<name>); "/" is the first stream added.
+
+    publish() is called from the provider's thread; each stream has its own
+    wake-up event, so a slow provider never delays another one's frames.
+    """
+
+    def __init__(self, name, queue_depth=1, channels=None, history=0):
+        self.name = name
+        self.channels = channels # Fields the provider fills (capability manifest), None = all
+        self.fanout = FanOut(depth=queue_depth)
+        self.history = History(history) if history else None # Last frames, for late joiners
+        self.current_telemetry = {}
+        self.connection = None # Last connection event, sent to clients as they join
+        self.laps = deque(maxlen=100) # Last lap summaries, sent to clients as they join the laps channel
+        self.seq = 0
+        self.loop = None
+
+        # Set from the provider thread whenever a new frame is published
+        self.frame_ready = asyncio.Event()
+        self.frame_captured_at = None
+        self.frame_published_at = None
+
+        self.queue_latency = LatencyTracker()   # publish() -> broadcast loop wakes up
+
+    async def run(self):
+        # Sends once per published frame instead of on a timer of its own,
+        # so a frame is never delayed by a second clock or sent twice.
+        # Publishing only fills per-client slots: no client can stall the loop.
+        if self.loop is not None:
+            return # Already running
+        self.loop = asyncio.get_running_loop()
+        while True:
+            await self.frame_ready.wait()
+            self.frame_ready.clear()
+
+            self.queue_latency.add(clock() - self.frame_published_at)
+
+            if self.fanout.slots and self.current_telemetry:
+                self.seq += 1
+                self.fanout.publish(self.current_telemetry, self.seq, self.frame_captured_at)
+
+    def publish(self, telemetry_data: dict, captured_at=None):
+        self.current_telemetry = telemetry_data
+        self.frame_captured_at = captured_at
+        self.frame_published_at = clock()
+        if self.history is not None:
+            self.history.append(telemetry_data, captured_at)
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.frame_ready.set)
+
+    def publish_event(self, event: dict):
+        """Sends a connection event ({"type": "connection", "state": ...}) to every client"""
+        self.connection = event
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.fanout.notify, json.dumps(event))
+
+    def publish_lap(self, summary: dict):
+        """Sends a lap summary (core.analytics) to the clients on the laps channel"""
+        if self.loop:
+            # Appended on the loop, so a client joining the channel copies laps without a race
+            self.loop.call_soon_threadsafe(self._add_lap, summary, json.dumps(summary))
+        else:
+            self.laps.append(summary)
+
+    def _add_lap(self, summary, message):
+        self.laps.append(summary)
+        self.fanout.notify(message, "laps")
+
+    def publish_delta(self, delta: dict):
+        """Sends the live delta to the best lap to the clients on the laps channel"""
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.fanout.notify, json.dumps(delta), "laps")
+
+    def latency_stats(self):
+        return {
+            "queue": self.queue_latency.summary(),
+            "fanout": self.fanout.fanout_latency.summary(),
+            "end_to_end": self.fanout.delivery_latency.summary(),
+        }
+
+    def stats(self):
+        stats = {
+            "seq": self.seq,
+            "connection": self.connection and self.connection["state"],
+            "laps": len(self.laps),
+            "latency": self.latency_stats(),
+            "clients": self.fanout.stats(),
+        }
+        if self.history is not None:
+            stats["history"] = self.history.stats()
+        return stats
@@ -0,0 +1,122 @@
+from core.telemetry import NAMES
+
+# Fields a client may subscribe to ("connected" is always sent)
+FIELDS = tuple(name for name in NAMES if name != "connected")
+
+
+class Subscription:
+    """
+    Per-client view of the stream, set with a subscribe message:
+
+        {"type": "subscribe",
+         "fields": ["speed_kmh"],          # default: all fields
+         "max_rate": 20,                   # Hz, default: every frame
+         "deadband": {"speed_kmh": 0.5},   # only send a field when it moves more than this
+                                           # (per-wheel arrays: when any wheel does)
+         "delta": true,                    # only send changed fields (default true)
+         "keyframe_interval": 1.0,         # seconds between full frames
+         "resample": true}                 # with max_rate: average the frames of each interval
+                                           # instead of sending the latest one
+
+    select() decides, per frame, whether this client gets anything and which fields.
+    """
+
+    def __init__(self, fields=None, max_rate=None, deadband=None, delta=True, keyframe_interval=1.0,
+                 resample=False):
+        self.fields = tuple(fields) if fields else FIELDS
+        # A resampled subscription is paced by its shared Decimator, not by min_interval
+        self.rate = max_rate if resample else None
+        self.decimator_seq = None
+        self.min_interval = 1.0 / max_rate if max_rate and not resample else 0.0
+        self.deadband = dict(deadband or {})
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval
+
+        self.last_values = {}
+        self.last_connected = None
+        self.last_sent = None
+        self.last_keyframe = None
+
+    @classmethod
+    def from_message(cls, message: dict):
+        """Builds a subscription from a client message. Raises ValueError if invalid."""
+        fields = message.get("fields")
+        if fields is not None:
+            if not isinstance(fields, list):
+                raise ValueError("'fields' must be a list")
+            unknown = [name for name in fields if name not in FIELDS]
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(map(str, unknown))}")
+
+        max_rate = message.get("max_rate")
+        if max_rate is not None and (not isinstance(max_rate, (int, float)) or max_rate <= 0):
+            raise ValueError("'max_rate' must be a positive number")
+
+        deadband = message.get("deadband") or {}
+        if not isinstance(deadband, dict) or not all(isinstance(v, (int, float)) for v in deadband.values()):
+            raise ValueError("'deadband' must map field names to numbers")
+
+        keyframe_interval = message.get("keyframe_interval", 1.0)
+        if not isinstance(keyframe_interval, (int, float)) or keyframe_interval <= 0:
+            raise ValueError("'keyframe_interval' must be a positive number")
+
+        resample = bool(message.get("resample", False))
+        if resample and max_rate is None:
+            raise ValueError("'resample' needs a 'max_rate'")
+
+        return cls(fields, max_rate, deadband, bool(message.get("delta", True)), keyframe_interval, resample)
+
+    def describe(self):
+        return {
+            "type": "subscribed",
+            "fields": list(self.fields),
+            "max_rate": self.rate or (1.0 / self.min_interval if self.min_interval else None),
+            "deadband": self.deadband,
+            "delta": self.delta,
+            "keyframe_interval": self.keyframe_interval,
+            "resample": self.rate is not None,
+        }
+
+    def _moved(self, name, value):
+        last = self.last_values.get(name)
+        if last is None:
+            return True
+        epsilon = self.deadband.get(name)
+        if epsilon is not None:
+            if isinstance(value, (int, float)):
+                return abs(value - last) > epsilon
+            if isinstance(value, tuple):
+                # Per-wheel arrays: any wheel past the deadband sends all four
+                return any(abs(a - b) > epsilon for a, b in zip(value, last))
+        return value != last
+
+    def select(self, telemetry: dict, now, force_keyframe=False):
+        """
+        Returns (fields, keyframe) to send for this frame, or None to skip it.
+        force_keyframe is used when an earlier delta for this client was dropped.
+        """
+        if self.last_sent is not None and now - self.last_sent < self.min_interval:
+            return None
+
+        connected = telemetry.get("connected")
+        keyframe = (force_keyframe
+                    or self.last_keyframe is None
+                    or connected != self.last_connected
+                    or now - self.last_keyframe >= self.keyframe_interval)
+
+        if keyframe:
+            selected = {name: telemetry.get(name) for name in self.fields}
+            self.last_keyframe = now
+        else:
+            changed = [name for name in self.fields if self._moved(name, telemetry.get(name))]
+            if not changed:
+                return None
+            if self.delta:
+                selected = {name: telemetry.get(name) for name in changed}
+            else:
+                selected = {name: telemetry.get(name) for name in self.fields}
+
+        self.last_values.update(selected)
+        self.last_connected = connected
+        self.last_sent = now
+        return selected, keyframe
@@ -1,39 +1,229 @@
 import asyncio
+import http
 import json
 import websockets
 import threading
+from urllib.parse import urlparse, parse_qs
+from core import encoding
+from core.timing import clock, LatencyTracker
+from interfaces.stream import Stream
+from interfaces.subscription import Subscription
 
 class WebSocketServer:
-    def __init__(self, port=8765):
+    def __init__(self, port=8765, queue_depth=1, history=0):
         self.port = port
+        self.queue_depth = queue_depth
+        self.history = history # Frames kept per stream for history queries, 0 = off
         self.connected_clients = set()
-        self.current_telemetry = {}
+        self.streams = {} # name -> Stream, one per provider
+        self.default_stream = None # Served on "/", the first stream added
         self.loop = None
         self.thread = None
+        self.stats_providers = {} # name -> callable returning a dict, shown on /stats
+        # Plain HTTP GETs (no WebSocket upgrade): path -> callable(query) returning (content type, text)
+        self.http_routes = {"/stats": lambda query: ("application/json", json.dumps(self.stats()))}
+        self.loop_lag = LatencyTracker() # How late the event loop wakes up a timer
+
+    def add_stream(self, name, channels=None):
+        """Adds a provider stream, served on ws://host:port/<name>"""
+        if name in self.streams or name == "stats":
+            raise ValueError(f"Stream name '{name}' is already in use")
+        stream = Stream(name, self.queue_depth, channels, self.history)
+        self.streams[name] = stream
+        if self.default_stream is None:
+            self.default_stream = stream
+        if self.loop:
+            self.loop.call_soon_threadsafe(lambda: self.loop.create_task(stream.run()))
+        return stream
+
+    @property
+    def fanout(self):
+        """Clients of the default stream"""
+        return self.default_stream.fanout
+
+    @staticmethod
+    def _request_path(websocket):
+        # websockets >= 13 exposes the handshake request, older versions the path
+        request = getattr(websocket, "request", None)
+        return request.path if request is not None else getattr(websocket, "path", "/")
+
+    @staticmethod
+    def _select_subprotocol(*args):
+        # Accept our subprotocols but don't reject clients that offer none.
+        # websockets >= 14 passes (connection, offered), older versions (offered, supported).
+        offered = args[0] if isinstance(args[0], (list, tuple)) else args[1]
+        for protocol in offered:
+            if protocol in encoding.SUBPROTOCOLS:
+                return protocol
+        return None
+
+    async def _process_request(self, *args):
+        """
+        Answers plain HTTP requests (/metrics, /stats, ...) on the WebSocket port.
+        websockets >= 13 passes (connection, request), older versions (path, headers).
+        """
+        if isinstance(args[0], str):
+            connection, path, headers = None, args[0], args[1]
+        else:
+            connection, path, headers = args[0], args[1].path, args[1].headers
+        url = urlparse(path)
+        route = self.http_routes.get(url.path)
+        if route is None or "upgrade" in headers.get("Connection", "").lower():
+            return None # Carry on with the WebSocket handshake
+        try:
+            result = route(parse_qs(url.query))
+            if asyncio.iscoroutine(result):
+                result = await result
+            status, (content_type, body) = http.HTTPStatus.OK, result
+        except ValueError as e:
+            status, content_type, body = http.HTTPStatus.BAD_REQUEST, "text/plain", f"{e}\n"
+        if connection is None:
+            return status, [("Content-Type", content_type)], body.encode()
+        response = connection.respond(status, body)
+        response.headers["Content-Type"] = content_type
+        return response
+
+    async def monitor_loop(self, interval=0.1):
+        """Measures event loop lag: how much later than asked a sleep returns"""
+        while True:
+            start = clock()
+            await asyncio.sleep(interval)
+            self.loop_lag.add(max(0.0, clock() - start - interval))
+
+    def negotiate_format(self, websocket):
+        """Wire format from the negotiated subprotocol, else ?format=, else JSON"""
+        fmt = encoding.SUBPROTOCOLS.get(websocket.subprotocol)
+        if fmt is None:
+            query = parse_qs(urlparse(self._request_path(websocket)).query)
+            fmt = query.get("format", ["json"])[0]
+        if fmt not in encoding.FORMATS:
+            fmt = "json"
+        if fmt == "msgpack" and encoding.msgpack is None:
+            print("MessagePack requested but 'msgpack' is not installed, using JSON")
+            fmt = "json"
+        return fmt
+
+    def select_stream(self, websocket):
+        """Stream from the path (/<name>) or ?stream=, else the default stream. None if unknown."""
+        url = urlparse(self._request_path(websocket))
+        name = url.path.strip("/") or parse_qs(url.query).get("stream", [""])[0]
+        if not name:
+            return self.default_stream
+        return self.streams.get(name)
 
     async def register(self, websocket):
+        if urlparse(self._request_path(websocket)).path == "/stats":
+            await self.stats_stream(websocket)
+            return
+
+        stream = self.select_stream(websocket)
+        if stream is None:
+            await websocket.send(json.dumps({"type": "error", "message": "Unknown stream, available: "
+                                             + ", ".join(name or "/" for name in self.streams)}))
+            await websocket.close()
+            return
+
+        fmt = self.negotiate_format(websocket)
+        if fmt == "binary":
+            await websocket.send(json.dumps(self.schema(stream)))
+        slot = stream.fanout.add(websocket, fmt)
+        if stream.connection is not None:
+            slot.notify(json.dumps(stream.connection)) # Where the game is, before the first frame
         self.connected_clients.add(websocket)
-        print(f"New Client Connected. Total: {len(self.connected_clients)}")
+        print(f"New Client Connected ({fmt}{', ' + stream.name if stream.name else ''}). "
+              f"Total: {len(self.connected_clients)}")
+        # One long-lived sender per connection; it ends when a send fails
+        sender = asyncio.ensure_future(stream.fanout.pump(slot))
         try:
-            await websocket.wait_closed()
+            async for message in websocket:
+                await self.handle_message(websocket, slot, message, stream)
+        except websockets.exceptions.ConnectionClosed:
+            pass
         finally:
+            sender.cancel()
+            stream.fanout.remove(slot)
             self.connected_clients.remove(websocket)
             print(f"Client Disconnected. Total: {len(self.connected_clients)}")
 
-    async def broadcast_loop(self):
-        while True:
-            if self.connected_clients and self.current_telemetry:
-                message = json.dumps(self.current_telemetry)
-                # Create tasks for sending to all clients
-                tasks = [asyncio.create_task(ws.send(message)) for ws in self.connected_clients]
-                if tasks:
-                    await asyncio.wait(tasks)
-            await asyncio.sleep(0.016) # ~60 Hz
+    def schema(self, stream):
+        schema = encoding.schema(stream.channels)
+        schema["stream"] = stream.name
+        schema["streams"] = list(self.streams)
+        return schema
+
+    async def handle_message(self, websocket, slot, message, stream):
+        """Client -> server control messages (JSON text)"""
+        try:
+            request = json.loads(message)
+            if not isinstance(request, dict):
+                raise ValueError("Expected a JSON object")
+            kind = request.get("type")
+            if kind == "subscribe":
+                stream.fanout.subscribe(slot, Subscription.from_message(request))
+                await websocket.send(json.dumps(slot.subscription.describe()))
+            elif kind == "schema":
+                # Capability manifest: wire layout + the channels the provider fills
+                await websocket.send(json.dumps(self.schema(stream)))
+            elif kind == "history":
+                await self.send_history(websocket, stream, request)
+            elif kind == "laps":
+                # Lap summaries and the live delta (core.analytics) as they happen
+                if request.get("enabled", True):
+                    slot.channels.add("laps")
+                    await websocket.send(json.dumps({"type": "laps", "laps": list(stream.laps)}))
+                else:
+                    slot.channels.discard("laps")
+                    await websocket.send(json.dumps({"type": "laps", "enabled": False}))
+            elif kind == "unsubscribe":
+                stream.fanout.subscribe(slot, None)
+                await websocket.send(json.dumps({"type": "unsubscribed"}))
+            else:
+                raise ValueError(f"Unknown message type: {kind}")
+        except ValueError as e:
+            # json.JSONDecodeError is a ValueError too
+            await websocket.send(json.dumps({"type": "error", "message": str(e)}))
+
+    async def send_history(self, websocket, stream, request):
+        """
+        {"type": "history", "fields": [...], "seconds": 30, "points": 300, "reduce": "mean"}
+        -> a JSON description, then one binary message with the arrays (core.history)
+        """
+        if stream.history is None:
+            raise ValueError("History is disabled on this server (--history 0)")
+        seconds = request.get("seconds", 30.0)
+        points = request.get("points")
+        if not isinstance(seconds, (int, float)) or seconds <= 0:
+            raise ValueError("'seconds' must be a positive number")
+        if points is not None and (not isinstance(points, int) or points <= 0):
+            raise ValueError("'points' must be a positive integer")
+        fields = request.get("fields")
+        if fields is not None and not isinstance(fields, list):
+            raise ValueError("'fields' must be a list")
+        columns, count, message = stream.history.query(fields, seconds, points, request.get("reduce", "mean"))
+        await websocket.send(json.dumps({"type": "history", "columns": ["t"] + list(columns), "points": count,
+                                         "dtype": "float32", "seconds": seconds}))
+        await websocket.send(message)
+
+    async def stats_stream(self, websocket):
+        """ws://host:port/stats receives the server stats as JSON once per second"""
+        try:
+            while True:
+                await websocket.send(json.dumps(self.stats()))
+                await asyncio.sleep(1.0)
+        except websockets.exceptions.ConnectionClosed:
+            pass
 
     async def start(self):
-        async with websockets.serve(self.register, "0.0.0.0", self.port):
+        if self.default_stream is None:
+            self.add_stream("")
+        async with websockets.serve(self.register, "0.0.0.0", self.port,
+                                    select_subprotocol=self._select_subprotocol,
+                                    process_request=self._process_request):
             print(f"WebSocket Server running on ws://0.0.0.0:{self.port}")
-            await self.broadcast_loop()
+            for stream in list(self.streams.values()):
+                asyncio.ensure_future(stream.run())
+            asyncio.ensure_future(self.monitor_loop())
+            await asyncio.Future() # Serve until the process exits
 
     def _run(self):
         self.loop = asyncio.new_event_loop()
@@ -44,5 +234,20 @@ class WebSocketServer:
         self.thread = threading.Thread(target=self._run, daemon=True)
         self.thread.start()
 
-    def broadcast(self, telemetry_data: dict):
-        self.current_telemetry = telemetry_data
+    def broadcast(self, telemetry_data: dict, captured_at=None, stream=None):
+        """Publishes a frame on a stream (by name), the default stream if None"""
+        (self.streams[stream] if stream is not None else self.default_stream).publish(telemetry_data, captured_at)
+
+    def latency_stats(self):
+        """Latency of the default stream"""
+        return self.default_stream.latency_stats()
+
+    def stats(self):
+        if len(self.streams) == 1:
+            stats = self.default_stream.stats()
+        else:
+            stats = {"streams": {name: stream.stats() for name, stream in self.streams.items()}}
+        stats["loop_lag"] = self.loop_lag.summary()
+        for name, provider in self.stats_providers.items():
+            stats[name] = provider()
+        return stats
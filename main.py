@@ -1,82 +1,517 @@
 import argparse
+import asyncio
+import os
 import time
 import json
 import sys
+import signal
+from concurrent.futures import ThreadPoolExecutor
 from interfaces.websocket_server import WebSocketServer
-from core.telemetry import TelemetryData
+from core.telemetry import TelemetryData, NAMES
+from core.scheduler import FrameScheduler
+from core.timing import clock
+from core.recorder import CODECS, create_recorder
+from interfaces.sinks import create_sink
+from interfaces.shm import ShmWriter
+from interfaces.isolation import ProviderProcess, Relay, watch
+from core.processing import Processor, parse_filter, derived_channels
+from core.analytics import LapAnalytics
+from core import profiler
+from interfaces import metrics
 
-# Provider Imports
-from providers.test_provider import TestProvider
-from providers.iracing import IRacingProvider
-from providers.assetto_corsa import AssettoCorsaProvider
-from providers.rfactor import RFactorProvider
-from providers.beamng import BeamNGProvider
+from providers import registry
+
+def create_provider(game, options=None):
+    """Imports and initializes the game's provider. Returns None for an unknown game. options: parsed CLI args."""
+    try:
+        return registry.create(game, options)
+    except (ValueError, RuntimeError, OSError) as e:
+        print(e)
+        sys.exit(1)
+
+def list_games():
+    """Prints every known game from the registry metadata, without importing any provider"""
+    for info in registry.games().values():
+        missing = info.missing()
+        note = f" (needs: pip install {' '.join(missing)})" if missing else ""
+        print(f"{info.name:<10} {info.description}{note}")
+
+# Options a --game spec may override for its own station
+STATION_OPTIONS = ("fps", "mode", "poll_hz", "udp_port", "outsim_port", "layout", "file", "speed", "loop", "start",
+                   "record", "record_raw", "record_codec", "upsample", "shm", "isolate", "sectors")
+
+def parse_fps(text):
+    """--fps value: a rate in Hz, or 'auto' to follow the game's own rate"""
+    if text == "auto":
+        return text
+    try:
+        fps = int(text)
+    except ValueError:
+        fps = 0
+    if fps <= 0:
+        raise ValueError(f"fps must be a positive integer or auto, got '{text}'")
+    return fps
+
+def parse_game_spec(spec, defaults):
+    """
+    '[name=]game[:option=value,...]' -> (name, game, options), e.g.
+    'ac', 'pit2=beamng:udp_port=4445' or 'replay:file=s.strec,speed=2'.
+    options is a copy of the global CLI options with the spec's overrides.
+    """
+    head, _, rest = spec.partition(":")
+    name, sep, game = head.partition("=")
+    if not sep:
+        game = name
+    options = argparse.Namespace(**vars(defaults))
+    for item in filter(None, rest.split(",")):
+        key, _, text = item.partition("=")
+        key = key.replace("-", "_")
+        if key not in STATION_OPTIONS:
+            raise ValueError(f"Unknown option '{key}' in '{spec}' (expected one of {', '.join(STATION_OPTIONS)})")
+        default = getattr(defaults, key)
+        if key == "fps":
+            value = parse_fps(text)
+        elif isinstance(default, bool):
+            value = text.lower() in ("", "1", "true", "yes")
+        elif isinstance(default, (int, float)):
+            value = type(default)(text)
+        else:
+            value = text
+        setattr(options, key, value)
+    return name, game, options
+
+def station_record_path(path, name, count):
+    """One recording per station when several share --record: session.strec -> session.<name>.strec"""
+    if count == 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{name}{ext or '.strec'}"
+
+def station_shm_name(shm, name, count):
+    """One region per station when several share --shm: simracing -> simracing.<name>"""
+    return shm if count == 1 else f"{shm}.{name}"
+
+def create_analytics(game_name, channels, sectors):
+    """Lap analytics for a station, or None if it is off or the provider has no lap channels"""
+    if sectors <= 0 or not ("lap_distance_pct" in channels or "lap" in channels):
+        return None
+    return LapAnalytics(game_name, distance="lap_distance_pct" in channels, sectors=sectors)
+
+def publish_laps(analytics, stream, data, captured_at):
+    """Feeds a published frame to the lap analytics and sends what it produced on the laps channel"""
+    summary = analytics.update(data, captured_at)
+    if summary:
+        stream.publish_lap(summary)
+    delta = analytics.live(captured_at)
+    if delta:
+        stream.publish_delta(delta)
+
+class Station:
+    """
+    One provider with its own scheduler, stream on the server and optional recorder.
+    Without a server (isolated station, child process side) frames go to the
+    handoff ring and connection events to the events queue instead.
+    """
+
+    def __init__(self, name, game, provider, options, server, record_path=None, filters=None, shm=None,
+                 handoff=None, events=None):
+        self.name = name
+        self.game = game
+        self.provider = provider
+        self.processor = Processor(filters, upsample=options.upsample)
+        self.last_frame_id = None
+        self.channels = channels = tuple(provider.channels) + derived_channels(provider.channels)
+        self.stream = server.add_stream(name, channels) if server else None
+        # Isolated: the server process runs the analytics on the frames it relays
+        self.analytics = create_analytics(provider.game_name, channels, options.sectors) if server else None
+        self.recorder = None
+        self.sinks = []
+        self.shm = ShmWriter(shm) if shm else None
+        self.handoff = ShmWriter(handoff) if handoff else None
+        self.events = events
+        if self.shm:
+            print(f"Shared memory for {name}: {self.shm.path}")
+        if record_path:
+            self.recorder = create_recorder(provider, record_path, options.record_raw, options.record_codec, channels)
+            print(f"Recording {name} to {record_path} ({self.recorder.kind}, {options.record_codec})")
+        # --fps auto: poll at the rate the game produces frames (the nominal 60 is for providers without a frame signal)
+        auto = options.fps == "auto"
+        self.scheduler = FrameScheduler(provider, self.publish, fps=60 if auto else options.fps,
+                                        mode="auto" if auto else options.mode,
+                                        poll_hz=options.poll_hz, on_event=self.connection_event)
+
+    def publish(self, telemetry: TelemetryData, captured_at):
+        frame_id = self.provider.frame_id
+        new_frame = frame_id is None or frame_id != self.last_frame_id
+        self.last_frame_id = frame_id
+        # Filters and derived channels once per frame, shared by every consumer below
+        data = self.processor.process(telemetry.to_dict(), captured_at, new_frame)
+        # Hardware outputs first: they are the latency-critical consumers
+        for sink in self.sinks:
+            sink.update(data, captured_at)
+        if self.shm:
+            self.shm.write(data, captured_at)
+        if self.handoff:
+            self.handoff.write(data, captured_at)
+        if self.stream:
+            self.stream.publish(data, captured_at)
+        if self.analytics:
+            publish_laps(self.analytics, self.stream, data, captured_at)
+        recorder = self.recorder
+        if recorder:
+            if recorder.kind == "raw":
+                page = self.provider.snapshot()
+                if page is not None:
+                    recorder.record_page(page, captured_at)
+            else:
+                recorder.record(data, captured_at)
+
+    def connection_event(self, event):
+        """Provider connection state changes, for clients and the console"""
+        if self.events:
+            self.events.put(("event", event)) # Isolated: the server process prints and forwards it
+            return
+        self.stream.publish_event(event)
+        reason = f" ({event['reason']})" if event["reason"] else ""
+        print(f"\n{self.name or self.game}: {event['previous']} -> {event['state']}{reason}")
+
+    def status(self):
+        telemetry = self.scheduler.latest
+        if telemetry is None or not telemetry.connected:
+            connection = self.provider.connection
+            if connection is not None:
+                wait = max(0.0, connection.next_probe - clock())
+                return f"Waiting for {self.game} ({connection.state}, next look in {wait:.1f}s)..."
+            return f"Waiting for {self.game}..."
+        return f"{telemetry.game_name} | Speed: {telemetry.speed_kmh:.1f} km/h | RPM: {telemetry.rpm:.0f}"
+
+    @property
+    def connected(self):
+        return self.scheduler.latest is not None and self.scheduler.latest.connected
+
+    def stats(self):
+        stats = self.scheduler.stats()
+        stats["processing"] = self.processor.stats()
+        if self.analytics:
+            stats["laps"] = self.analytics.stats()
+        if self.recorder:
+            stats["recorder"] = self.recorder.stats()
+        if self.sinks:
+            stats["sinks"] = [sink.stats() for sink in self.sinks]
+        return stats
+
+    def close(self):
+        self.provider.close()
+        if self.recorder:
+            self.recorder.close()
+            print(f"Saved {self.recorder.path}: {self.recorder.stats()}")
+        for sink in self.sinks:
+            sink.close()
+        if self.shm:
+            self.shm.close()
+        if self.handoff:
+            self.handoff.close()
+
+def run_isolated(handoff, events, stop, name, game, options, filters, record_path, shm):
+    """Child process of an isolated station: provider, scheduler and processing up to the handoff ring"""
+    provider = create_provider(game, options)
+    if provider is None:
+        print(f"Unknown game: {game}")
+        sys.exit(1)
+    station = Station(name, game, provider, options, None, record_path, [parse_filter(spec) for spec in filters],
+                      shm, handoff=handoff, events=events)
+    events.put(("ready", (handoff, provider.game_name, station.channels)))
+    # timeout / kill / service managers signal the whole process group: close the ring on the way out
+    signal.signal(signal.SIGTERM, lambda signum, frame: station.scheduler.stop())
+    # So does Ctrl+C in a terminal: the parent stops the child through `stop` once it has shut down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    watch(stop, events, station.stats, station.scheduler)
+    try:
+        station.scheduler.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        station.close()
+
+class IsolatedStation:
+    """
+    Server side of a station whose provider runs in its own process (--isolate).
+    The child is restarted when it dies; frames arrive through a shared-memory
+    ring and the relay thread hands them to the sinks and the stream.
+    """
+
+    def __init__(self, name, game, options, server, record_path=None, filters=(), shm=None):
+        self.name = name
+        self.game = game
+        self.stream = server.add_stream(name, None) # Channels arrive with the child's "ready"
+        self.sinks = []
+        self.latest = None
+        self.sectors = options.sectors
+        self.analytics = None # Created when the child reports its channels
+        self.process = ProviderProcess(name, run_isolated, (name, game, options, list(filters), record_path, shm))
+
+    def start(self):
+        self.process.start()
+
+    def relay(self, now):
+        """Called from the relay thread: moves new frames and events from the child to the consumers"""
+        process = self.process
+        for event in process.poll_events(now):
+            self.stream.publish_event(event)
+            reason = f" ({event['reason']})" if event["reason"] else ""
+            print(f"\n{self.name or self.game}: {event['previous']} -> {event['state']}{reason}")
+        if process.channels is not None and self.stream.channels is None:
+            self.stream.channels = tuple(process.channels)
+            self.analytics = create_analytics(process.game_name, process.channels, self.sectors)
+        for frame in process.frames():
+            captured_at = frame["captured_at"]
+            frame["game_name"] = process.game_name
+            data = {name: frame[name] for name in NAMES}
+            for sink in self.sinks:
+                sink.update(data, captured_at)
+            self.stream.publish(data, captured_at)
+            if self.analytics:
+                publish_laps(self.analytics, self.stream, data, captured_at)
+            self.latest = data
+
+    @property
+    def connected(self):
+        return self.latest is not None and self.latest["connected"]
+
+    def supervise(self):
+        message = self.process.supervise()
+        if message:
+            print(f"\n{message}")
+
+    def status(self):
+        data = self.latest
+        if data is None or not data["connected"]:
+            return f"Waiting for {self.game}{'' if self.process.alive else ' (process down)'}..."
+        return f"{data['game_name']} | Speed: {data['speed_kmh']:.1f} km/h | RPM: {data['rpm']:.0f}"
+
+    def stats(self):
+        stats = self.process.stats()
+        if self.analytics:
+            stats["laps"] = self.analytics.stats()
+        if self.sinks:
+            stats["sinks"] = [sink.stats() for sink in self.sinks]
+        return stats
+
+    def close(self):
+        self.process.stop()
+        for sink in self.sinks:
+            sink.close()
+
+def profile_route(sampler):
+    """/profile?seconds=5&format=collapsed|top: samples every thread, off the event loop"""
+    async def route(query):
+        seconds = float(query.get("seconds", ["5"])[0])
+        if not 0 < seconds <= 60:
+            raise ValueError("seconds must be in (0, 60]")
+        fmt = query.get("format", ["collapsed"])[0]
+        if fmt not in ("collapsed", "top"):
+            raise ValueError("format must be collapsed or top")
+        counts = await asyncio.get_running_loop().run_in_executor(None, sampler.sample, seconds)
+        return "text/plain", profiler.collapsed(counts) if fmt == "collapsed" else profiler.top(counts)
+    return route
 
 def main():
     parser = argparse.ArgumentParser(description="SimRacing Universal Connector")
-    parser.add_argument("--game", required=True, help="Game to connect to (iracing, ac, rfactor, beamng, test)")
-    parser.add_argument("--fps", type=int, default=60, help="Target update rate (FPS)")
+    parser.add_argument("--game", action="append",
+                        help="Game to connect to (iracing, ac, rfactor, beamng, test, replay, see --list-games). "
+                             "Repeat to run several stations, each as [name=]game[:option=value,...] "
+                             "on ws://host:port/<name>")
+    parser.add_argument("--list-games", action="store_true",
+                        help="List the available games, including ones installed as plugins, and exit")
+    parser.add_argument("--fps", type=parse_fps, default=60,
+                        help="Target update rate (FPS), or auto: measure the game's frame rate and poll in step with it "
+                             "(at most --poll-hz)")
+    parser.add_argument("--mode", choices=["fixed", "event"], default="fixed",
+                        help="fixed: publish every 1/fps. event: publish once per new game frame")
+    parser.add_argument("--poll-hz", type=int, default=1000, help="Poll rate used by --mode event")
     parser.add_argument("--port", type=int, default=8765, help="WebSocket Port")
+    parser.add_argument("--queue-depth", type=int, default=1,
+                        help="Frames buffered per client before the oldest is dropped")
+    parser.add_argument("--history", type=int, default=16384,
+                        help="Frames kept per station for history queries from late-joining clients, 0 = off")
+    parser.add_argument("--record", help="Record every published frame to this .strec file")
+    parser.add_argument("--record-raw", action="store_true",
+                        help="Record the provider's raw page instead of the normalized fields")
+    parser.add_argument("--record-codec", choices=CODECS, default="none", help="Chunk compression")
+    parser.add_argument("--layout", help="rFactor layout file (written by rfactor_inspect.py)")
+    parser.add_argument("--udp-port", type=int, default=4444, help="BeamNG OutGauge UDP port")
+    parser.add_argument("--outsim-port", type=int, default=0, help="BeamNG OutSim (motion) UDP port, 0 = off")
+    parser.add_argument("--sink", action="append", default=[],
+                        help="Drive an output from the tick: udp|serial|local:field=speed_kmh,in=0..200,out=0..100,"
+                             "curve=...,smooth=...,rate=...,format=...,host=...,port=...,device=...,baud=...,"
+                             "stream=<station>. Repeatable")
+    parser.add_argument("--filter", action="append", default=[],
+                        help="Filter a field for every consumer: field=lowpass:cutoff=HZ or "
+                             "field=one_euro:min_cutoff=HZ,beta=B. Repeatable")
+    parser.add_argument("--upsample", action="store_true",
+                        help="With --mode fixed above the game's rate: interpolate between game frames "
+                             "(adds one game frame of delay) instead of repeating them")
+    parser.add_argument("--sectors", type=int, default=3,
+                        help="Sectors per lap for the lap analytics sent on the laps channel, 0 = off")
+    parser.add_argument("--profile", action="store_true",
+                        help="Enable http://host:port/profile?seconds=N, a sampling profile of the running connector")
+    parser.add_argument("--isolate", action="store_true",
+                        help="Run each station's provider, scheduler and processing in its own process, "
+                             "restarted if it dies; frames reach the server through a shared-memory ring")
+    parser.add_argument("--shm", help="Also publish every frame to this shared-memory region (/dev/shm/<name>) "
+                                      "for local readers (interfaces.shm.ShmReader)")
+    parser.add_argument("--file", help="Recording to play with --game replay")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay speed: 1 = real time, N = N times faster, 0 = as fast as possible")
+    parser.add_argument("--loop", action="store_true", help="Restart the replay when it ends")
+    parser.add_argument("--start", type=float, default=0.0, help="Replay start position (seconds)")
     
     args = parser.parse_args()
-    
-    # Initialize Provider
-    provider = None
-    if args.game == 'test':
-        provider = TestProvider()
-    elif args.game == 'iracing':
-        provider = IRacingProvider()
-        # print("iRacing implementation pending migration.")
-        # sys.exit(1)
-    elif args.game == 'ac':
-        provider = AssettoCorsaProvider()
-        # print("Assetto Corsa implementation pending migration.")
-        # sys.exit(1)
-    elif args.game == 'rfactor':
-        provider = RFactorProvider()
-        # print("rFactor implementation pending migration.")
-        # sys.exit(1)
-    elif args.game == 'beamng':
-        provider = BeamNGProvider()
-        # print("BeamNG implementation pending migration.")
-        # sys.exit(1)
-    else:
-        print(f"Unknown game: {args.game}")
-        sys.exit(1)
-        
+    if args.list_games:
+        list_games()
+        return
+    if not args.game:
+        parser.error("--game is required (see --list-games)")
+
+    specs = []
+    for spec in args.game:
+        try:
+            name, game, options = parse_game_spec(spec, args)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+        if options.mode not in ("fixed", "event"):
+            print(f"Unknown mode '{options.mode}' in '{spec}'")
+            sys.exit(1)
+        if any(name == other for other, _, _ in specs):
+            name = f"{name}-{len(specs) + 1}"
+        specs.append((name, game, options))
+
+    for spec in args.filter:
+        try:
+            parse_filter(spec) # Fail before anything starts
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+
     # Start Server
-    server = WebSocketServer(port=args.port)
+    server = WebSocketServer(port=args.port, queue_depth=args.queue_depth, history=args.history)
+    stations = []
+    for name, game, options in specs:
+        record_path = options.record and station_record_path(options.record, name, len(specs))
+        shm = options.shm and station_shm_name(options.shm, name, len(specs))
+        if options.isolate:
+            # The provider is created in the station's own process
+            if registry.get(game) is None:
+                print(f"Unknown game: {game}")
+                sys.exit(1)
+            stations.append(IsolatedStation(name, game, options, server, record_path, args.filter, shm))
+            continue
+        provider = create_provider(game, options)
+        if provider is None:
+            print(f"Unknown game: {game}")
+            sys.exit(1)
+        # Filters keep state, so every station gets its own instances
+        station_filters = [parse_filter(spec) for spec in args.filter]
+        try:
+            stations.append(Station(name, game, provider, options, server, record_path, station_filters, shm))
+        except (OSError, RuntimeError) as e:
+            print(e)
+            sys.exit(1)
+    local = [station for station in stations if isinstance(station, Station)]
+    isolated = [station for station in stations if isinstance(station, IsolatedStation)]
+
+    for spec in args.sink:
+        try:
+            name, sink = create_sink(spec)
+        except (ValueError, RuntimeError, OSError) as e:
+            print(e)
+            sys.exit(1)
+        station = next((s for s in stations if s.name == name), None) if name else stations[0]
+        if station is None:
+            print(f"Unknown station '{name}' in --sink {spec}")
+            sys.exit(1)
+        station.sinks.append(sink)
+        print(f"Sink on {station.name or station.game}: {sink.describe()}")
     server.start_server()
-    
-    print(f"Connector started for {args.game}. Broadcasting on port {args.port}...")
-    
-    # Main Loop
-    interval = 1.0 / args.fps
-    
+
+    if len(stations) == 1 and local:
+        station = stations[0]
+        server.stats_providers["scheduler"] = station.scheduler.stats
+        if station.recorder:
+            server.stats_providers["recorder"] = station.recorder.stats
+        if station.sinks:
+            server.stats_providers["sinks"] = lambda: [sink.stats() for sink in station.sinks]
+        if station.shm:
+            server.stats_providers["shm"] = station.shm.stats
+        server.stats_providers["processing"] = station.processor.stats
+    elif len(stations) == 1:
+        server.stats_providers["isolated"] = stations[0].stats
+    else:
+        server.stats_providers["schedulers"] = lambda: {s.name: s.scheduler.stats() for s in local}
+        server.stats_providers["recorders"] = lambda: {s.name: s.recorder.stats() for s in local if s.recorder}
+        server.stats_providers["sinks"] = lambda: {s.name: [sink.stats() for sink in s.sinks] for s in stations if s.sinks}
+        server.stats_providers["processing"] = lambda: {s.name: s.processor.stats() for s in local}
+        if isolated:
+            server.stats_providers["isolated"] = lambda: {s.name: s.process.stats() for s in isolated}
+    if len(stations) == 1:
+        print(f"Connector started for {stations[0].game}. Broadcasting on port {args.port}...")
+    else:
+        print(f"Connector started for {len(stations)} stations on port {args.port}: "
+              + ", ".join(f"ws://<host>:{args.port}/{s.name}" for s in stations))
+
+    # Prometheus text on http://host:port/metrics (JSON on /stats)
+    schedulers = {station.stream.name: station.scheduler for station in local}
+    processes = {station.stream.name: station.process for station in isolated}
+    server.http_routes["/metrics"] = lambda query: ("text/plain; version=0.0.4",
+                                                    metrics.render(server, schedulers, processes))
+    if args.profile:
+        server.http_routes["/profile"] = profile_route(profiler.SamplingProfiler())
+
+    # Every station ticks on its own thread, so a provider that blocks or
+    # runs slow never shifts another station's schedule. Isolated stations
+    # tick in their own process; one relay thread brings their frames in.
+    pool = ThreadPoolExecutor(max_workers=max(1, len(local)), thread_name_prefix="station")
+    runs = [pool.submit(station.scheduler.run) for station in local]
+    relay = Relay(isolated)
+    if isolated:
+        for station in isolated:
+            station.start()
+        relay.start()
+
     try:
         while True:
-            start_time = time.time()
-            
-            # 1. Get Telemetry
-            telemetry: TelemetryData = provider.get_telemetry()
-            
-            # 2. Broadcast
-            server.broadcast(telemetry.to_dict())
-            
-            # 3. Print stats (optional, for debug)
-            if telemetry.connected:
-                print(f"Connected: {telemetry.game_name} | Speed: {telemetry.speed_kmh:.1f} km/h | RPM: {telemetry.rpm:.0f}", end='\r')
+            for run in runs:
+                if run.done():
+                    run.result() # Re-raises the exception that stopped a station
+            for station in isolated:
+                station.supervise()
+            # Print stats (optional, for debug), at 10 Hz
+            if len(stations) == 1:
+                e2e = server.fanout.delivery_latency.summary()
+                status = stations[0].status()
+                if stations[0].connected:
+                    status = f"Connected: {status} | e2e avg {e2e['avg_ms']:.2f}ms p99 {e2e['p99_ms']:.2f}ms"
             else:
-                print(f"Waiting for {args.game}...", end='\r')
-            
-            # Timing
-            elapsed = time.time() - start_time
-            sleep_time = interval - elapsed
-            if sleep_time > 0:
-                time.sleep(sleep_time)
-                
+                status = " | ".join(f"{s.name}: {s.status()}" for s in stations)
+            print(status, end='\r')
+            time.sleep(0.1)
+
     except KeyboardInterrupt:
         print("\nStopping...")
+    finally:
+        for station in local:
+            station.scheduler.stop()
+        pool.shutdown(wait=True)
+        relay.stop()
+        for station in isolated:
+            station.close()
+        for station in stations:
+            stats = station.stats()
+            stats["latency"] = station.stream.latency_stats()
+            print(json.dumps({station.name: stats} if len(stations) > 1 else stats, indent=2))
+        for station in local:
+            station.close()
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,32 @@
 from abc import ABC, abstractmethod
-from core.telemetry import TelemetryData
+from core.telemetry import TelemetryData, BASE_CHANNELS
 
 class GameProvider(ABC):
     """Base interface for all game providers"""
-    
+
+    # Identifier of the last game frame read (AC packetId, iRacing tick count,
+    # OutGauge datagram counter...). The scheduler uses it to publish each game
+    # frame exactly once. None means the provider has no "new data" signal.
+    frame_id = None
+
+    # Size of the raw page returned by snapshot(), for raw session recordings.
+    # 0 means the provider has no raw page.
+    page_size = 0
+
+    # TelemetryData fields this provider actually fills (the capability
+    # manifest sent to clients); every other field stays at its default.
+    channels = BASE_CHANNELS
+
+    # core.connection.Connection for providers that attach to a running game.
+    # While it is not connected the scheduler sleeps until the next probe and
+    # publishes its state changes as connection events. None = always available.
+    connection = None
+
+    @classmethod
+    def from_options(cls, options=None):
+        """Builds the provider from parsed CLI / station options (see providers.registry)"""
+        return cls()
+
     @abstractmethod
     def get_telemetry(self) -> TelemetryData:
         """
@@ -11,3 +34,15 @@ class GameProvider(ABC):
         Should return a TelemetryData with connected=False if game is not running.
         """
         pass
+
+    def stats(self) -> dict:
+        """Provider-specific read counters (torn/skipped frames...), if any"""
+        return {}
+
+    def close(self):
+        """Releases what the provider holds (sockets, threads, mappings) at shutdown"""
+        pass
+
+    def snapshot(self):
+        """Copy of the raw shared-memory page / datagram behind the last frame, or None"""
+        return None
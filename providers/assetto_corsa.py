@@ -1,83 +1,207 @@
 import mmap
 import struct
 from providers import GameProvider
-from core.telemetry import TelemetryData
+from core.telemetry import TelemetryData, BASE_CHANNELS
+from core.layout import Layout
+from core.seqlock import SeqlockReader
+from core.connection import Connection
+from core.timing import clock
+
+# SPageFilePhysics (partial)
+PHYSICS_LAYOUT = Layout([
+    ("packet_id", 0, "i"),
+    ("gas", 4, "f"),
+    ("brake", 8, "f"),
+    ("gear", 16, "i"),       # AC: 0=R, 1=N, 2=1st...
+    ("rpm", 20, "i"),
+    ("steer_angle", 24, "f"),
+    ("speed_kmh", 28, "f"),
+    ("acc_g", 44, "f", 3),   # x lateral, y vertical, z longitudinal
+    ("wheel_slip", 56, "f", 4),
+    ("wheel_load", 72, "f", 4),
+    ("tyre_core_temperature", 152, "f", 4),
+    ("suspension_travel", 184, "f", 4),
+    ("heading", 208, "f"),
+    ("pitch", 212, "f"),
+    ("roll", 216, "f"),
+    ("local_angular_vel", 296, "f", 3), # x pitch, y yaw, z roll
+    ("clutch", 364, "f"),
+], size=712)
+
+# SPageFileGraphic (partial): packetId, status, session, 4 x wchar[15] lap
+# time strings, then the numeric lap state. Only mapped as far as we read.
+GRAPHICS_LAYOUT = Layout([
+    ("packet_id", 0, "i"),
+    ("completed_laps", 132, "i"),
+    ("current_time", 140, "i"), # ms
+    ("last_time", 144, "i"),
+    ("best_time", 148, "i"),
+    ("normalized_car_position", 248, "f"),
+], size=252)
+
+# SPageFileStatic (partial)
+# smVersion[15], acVersion[15] (wchar), numberOfSessions, numCars,
+# carModel[33], track[33], playerName[33], playerSurname[33], playerNick[33] (wchar),
+# sectorCount, maxTorque, maxPower, maxRpm ...
+STATIC_LAYOUT = Layout([
+    ("max_rpm", 412, "i"),
+], size=756)
+
+DEFAULT_MAX_RPM = 8000.0
+
+_ACC = PHYSICS_LAYOUT.slices["acc_g"]
+_SLIP = PHYSICS_LAYOUT.slices["wheel_slip"]
+_LOAD = PHYSICS_LAYOUT.slices["wheel_load"]
+_TYRE = PHYSICS_LAYOUT.slices["tyre_core_temperature"]
+_SUSPENSION = PHYSICS_LAYOUT.slices["suspension_travel"]
+_ANGULAR = PHYSICS_LAYOUT.slices["local_angular_vel"]
 
 class AssettoCorsaProvider(GameProvider):
+    page_size = PHYSICS_LAYOUT.size
+    channels = BASE_CHANNELS + (
+        "accel_long", "accel_lat", "accel_vert", "yaw_rate", "pitch_rate", "roll_rate",
+        "heading", "pitch", "roll", "wheel_slip", "wheel_load", "suspension_travel", "tyre_temp",
+        "lap", "lap_time", "last_lap_time", "best_lap_time", "lap_distance_pct",
+    )
+
     def __init__(self):
         self.game_name = "Assetto Corsa"
         self.map_name_physics = "Local\\acpmf_physics"
         self.map_name_static = "Local\\acpmf_static"
+        self.map_name_graphics = "Local\\acpmf_graphics"
         self.mm_physics = None
         self.mm_static = None
+        self.mm_graphics = None
+        self.max_rpm = None # Read from the static page once per session
+        # packetId is the only version counter AC gives us: the reader also checks that
+        # the page bytes did not move around the read (see core.seqlock)
+        self.reader = SeqlockReader(PHYSICS_LAYOUT, begin=0)
+        self.graphics_reader = SeqlockReader(GRAPHICS_LAYOUT, begin=0)
+        self.lap_state = (0, 0.0, 0.0, 0.0, 0.0)
+        self.frame = TelemetryData(self.game_name, True) # Updated in place every packet
+        self.last = None
+        self.connection = Connection(self.game_name)
         print(f"Initialized {self.game_name} Provider")
 
     def _connect(self):
+        """Opens the three pages; None when they are there, else why not"""
         try:
             if not self.mm_physics:
-                self.mm_physics = mmap.mmap(0, 712, self.map_name_physics)
+                self.mm_physics = mmap.mmap(0, PHYSICS_LAYOUT.size, self.map_name_physics)
+                self.reader.reset()
             if not self.mm_static:
-                self.mm_static = mmap.mmap(0, 756, self.map_name_static)
-            return True
+                self.mm_static = mmap.mmap(0, STATIC_LAYOUT.size, self.map_name_static)
+                self.max_rpm = None
+            if not self.mm_graphics:
+                self.mm_graphics = mmap.mmap(0, GRAPHICS_LAYOUT.size, self.map_name_graphics)
+                self.graphics_reader.reset()
+            return None
         except FileNotFoundError:
-            return False
+            return "shared memory not found (game not running)"
+        except (OSError, TypeError) as e:
+            return str(e) # TypeError: named maps (tagname) only exist on Windows
+
+    def _close(self):
+        for mm in (self.mm_physics, self.mm_static, self.mm_graphics):
+            if mm is not None:
+                mm.close()
+        self.mm_physics = self.mm_static = self.mm_graphics = None
+        self.frame_id = None
+        self.last = None
+
+    def _read_static(self):
+        # The static page is only filled once a session is loaded; until then
+        # maxRpm reads 0 and we retry on the next frame.
+        max_rpm, = STATIC_LAYOUT.unpack(self.mm_static)
+        if max_rpm > 0:
+            self.max_rpm = float(max_rpm)
+            return self.max_rpm
+        return DEFAULT_MAX_RPM
+
+    def _read_graphics(self):
+        # The graphics page updates slower than physics; keep the last lap state
+        # while its packetId has not moved.
+        values = self.graphics_reader.read(self.mm_graphics)
+        if values is not None:
+            _, laps, current, last, best, position = values
+            self.lap_state = (laps, current / 1000.0, last / 1000.0, best / 1000.0, position)
+        return self.lap_state
 
     def get_telemetry(self) -> TelemetryData:
-        if not self.mm_physics or not self.mm_static:
-            if not self._connect():
-                return TelemetryData(self.game_name, False)
+        connection = self.connection
+        now = clock()
+        if not connection.connected:
+            if not connection.due(now):
+                return TelemetryData.disconnected(self.game_name)
+            error = self._connect()
+            if error:
+                connection.missing(now, error)
+                return TelemetryData.disconnected(self.game_name)
 
         try:
-            self.mm_physics.seek(0)
-            data_physics = self.mm_physics.read(712)
-            
-            # Physics Struct (Partial)
-            # packetId(4), gas(4), brake(4), fuel(4), gear(4), rpm(4), steerAngle(4), speedKmh(4)
-            # Offsets:
-            # gas: 4
-            # brake: 8
-            # gear: 16
-            # rpm: 20
-            # steer: 24
-            # speed: 28
-            
-            packet_id = struct.unpack('i', data_physics[0:4])[0]
-            gas = struct.unpack('f', data_physics[4:8])[0]
-            brake = struct.unpack('f', data_physics[8:12])[0]
-            gear = struct.unpack('i', data_physics[16:20])[0]
-            rpm = struct.unpack('i', data_physics[20:24])[0]
-            steer = struct.unpack('f', data_physics[24:28])[0]
-            speed_kmh = struct.unpack('f', data_physics[28:32])[0]
-
-            # Static Data for Max RPM
-            self.mm_static.seek(0)
-            data_static = self.mm_static.read(756)
-            # Check AC static struct for maxRpm. usually deeper.
-            # For now, let's hardcode or guess, or implement later properly.
-            # MaxRpm is at offset 8 in static?
-            # _smVersion(15*2), _acVersion(15*2), _numberOfSessions(4), _numCars(4) ...
-            # Actually standard Static struct:
-            # char smVersion[15]; char acVersion[15]; ... float maxRpm; ...
-            # simpler to assume 8000 if not found easily, or parse fully.
-            # Let's use a safe default for now to avoid crashes if offset wrong.
-            max_rpm = 8000.0
-
-            return TelemetryData(
-                game_name=self.game_name,
+            values = self.reader.read(self.mm_physics)
+            if values is None:
+                # packetId unchanged (paused / no new physics step) or every retry
+                # was torn: keep the last consistent frame.
+                if self.last is not None:
+                    connection.frame(now, new=False)
+                    return self.last
+                connection.missing(now, "no physics frame yet")
+                return TelemetryData.disconnected(self.game_name)
+            connection.frame(now)
+
+            packet_id, gas, brake, gear, rpm, steer, speed_kmh = values[:7]
+            self.frame_id = packet_id
+
+            max_rpm = self.max_rpm if self.max_rpm is not None else self._read_static()
+            laps, lap_time, last_lap_time, best_lap_time, lap_position = self._read_graphics()
+            acc_x, acc_y, acc_z = values[_ACC]
+            pitch_rate, yaw_rate, roll_rate = values[_ANGULAR]
+            heading, pitch, roll, _, _, _, clutch = values[-7:]
+
+            self.last = self.frame.update(
                 connected=True,
                 speed_kmh=speed_kmh,
                 rpm=float(rpm),
                 max_rpm=max_rpm,
-                gear=gear, # AC: 0=R, 1=N, 2=1st... need to map? 
-                           # Actually often AC is 0=R, 1=N. 
+                gear=gear, # AC: 0=R, 1=N, 2=1st... need to map?
+                           # Actually often AC is 0=R, 1=N.
                            # Standard API usually: 0=R, 1=N, 2=1st.
                 throttle=gas,
                 brake=brake,
-                clutch=0.0, # Not in simple offset
-                steering_angle=steer
+                clutch=clutch,
+                steering_angle=steer,
+                accel_long=acc_z,
+                accel_lat=acc_x,
+                accel_vert=acc_y,
+                yaw_rate=yaw_rate,
+                pitch_rate=pitch_rate,
+                roll_rate=roll_rate,
+                heading=heading,
+                pitch=pitch,
+                roll=roll,
+                wheel_slip=values[_SLIP],
+                wheel_load=values[_LOAD],
+                suspension_travel=values[_SUSPENSION],
+                tyre_temp=values[_TYRE],
+                lap=laps,
+                lap_time=lap_time,
+                last_lap_time=last_lap_time,
+                best_lap_time=best_lap_time,
+                lap_distance_pct=lap_position
             )
+            return self.last
+
+        except (OSError, ValueError, struct.error) as e:
+            # Page closed or truncated under us: drop every page and probe again
+            self._close()
+            connection.lost(now, f"read error: {e}")
+            return TelemetryData.disconnected(self.game_name)
+
+    def snapshot(self):
+        if not self.mm_physics:
+            return None
+        return self.mm_physics[:self.page_size]
 
-        except Exception as e:
-            # print(f"AC Read Error: {e}")
-            self.mm_physics = None # Reset connection
-            return TelemetryData(self.game_name, False)
+    def stats(self) -> dict:
+        return {**self.reader.stats(), "connection": self.connection.stats()}
@@ -1,55 +1,224 @@
-import socket
-import struct
+import asyncio
+import math
 from providers import GameProvider
 from core.telemetry import TelemetryData
+from core.layout import Layout
+from core.udp import LoopThread, listen
+from core.connection import Connection
+from core.timing import clock
+
+# OutGauge packet (LFS standard, also sent by BeamNG). 92 bytes, 96 with the optional ID.
+OUTGAUGE_LAYOUT = Layout([
+    ("time", 0, "I"),           # ms
+    ("car", 4, "4s"),
+    ("flags", 8, "H"),          # OG_* display preferences (keys held, km/h, bar); not telemetry
+    ("gear", 10, "B"),          # 0=R, 1=N, 2=1st...
+    ("plid", 11, "B"),
+    ("speed", 12, "f"),         # m/s
+    ("rpm", 16, "f"),
+    ("turbo", 20, "f"),         # bar
+    ("engine_temp", 24, "f"),   # Celsius
+    ("fuel", 28, "f"),          # 0..1
+    ("oil_pressure", 32, "f"),  # bar
+    ("oil_temp", 36, "f"),      # Celsius
+    ("dash_lights", 40, "I"),   # DL_* lights available
+    ("show_lights", 44, "I"),   # DL_* lights on
+    ("throttle", 48, "f"),      # 0..1
+    ("brake", 52, "f"),
+    ("clutch", 56, "f"),
+    ("display1", 60, "16s"),
+    ("display2", 76, "16s"),
+], size=92)
+
+# OutGauge dash light bits (also the bit order of TelemetryData.dash_lights)
+DL_SHIFT = 1 << 0
+DL_FULLBEAM = 1 << 1
+DL_HANDBRAKE = 1 << 2
+DL_PITSPEED = 1 << 3
+DL_TC = 1 << 4
+DL_SIGNAL_L = 1 << 5
+DL_SIGNAL_R = 1 << 6
+DL_SIGNAL_ANY = 1 << 7
+DL_OILWARN = 1 << 8
+DL_BATTERY = 1 << 9
+DL_ABS = 1 << 10
+DASH_LIGHTS = (("shift", DL_SHIFT), ("full_beam", DL_FULLBEAM), ("handbrake", DL_HANDBRAKE),
+               ("pit_speed", DL_PITSPEED), ("tc", DL_TC), ("signal_left", DL_SIGNAL_L),
+               ("signal_right", DL_SIGNAL_R), ("signal_any", DL_SIGNAL_ANY), ("oil_warning", DL_OILWARN),
+               ("battery", DL_BATTERY), ("abs", DL_ABS))
+DL_ALL = sum(bit for _, bit in DASH_LIGHTS)
+
+
+def light_names(mask):
+    """Names of the DL_* lights set in a dash_lights mask"""
+    return [name for name, bit in DASH_LIGHTS if mask & bit]
+
+# OutSim packet without OutSimOpts. 64 bytes, 68 with the optional ID.
+# Vectors are in world space: x east, y north, z up.
+OUTSIM_LAYOUT = Layout([
+    ("time", 0, "I"),
+    ("ang_vel", 4, "f", 3),     # rad/s
+    ("heading", 16, "f"),       # rad, 0 = north
+    ("pitch", 20, "f"),
+    ("roll", 24, "f"),
+    ("accel", 28, "f", 3),      # m/s^2
+    ("vel", 40, "f", 3),        # m/s
+    ("pos", 52, "i", 3),        # 1 m = 65536
+], size=64)
+
+GRAVITY = 9.80665
 
 class BeamNGProvider(GameProvider):
-    def __init__(self, port=4444):
+    """
+    OutGauge (dashboard) and, optionally, OutSim (motion) over UDP.
+
+    Datagrams are received by asyncio endpoints on a private event loop and
+    cached; get_telemetry() parses only the newest packet of each kind. The
+    last frame keeps being reported as connected until no packet has arrived
+    for stale_after seconds, so a late datagram no longer reads as a disconnect.
+    """
+    page_size = 96 # OutGauge packet with the optional ID field
+    channels = ("speed_kmh", "rpm", "gear", "throttle", "brake", "clutch", "fuel", "engine_temp", "dash_lights")
+    motion_channels = ("accel_long", "accel_lat", "accel_vert", "yaw_rate", "pitch_rate", "roll_rate",
+                       "heading", "pitch", "roll")
+
+    def __init__(self, port=4444, outsim_port=0, stale_after=1.0):
         self.game_name = "BeamNG.drive"
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.stale_after = stale_after
+        self.frame = TelemetryData(self.game_name, True) # Updated in place every datagram
+        self.last = None
+        self.last_packet = None
+        self.gauges = {}
+        self.motion = {}
+        self.lights_available = 0
+        self.frame_count = 0
+        # Gone after stale_after without a datagram; checking for one is cheap, so probe often
+        self.connection = Connection(self.game_name, backoff_max=0.5, stale_after=min(0.25, stale_after),
+                                     lost_after=stale_after)
+
+        self.receiver = LoopThread(name="outgauge")
+        self.outgauge = self._listen(port, OUTGAUGE_LAYOUT.size)
+        self.outsim = self._listen(outsim_port, OUTSIM_LAYOUT.size) if outsim_port else None
+        if self.outsim is not None:
+            self.channels = self.channels + self.motion_channels
+        if self.outgauge is not None:
+            print(f"Initialized {self.game_name} Provider (OutGauge UDP {port}"
+                  f"{f', OutSim UDP {outsim_port}' if self.outsim else ''})")
+
+    @classmethod
+    def from_options(cls, options=None):
+        return cls(port=getattr(options, "udp_port", 4444), outsim_port=getattr(options, "outsim_port", 0))
+
+    def _listen(self, port, min_size):
         try:
-            self.sock.bind(('127.0.0.1', port))
-            self.sock.setblocking(False)
-            print(f"Initialized {self.game_name} Provider (UDP {port})")
+            return self.receiver.run(listen(self.receiver.loop, port, min_size))
         except OSError:
             print(f"Error binding to port {port}. Is it already in use?")
+            return None
+
+    def _parse_outsim(self, data):
+        values = OUTSIM_LAYOUT.unpack(data)
+        _, wx, wy, wz, heading, pitch, roll, ax, ay, az = values[:10]
+        # World -> car: forward is (-sin h, cos h), right is (cos h, sin h)
+        sin_h, cos_h = math.sin(heading), math.cos(heading)
+        self.motion = {
+            "accel_long": (-ax * sin_h + ay * cos_h) / GRAVITY,
+            "accel_lat": (ax * cos_h + ay * sin_h) / GRAVITY,
+            "accel_vert": az / GRAVITY,
+            "yaw_rate": wz,
+            "pitch_rate": wx * cos_h + wy * sin_h,
+            "roll_rate": -wx * sin_h + wy * cos_h,
+            "heading": heading,
+            "pitch": pitch,
+            "roll": roll,
+        }
+
+    def _parse_outgauge(self, data):
+        (_, _, _, gear, _, speed_ms, rpm, _, engine_temp, fuel, _, _,
+         available, show_lights, throttle, brake, clutch, _, _) = OUTGAUGE_LAYOUT.unpack(data)
+        self.lights_available = available & DL_ALL
+        self.gauges = {
+            "speed_kmh": speed_ms * 3.6,
+            "rpm": rpm,
+            "max_rpm": 8000, # Unknown in OutGauge
+            "gear": gear,
+            "throttle": throttle,
+            "brake": brake,
+            "clutch": clutch,
+            "fuel": fuel,
+            "engine_temp": engine_temp,
+            # Known bits only, and only lights the car has when the sender says which
+            "dash_lights": show_lights & (self.lights_available or DL_ALL),
+        }
 
     def get_telemetry(self) -> TelemetryData:
-        try:
-            # We need to drain the socket to get the LATEST packet
-            data = None
-            while True:
-                try:
-                    d, _ = self.sock.recvfrom(1024)
-                    data = d
-                except BlockingIOError:
-                    break
-            
-            if data is None:
-                return TelemetryData(self.game_name, False) # No new data
-
-            # OutGauge Structure (LFS standard)
-            # Time(4), Car(4), Flags(2), Gear(1), PLID(1), Speed(4), RPM(4), Turbo(4), EngTemp(4) ...
-            # Speed offset: 12
-            # RPM offset: 16
-            
-            if len(data) >= 20:
-                speed_ms = struct.unpack('f', data[12:16])[0]
-                rpm = struct.unpack('f', data[16:20])[0]
-                gear = data[10] # Byte
-                
-                return TelemetryData(
-                    game_name=self.game_name,
-                    connected=True,
-                    speed_kmh=speed_ms * 3.6,
-                    rpm=rpm,
-                    max_rpm=8000, # Unknown in OutGauge?
-                    gear=gear,
-                    throttle=0, # Needs parsing flags or extra data
-                    brake=0,
-                    clutch=0
-                )
-        except Exception as e:
-            pass
-            
-        return TelemetryData(self.game_name, False)
+        if self.outgauge is None:
+            return TelemetryData.disconnected(self.game_name)
+        connection = self.connection
+        now = clock()
+        if not connection.connected and not connection.due(now):
+            return TelemetryData.disconnected(self.game_name)
+
+        fresh = False
+        if self.outsim is not None:
+            packet = self.outsim.take()
+            if packet is not None:
+                self._parse_outsim(packet[0])
+                fresh = True
+
+        packet = self.outgauge.take()
+        if packet is not None:
+            self.last_packet = packet[0]
+            self._parse_outgauge(packet[0])
+            fresh = True
+
+        if fresh:
+            connection.frame(now)
+        elif connection.connected:
+            connection.frame(now, new=False)
+            if not connection.connected:
+                # Nothing from the game for stale_after: it is gone
+                self.last = None
+                self.frame_id = None
+                return TelemetryData.disconnected(self.game_name)
+        else:
+            connection.missing(now, "no OutGauge datagrams")
+            return TelemetryData.disconnected(self.game_name)
+
+        if not fresh:
+            # No new datagram: repeat the last frame (same frame_id) so the
+            # scheduler can tell it is a duplicate.
+            return self.last
+
+        # Every fresh datagram (either kind) is a new game frame
+        self.frame_count += 1
+        self.frame_id = self.frame_count
+        self.last = self.frame.update(True, **self.gauges, **self.motion)
+        return self.last
+
+    def snapshot(self):
+        return self.last_packet
+
+    async def _close_endpoints(self):
+        for endpoint in (self.outgauge, self.outsim):
+            if endpoint is not None:
+                endpoint.close()
+        await asyncio.sleep(0) # Lets the transports release their sockets
+
+    def close(self):
+        if self.receiver.loop.is_closed():
+            return
+        self.receiver.run(self._close_endpoints())
+        self.receiver.stop()
+
+    def stats(self) -> dict:
+        stats = {}
+        if self.outgauge is not None:
+            stats["outgauge"] = self.outgauge.stats()
+            stats["outgauge"]["age_ms"] = (self.outgauge.age() or 0.0) * 1000.0
+        if self.outsim is not None:
+            stats["outsim"] = self.outsim.stats()
+        stats["lights"] = {"available": light_names(self.lights_available),
+                           "on": light_names(self.gauges.get("dash_lights", 0))}
+        stats["connection"] = self.connection.stats()
+        return stats
@@ -1,57 +1,177 @@
-import sys
 from providers import GameProvider
-from core.telemetry import TelemetryData
+from core.telemetry import TelemetryData, BASE_CHANNELS
+from core.layout import Layout
+from core.connection import Connection, STALE
+from core.timing import clock
+
+GRAVITY = 9.80665
+
+# irsdk VarType -> struct code (irsdk.VAR_TYPE_MAP)
+VAR_TYPES = ("c", "?", "i", "I", "f", "d")
+
+# Telemetry variables read every tick, in the order get_telemetry() unpacks them
+VARS = (
+    "SessionTick", "IsOnTrack",
+    "Speed", "RPM", "Gear", "Throttle", "Brake", "Clutch", "SteeringWheelAngle",
+    "LongAccel", "LatAccel", "VertAccel", "YawRate", "PitchRate", "RollRate", "Yaw", "Pitch", "Roll",
+    "LFshockDefl", "RFshockDefl", "LRshockDefl", "RRshockDefl",
+    "LapCompleted", "LapCurrentLapTime", "LapLastLapTime", "LapBestLapTime", "LapDistPct",
+)
 
 class IRacingProvider(GameProvider):
-    def __init__(self):
+    """
+    iRacing through pyirsdk.
+
+    Variable headers are resolved once per connection into a Layout over the
+    var buffer, so a tick is one freeze (copy) of the latest buffer and one
+    struct unpack, instead of a name lookup per variable. Session info (YAML)
+    is only read again when the SDK header's session_info_update counter changes.
+    """
+    channels = BASE_CHANNELS + (
+        "accel_long", "accel_lat", "accel_vert", "yaw_rate", "pitch_rate", "roll_rate",
+        "heading", "pitch", "roll", "suspension_travel",
+        "lap", "lap_time", "last_lap_time", "best_lap_time", "lap_distance_pct",
+    )
+
+    def __init__(self, ir=None):
         self.game_name = "iRacing"
+        if ir is None:
+            try:
+                import irsdk
+                ir = irsdk.IRSDK()
+                print("Initialized iRacing Provider")
+            except ImportError:
+                print("Error: 'pyirsdk' not installed. Run: pip install pyirsdk")
+        self.ir = ir
+        self.frame = TelemetryData(self.game_name, True) # Updated in place every tick
+
+        self.layout = None    # Layout of VARS in the var buffer, None = not resolved yet
+        self.positions = ()   # Index of each VARS entry in the unpacked tuple, None = missing
+        self.missing = ()
+        self.session_update = -1 # SDK session_info_update the cached values belong to
+        self.max_rpm = 0.0
+
+        self.connection = Connection(self.game_name)
+        self.session_reads = 0
+        self.bulk_reads = 0
+        self.name_reads = 0
+
+    def _resolve(self):
+        """Var headers -> one Layout; falls back to name lookups if pyirsdk's internals differ"""
+        try:
+            headers = self.ir._var_headers_dict
+            fields = [(name, headers[name].offset, VAR_TYPES[headers[name].type])
+                      for name in VARS if name in headers]
+            self.layout = Layout(fields)
+        except (AttributeError, TypeError, IndexError):
+            self.layout = False
+            return
+        self.positions = tuple(self.layout.slices.get(name) for name in VARS)
+        self.missing = tuple(name for name in VARS if name not in self.layout.slices)
+        if self.missing:
+            print(f"iRacing: variables not available, left at 0: {', '.join(self.missing)}")
+
+    def _read_vars(self):
+        """Every VARS value, in order, from the frozen latest buffer"""
+        if self.layout:
+            buffer = self.ir._var_buffer_latest
+            values = self.layout.unpack(buffer.get_memory(), buffer.buf_offset)
+            self.bulk_reads += 1
+            return [values[i] if i is not None else 0 for i in self.positions]
+        self.name_reads += 1
+        return [self.ir[name] for name in VARS]
+
+    def _read_session(self):
+        """Static session data, parsed again only when the session info changes"""
+        # pyirsdk keeps the counter on its (private) header; None: unknown, read until it works once
+        update = getattr(getattr(self.ir, "_header", None), "session_info_update", None)
+        if update == self.session_update:
+            return
+        self.session_reads += 1
         try:
-            import irsdk
-            self.ir = irsdk.IRSDK()
-            print("Initialized iRacing Provider")
-        except ImportError:
-            print("Error: 'pyirsdk' not installed. Run: pip install pyirsdk")
-            self.ir = None
+            self.max_rpm = self.ir['DriverInfo']['DriverCarSLRedline']
+        except (KeyError, TypeError):
+            return # Not parsed yet, or this car has no redline: keep the last value, try again next tick
+        self.session_update = update
 
     def get_telemetry(self) -> TelemetryData:
         if not self.ir:
-             return TelemetryData(self.game_name, False)
+             return TelemetryData.disconnected(self.game_name)
 
+        connection = self.connection
+        now = clock()
         if not self.ir.is_initialized:
+            # startup() asks the sim over HTTP whether it is running: only once per backoff step
+            if not connection.due(now):
+                return TelemetryData.disconnected(self.game_name)
+            self.layout = None # Offsets may change with a new SDK session
+            self.session_update = -1
             if not self.ir.startup():
-                return TelemetryData(self.game_name, False)
-        
+                connection.missing(now, "iRacing not running")
+                return TelemetryData.disconnected(self.game_name)
+        if self.layout is None:
+            self._resolve()
+
         self.ir.freeze_var_buffer_latest()
-        
+
         try:
+            (tick, is_on_track, speed_ms, rpm, gear, throttle, brake, clutch, steering,
+             long_accel, lat_accel, vert_accel, yaw_rate, pitch_rate, roll_rate, yaw, pitch, roll,
+             lf_shock, rf_shock, lr_shock, rr_shock,
+             lap, lap_time, last_lap_time, best_lap_time, lap_dist_pct) = self._read_vars()
+
+            # Increments once per simulation tick (60 Hz)
+            connection.frame(now, tick != self.frame_id)
+            self.frame_id = tick
+            if connection.state == STALE and not getattr(self.ir, "is_connected", True):
+                # The sim closed but our mapping keeps the last page alive: let go and look again
+                self.ir.shutdown()
+                self.frame_id = None
+                connection.lost(now, "iRacing closed")
+                return TelemetryData.disconnected(self.game_name)
+
             # Check if connected (in car)
-            is_on_track = self.ir['IsOnTrack']
             if not is_on_track:
-                 return TelemetryData(self.game_name, True, speed_kmh=0)
-
-            speed_ms = self.ir['Speed']
-            rpm = self.ir['RPM']
-            gear = self.ir['Gear'] # -1=Reverse, 0=Neutral, 1+=Gears
-            throttle = self.ir['Throttle'] # 0-1
-            brake = self.ir['Brake'] # 0-1
-            clutch = self.ir['Clutch'] # 0-1
-            steering = self.ir['SteeringWheelAngle'] # Radians?
-            
-            # Static data (could be cached)
-            max_rpm = self.ir['DriverInfo']['DriverCarSLRedline']
-            
-            return TelemetryData(
-                game_name=self.game_name,
+                 return self.frame.update(True, speed_kmh=0)
+
+            self._read_session()
+
+            return self.frame.update(
                 connected=True,
                 speed_kmh=speed_ms * 3.6,
                 rpm=rpm,
-                max_rpm=max_rpm,
-                gear=gear,
-                throttle=throttle,
-                brake=brake,
-                clutch=clutch,
-                steering_angle=steering
+                max_rpm=self.max_rpm,
+                gear=gear, # -1=Reverse, 0=Neutral, 1+=Gears
+                throttle=throttle, # 0-1
+                brake=brake, # 0-1
+                clutch=clutch, # 0-1
+                steering_angle=steering, # Radians
+                # iRacing: m/s^2 including gravity, y axis points left
+                accel_long=long_accel / GRAVITY,
+                accel_lat=-lat_accel / GRAVITY,
+                accel_vert=vert_accel / GRAVITY,
+                yaw_rate=yaw_rate,
+                pitch_rate=pitch_rate,
+                roll_rate=roll_rate,
+                heading=yaw,
+                pitch=pitch,
+                roll=roll,
+                suspension_travel=(lf_shock, rf_shock, lr_shock, rr_shock),
+                lap=lap,
+                lap_time=lap_time,
+                last_lap_time=last_lap_time,
+                best_lap_time=best_lap_time,
+                lap_distance_pct=lap_dist_pct
             )
         except (KeyError, TypeError) as e:
             # print(f"iRacing Data Error: {e}")
-            return TelemetryData(self.game_name, True)
+            return self.frame.update(True)
+
+    def stats(self) -> dict:
+        return {
+            "bulk_reads": self.bulk_reads,
+            "name_reads": self.name_reads,
+            "session_info_reads": self.session_reads,
+            "missing_vars": len(self.missing),
+            "connection": self.connection.stats(),
+        }
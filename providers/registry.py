@@ -0,0 +1,86 @@
+"""
+Game provider registry.
+
+Providers are listed by "module:Class" path and only imported when a station
+selects them, so startup pays for the games in use and --list-games for none.
+Other packages add games through the "simracing.providers" entry-point group:
+
+    [project.entry-points."simracing.providers"]
+    mygame = "mypackage.provider:MyGameProvider"
+
+A provider is built with Class.from_options(options) (see GameProvider).
+"""
+import importlib
+import importlib.util
+
+ENTRY_POINT_GROUP = "simracing.providers"
+
+
+class ProviderInfo:
+    """What --list-games shows about a provider, known without importing it"""
+
+    def __init__(self, name, target, description, requires=(), source="built-in"):
+        self.name = name
+        self.target = target           # "module:Class"
+        self.description = description
+        self.requires = requires       # (import name, pip package) pairs
+        self.source = source           # "built-in" or the distribution providing it
+
+    def missing(self):
+        """pip packages this provider needs that are not installed (checked without importing them)"""
+        return [package for module, package in self.requires if importlib.util.find_spec(module) is None]
+
+    def load(self):
+        module, _, attr = self.target.partition(":")
+        try:
+            return getattr(importlib.import_module(module), attr)
+        except (ImportError, AttributeError) as e:
+            raise RuntimeError(f"Cannot load the {self.name} provider ({self.target}): {e}")
+
+
+BUILTIN = {info.name: info for info in (
+    ProviderInfo("iracing", "providers.iracing:IRacingProvider", "iRacing, through the iRacing SDK",
+                 requires=(("irsdk", "pyirsdk"),)),
+    ProviderInfo("ac", "providers.assetto_corsa:AssettoCorsaProvider", "Assetto Corsa shared memory"),
+    ProviderInfo("rfactor", "providers.rfactor:RFactorProvider",
+                 "rFactor 1 / Automobilista, through rFactorSharedMemoryMap.dll (--layout)"),
+    ProviderInfo("beamng", "providers.beamng:BeamNGProvider",
+                 "BeamNG.drive OutGauge UDP, plus OutSim (--udp-port, --outsim-port)"),
+    ProviderInfo("test", "providers.test_provider:TestProvider", "Synthetic telemetry for development"),
+    ProviderInfo("replay", "providers.replay:ReplayProvider", "Plays a .strec recording (--file, --speed, --loop)"),
+)}
+
+_discovered = None
+
+
+def discover():
+    """Providers registered by installed packages; reads their metadata, imports nothing"""
+    global _discovered
+    if _discovered is None:
+        from importlib.metadata import entry_points
+        _discovered = {}
+        for entry in entry_points(group=ENTRY_POINT_GROUP):
+            if entry.name in BUILTIN or entry.name in _discovered:
+                continue # Built-ins and the first registration win
+            dist = getattr(entry, "dist", None)
+            source = f"{dist.name} {dist.version}" if dist is not None else "entry point"
+            _discovered[entry.name] = ProviderInfo(entry.name, entry.value, f"Provided by {source}", source=source)
+    return _discovered
+
+
+def games():
+    """Every known game, built-ins first"""
+    return {**BUILTIN, **discover()}
+
+
+def get(name):
+    """ProviderInfo for a game, or None. Entry points are only scanned for names that are not built in."""
+    return BUILTIN.get(name) or discover().get(name)
+
+
+def create(name, options=None):
+    """Imports and builds the provider for a game. Returns None for an unknown game."""
+    info = get(name)
+    if info is None:
+        return None
+    return info.load().from_options(options)
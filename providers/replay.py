@@ -0,0 +1,131 @@
+from bisect import bisect_right
+from providers import GameProvider
+from core.telemetry import TelemetryData, NAMES, DEFAULTS, BASE_CHANNELS
+from core.recorder import SessionReader
+from core.timing import clock
+
+class ReplayProvider(GameProvider):
+    """
+    Plays a normalized .strec recording back as if it were a game.
+
+    speed: 1.0 = real time, N = N times faster, 0 = as fast as possible
+    (one record per get_telemetry() call).
+    The file is memory-mapped and records are read straight from the column
+    views of the current chunk. frame_id is the record number, so the event
+    scheduler publishes every record exactly once.
+    """
+
+    def __init__(self, path, speed=1.0, loop=False, start=0.0):
+        self.reader = SessionReader(path)
+        if self.reader.kind != "normalized":
+            raise ValueError(f"{path} holds raw pages; only normalized recordings can be replayed")
+        if not self.reader.index:
+            raise ValueError(f"{path} contains no records")
+
+        self.game_name = self.reader.metadata.get("game_name") or "Replay"
+        self.speed = speed
+        self.loop = loop
+        self.start = start
+        self.names = [name for name, _ in self.reader.columns]
+        # Recordings older than a field replay it at its default value
+        self.channels = tuple(self.reader.metadata.get("channels") or BASE_CHANNELS)
+        self.fields = []
+        for name in NAMES[1:]:
+            if name in self.names:
+                self.fields.append((name, self.names.index(name), 0))
+            elif f"{name}[0]" in self.names:
+                self.fields.append((name, self.names.index(f"{name}[0]"), len(DEFAULTS[name])))
+        self.chunk_starts = [entry[2] for entry in self.reader.index]
+        # Global number of the first record of every chunk
+        self.chunk_offsets = []
+        total = 0
+        for entry in self.reader.index:
+            self.chunk_offsets.append(total)
+            total += entry[1]
+
+        self.frame = TelemetryData(self.game_name, True) # Updated in place every record
+        self.finished = False
+        self.seek(start)
+        print(f"Initialized Replay Provider ({path}: {len(self.reader)} records, "
+              f"{self.reader.duration:.1f}s, speed {'max' if not speed else f'{speed}x'})")
+
+    @classmethod
+    def from_options(cls, options=None):
+        if options is None or not getattr(options, "file", None):
+            raise ValueError("--game replay needs --file <recording.strec>")
+        return cls(options.file, speed=options.speed, loop=options.loop, start=options.start)
+
+    def _load_chunk(self, chunk):
+        self.chunk = chunk
+        columns = self.reader.columns_of(chunk)
+        self.times = columns["t"]
+        self.columns = [columns[name] for name in self.names]
+        self.count = len(self.times)
+
+    def seek(self, t):
+        """Moves playback to the record playing t seconds into the recording (uses the chunk index)"""
+        t += self.reader.index[0][2]
+        chunk = max(0, bisect_right(self.chunk_starts, t) - 1)
+        self._load_chunk(chunk)
+        self.position = bisect_right(self.times, t) - 1
+        if self.position < 0:
+            self.position = 0
+        self.finished = False
+        # Re-anchor the playback clock on the new position
+        self.wall_start = clock()
+        self.record_start = self.times[self.position]
+        self.pending = True # The record at the new position has not been returned yet
+
+    def _advance(self):
+        """Moves to the next record. Returns False at the end of the recording."""
+        if self.position + 1 < self.count:
+            self.position += 1
+            return True
+        if self.chunk + 1 < len(self.reader.index):
+            self._load_chunk(self.chunk + 1)
+            self.position = 0
+            return True
+        return False
+
+    def _next_time(self):
+        if self.position + 1 < self.count:
+            return self.times[self.position + 1]
+        if self.chunk + 1 < len(self.chunk_starts):
+            return self.chunk_starts[self.chunk + 1]
+        return None
+
+    def get_telemetry(self) -> TelemetryData:
+        if self.finished:
+            self.frame_id = None
+            return TelemetryData.disconnected(self.game_name)
+
+        if not self.pending:
+            if not self.speed:
+                moved = self._advance()
+            else:
+                # Latest record whose timestamp has been reached on the scaled clock
+                target = self.record_start + (clock() - self.wall_start) * self.speed
+                moved = False
+                next_time = self._next_time()
+                while next_time is not None and next_time <= target:
+                    self._advance()
+                    moved = True
+                    next_time = self._next_time()
+
+            if not moved and self._next_time() is None:
+                # Past the last record
+                if not self.loop:
+                    self.finished = True
+                    self.frame_id = None
+                    print("\nReplay finished")
+                    return TelemetryData.disconnected(self.game_name)
+                self.seek(self.start)
+        self.pending = False
+
+        self.frame_id = self.chunk_offsets[self.chunk] + self.position
+        position, columns = self.position, self.columns
+        values = {name: (tuple(columns[i][position] for i in range(index, index + count)) if count
+                         else columns[index][position])
+                  for name, index, count in self.fields}
+        values["connected"] = bool(values["connected"])
+        return self.frame.update(**values)
@@ -2,25 +2,86 @@ import mmap
 import struct
 from providers import GameProvider
 from core.telemetry import TelemetryData
+from core.layout import Layout
+from core.seqlock import SeqlockReader
+from core.connection import Connection
+from core.timing import clock
+
+# Only the speed offset is verified so far ("Found speed at offset 236").
+# See the comments in get_telemetry for the candidates still being checked.
+# More offsets can be found with rfactor_inspect.py and loaded with --layout.
+TELEMETRY_LAYOUT = Layout([
+    ("speed_ms", 236, "f"),
+], size=24000)
+
+# Field names a layout file may define, with the value used when it doesn't
+LAYOUT_DEFAULTS = {
+    "speed_ms": 0.0,
+    "rpm": 0.0,
+    "max_rpm": 10000.0,
+    "gear": 0,
+    "throttle": 0.0,
+    "brake": 0.0,
+    "clutch": 0.0,
+    "steering_angle": 0.0,
+}
 
 class RFactorProvider(GameProvider):
-    def __init__(self):
+    page_size = TELEMETRY_LAYOUT.size
+
+    def __init__(self, layout_file=None):
         self.game_name = "rFactor"
         self.map_name = "$rFactorShared$"
         self.mm = None
+        self.layout = Layout.load(layout_file) if layout_file else TELEMETRY_LAYOUT
+        self.page_size = self.layout.size
+        unknown = set(self.layout.names) - set(LAYOUT_DEFAULTS)
+        if unknown:
+            print(f"Ignoring unknown rFactor layout fields: {', '.join(sorted(unknown))}")
+        # Position of each known field in the unpacked tuple
+        self.positions = {name: self.layout.slices[name] for name in LAYOUT_DEFAULTS if name in self.layout.slices}
+        self.channels = tuple("speed_kmh" if name == "speed_ms" else name for name in self.positions)
+        # The rFactor 1 plugin has no version counter: compare the page before/after
+        self.reader = SeqlockReader(self.layout)
+        self.frame = TelemetryData(self.game_name, True) # Updated in place every new page
+        self.last = None
+        self.connection = Connection(self.game_name)
         print(f"Initialized {self.game_name} Provider")
 
+    @classmethod
+    def from_options(cls, options=None):
+        return cls(layout_file=getattr(options, "layout", None))
+
+    def _connect(self):
+        """Opens the plugin's page; None when it is there, else why not"""
+        try:
+            self.mm = mmap.mmap(-1, self.layout.size, self.map_name) # Open existing
+            self.reader.reset()
+            return None
+        except FileNotFoundError:
+            return "shared memory not found (game or plugin not running)"
+        except (OSError, TypeError) as e:
+            return str(e) # TypeError: named maps (tagname) only exist on Windows
+
+    def _close(self):
+        if self.mm is not None:
+            self.mm.close()
+        self.mm = None
+        self.last = None
+        self.frame_id = None
+
     def get_telemetry(self) -> TelemetryData:
-        if self.mm is None:
-            try:
-                self.mm = mmap.mmap(-1, 24000, self.map_name) # Open existing
-            except FileNotFoundError:
-                return TelemetryData(self.game_name, False)
-            except Exception:
-                return TelemetryData(self.game_name, False)
+        connection = self.connection
+        now = clock()
+        if not connection.connected:
+            if not connection.due(now):
+                return TelemetryData.disconnected(self.game_name)
+            error = self._connect() if self.mm is None else None
+            if error:
+                connection.missing(now, error)
+                return TelemetryData.disconnected(self.game_name)
 
         try:
-            self.mm.seek(0)
             # Struct layout varies by plugin version. 
             # Based on previous bridge.py: Speed @ 236?
             # Let's look for standard ones.
@@ -46,24 +107,42 @@ class RFactorProvider(GameProvider):
             # Let's stick strictly to what we know works (Speed @ 236) and try to find others near it?
             # Or just return 0 for others to prevent crashes.
             
-            self.mm.seek(236)
-            speed_bytes = self.mm.read(4)
-            speed_ms = struct.unpack('f', speed_bytes)[0]
-            
-            # TODO: Improve offset mapping for rFactor
+            values = self.reader.read(self.mm)
+            if values is None:
+                # Page unchanged since the last poll, or torn on every retry
+                if self.last is not None:
+                    connection.frame(now, new=False)
+                    return self.last
+                connection.missing(now, "no telemetry page yet")
+                return TelemetryData.disconnected(self.game_name)
+            connection.frame(now)
+            # No counter in the page: every page that differs from the previous one is a new frame
+            self.frame_id = self.reader.reads
+
+            field = {name: values[index] for name, index in self.positions.items()}
+            get = lambda name: field.get(name, LAYOUT_DEFAULTS[name])
             
-            return TelemetryData(
-                game_name=self.game_name,
+            self.last = self.frame.update(
                 connected=True,
-                speed_kmh=speed_ms * 3.6,
-                rpm=0,
-                max_rpm=10000,
-                gear=0,
-                throttle=0,
-                brake=0,
-                clutch=0
+                speed_kmh=get("speed_ms") * 3.6,
+                rpm=get("rpm"),
+                max_rpm=get("max_rpm"),
+                gear=int(get("gear")),
+                throttle=get("throttle"),
+                brake=get("brake"),
+                clutch=get("clutch"),
+                steering_angle=get("steering_angle")
             )
-        except Exception as e:
-            self.mm.close()
-            self.mm = None
-            return TelemetryData(self.game_name, False)
+            return self.last
+        except (OSError, ValueError, struct.error) as e:
+            self._close()
+            connection.lost(now, f"read error: {e}")
+            return TelemetryData.disconnected(self.game_name)
+
+    def snapshot(self):
+        if self.mm is None:
+            return None
+        return self.mm[:self.page_size]
+
+    def stats(self) -> dict:
+        return {**self.reader.stats(), "connection": self.connection.stats()}
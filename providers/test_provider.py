@@ -1,15 +1,37 @@
 import math
 import time
 from providers import GameProvider
-from core.telemetry import TelemetryData
+from core.telemetry import TelemetryData, BASE_CHANNELS
+from core.timing import clock
 
 class TestProvider(GameProvider):
-    def __init__(self):
+    channels = BASE_CHANNELS + (
+        "accel_long", "accel_lat", "accel_vert", "yaw_rate", "roll_rate", "roll",
+        "wheel_slip", "wheel_load", "suspension_travel", "tyre_temp",
+        "lap", "lap_time", "last_lap_time", "best_lap_time", "lap_distance_pct",
+    )
+
+    def __init__(self, rate=60):
         self.t = 0
         self.game_name = "TestProvider"
+        # Simulated game frame rate: polling faster returns the same frame
+        self.frame_interval = 1.0 / rate
+        self.next_frame = 0.0
+        self.frame = TelemetryData(self.game_name, True) # Updated in place every frame
+        self.last = None
+        self.lap = 0
+        self.lap_position = 0.0
+        self.lap_started = None
+        self.last_lap_time = 0.0
+        self.best_lap_time = 0.0
         print(f"Initialized {self.game_name} (Sine Wave Generators)")
 
     def get_telemetry(self) -> TelemetryData:
+        now = clock()
+        if self.last is not None and now < self.next_frame:
+            return self.last
+        self.next_frame = max(self.next_frame + self.frame_interval, now)
+
         # Speed sine wave (0 to 250 km/h)
         speed = ((math.sin(self.t * 0.1) + 1) / 2) * 250
         
@@ -20,9 +42,24 @@ class TestProvider(GameProvider):
         gear = int((speed / 250) * 6) + 1
         
         self.t += 0.5
+        self.frame_id = self.t
         
-        return TelemetryData(
-            game_name=self.game_name,
+        # Motion and per-wheel channels follow a slow left/right weave
+        weave = math.sin(self.t * 0.2)
+        lat = 1.5 * weave
+        loads = (3000 - 800 * weave, 3000 + 800 * weave, 3500 - 800 * weave, 3500 + 800 * weave)
+
+        # One lap every 200 samples
+        position = (self.t % 100) / 100
+        if position < self.lap_position:
+            self.lap += 1
+            self.last_lap_time = now - self.lap_started if self.lap_started else 0.0
+            if self.last_lap_time and (not self.best_lap_time or self.last_lap_time < self.best_lap_time):
+                self.best_lap_time = self.last_lap_time
+            self.lap_started = now
+        self.lap_position = position
+
+        self.last = self.frame.update(
             connected=True,
             speed_kmh=speed,
             rpm=rpm,
@@ -30,5 +67,21 @@ class TestProvider(GameProvider):
             gear=gear,
             throttle=(math.sin(self.t * 0.05) + 1) / 2,
             brake=0,
-            clutch=0
+            clutch=0,
+            accel_long=math.cos(self.t * 0.1) * 0.5,
+            accel_lat=lat,
+            accel_vert=1.0,
+            yaw_rate=0.4 * weave,
+            roll_rate=0.05 * math.cos(self.t * 0.2),
+            roll=0.02 * weave,
+            wheel_slip=(0.02 * weave, -0.02 * weave, 0.05 * weave, -0.05 * weave),
+            wheel_load=loads,
+            suspension_travel=tuple(load / 100000 for load in loads),
+            tyre_temp=(80 + 5 * weave, 80 - 5 * weave, 78 + 5 * weave, 78 - 5 * weave),
+            lap=self.lap,
+            lap_time=now - self.lap_started if self.lap_started else 0.0,
+            last_lap_time=self.last_lap_time,
+            best_lap_time=self.best_lap_time,
+            lap_distance_pct=position
         )
+        return self.last
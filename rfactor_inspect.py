@@ -1,66 +1,267 @@
-import mmap
-import struct
-import time
+"""
+Offset discovery for shared-memory pages.
+
+Loads a raw page capture (python data_logger.py record --game rfactor --raw),
+interprets the page at every byte offset as float32, int32, int8 and double
+in one vectorized pass, and ranks the candidates by how well they track a
+known signal, plus monotonicity, value range and change frequency.
+
+    # Which offsets follow the GPS speed logged by another device?
+    python rfactor_inspect.py capture.strec --reference gps.csv --ref-column speed_ms
+
+    # What moves together with the speed we already trust at 236?
+    python rfactor_inspect.py capture.strec --ref-channel 236:f
+
+    # Store a verified offset in a layout file for: main.py --game rfactor --layout rfactor_layout.json
+    python rfactor_inspect.py capture.strec --pick rpm=20:f --out rfactor_layout.json
+
+Needs numpy (pip install numpy).
+"""
+import argparse
+import csv
 import os
+import sys
+
+import numpy as np
+
+from core.layout import Layout
+from core.recorder import SessionReader
+
+# struct code -> numpy little-endian dtype
+TYPES = {"f": "<f4", "i": "<i4", "b": "i1", "d": "<f8"}
+
+# Float64 working set per scoring block
+BLOCK_BYTES = 256 * 1024 * 1024
+
+# Values outside this magnitude are almost always bytes of another field read
+# with the wrong type or alignment (huge numbers, float denormals)
+MAX_MAGNITUDE = 1e9
+MIN_MAGNITUDE = 1e-20
+
+
+def load_capture(path, max_frames=None):
+    """Returns (times, pages) with pages as a (frames, page_size) uint8 array"""
+    reader = SessionReader(path)
+    if reader.kind != "raw":
+        raise SystemExit(f"{path} is not a raw page capture (record with --raw)")
+
+    times, pages = [], []
+    for chunk in range(len(reader.index)):
+        columns = reader.columns_of(chunk)
+        times.append(np.frombuffer(columns["t"], dtype="<f8").copy())
+        pages.append(np.frombuffer(columns["page"], dtype=np.uint8).reshape(-1, reader.page_size).copy())
+        del columns
+    metadata = reader.metadata
+    reader.close()
+
+    times = np.concatenate(times)
+    pages = np.concatenate(pages)
+    if max_frames and len(times) > max_frames:
+        keep = np.linspace(0, len(times) - 1, max_frames).astype(np.int64)
+        times, pages = times[keep], pages[keep]
+    return times, pages, metadata
+
+
+def interpret(pages, code):
+    """
+    Reads every page as `code` at every byte offset.
+    Returns a (frames, page_size - itemsize + 1) array; column i is offset i.
+    """
+    dtype = np.dtype(TYPES[code])
+    size = dtype.itemsize
+    frames, page_size = pages.shape
+    out = np.empty((frames, page_size - size + 1), dtype=dtype)
+    for align in range(size):
+        count = (page_size - align) // size
+        block = np.ascontiguousarray(pages[:, align:align + count * size]).view(dtype)
+        out[:, align::size] = block
+    return out
+
+
+def score(values, reference=None):
+    """Per-column statistics for a (frames, offsets) block, all vectorized"""
+    with np.errstate(all="ignore"):
+        x = values.astype(np.float64)
+        valid = np.isfinite(x).all(axis=0)
+        x[:, ~valid] = 0.0
+        peak = np.abs(x).max(axis=0)
+        valid &= (peak < MAX_MAGNITUDE) & (peak > MIN_MAGNITUDE)
+        x[:, ~valid] = 0.0
+
+        diff = np.diff(x, axis=0)
+        changes = diff != 0
+        change_freq = changes.mean(axis=0)
+        steps = np.sign(diff).sum(axis=0)
+        monotonic = np.abs(steps) / np.maximum(changes.sum(axis=0), 1)
+
+        xc = x - x.mean(axis=0)
+        var_x = (xc * xc).sum(axis=0)
+        # Lag-1 autocorrelation: real channels evolve smoothly, misread bytes jump around
+        smooth = (xc[1:] * xc[:-1]).sum(axis=0) / var_x
+        smooth[var_x == 0] = 0.0
+
+        stats = {
+            "valid": valid,
+            "min": x.min(axis=0),
+            "max": x.max(axis=0),
+            "change_freq": change_freq,
+            "monotonic": monotonic,
+            "smooth": np.nan_to_num(smooth),
+        }
+
+        if reference is not None:
+            rc = reference - reference.mean()
+            cov = rc @ xc
+            corr = cov / np.sqrt(var_x * (rc @ rc))
+            # Least-squares scale so that reference ~= slope * value (e.g. 3.6 for m/s vs km/h)
+            slope = cov / var_x
+            corr[~valid | (var_x == 0)] = 0.0
+            slope[~valid | (var_x == 0)] = 0.0
+            stats["corr"] = np.nan_to_num(corr)
+            stats["slope"] = np.nan_to_num(slope)
+    return stats
+
+
+def analyze(pages, codes, reference=None, value_range=None):
+    """Scores every offset for every type. Returns a list of candidate dicts."""
+    frames = len(pages)
+    block = max(1, BLOCK_BYTES // (frames * 8))
+    candidates = []
+    for code in codes:
+        values = interpret(pages, code)
+        for start in range(0, values.shape[1], block):
+            stats = score(values[:, start:start + block], reference)
+            keep = stats["valid"] & (stats["change_freq"] > 0)
+            if value_range is not None:
+                keep &= (stats["min"] >= value_range[0]) & (stats["max"] <= value_range[1])
+            for i in np.nonzero(keep)[0]:
+                candidate = {"offset": start + int(i), "type": code}
+                for key, column in stats.items():
+                    if key != "valid":
+                        candidate[key] = float(column[i])
+                candidates.append(candidate)
+    return candidates
+
+
+def rank(candidates, reference):
+    if reference is not None:
+        key = lambda c: abs(c["corr"])
+    else:
+        # Without a reference: channels that move often and smoothly come first
+        key = lambda c: c["change_freq"] * max(c["smooth"], 0.0)
+    return sorted(candidates, key=key, reverse=True)
+
+
+def load_reference(args, times, metadata):
+    """Reference signal resampled onto the capture timestamps, or None"""
+    if args.ref_channel:
+        offset, code = parse_field(args.ref_channel)
+        return None, (offset, code)
+
+    if not args.reference:
+        return None, None
+
+    if args.reference.endswith(".strec"):
+        ref = SessionReader(args.reference)
+        if args.ref_column not in [name for name, _ in ref.columns]:
+            raise SystemExit(f"{args.reference} has no column '{args.ref_column}'")
+        ref_times, ref_values = [], []
+        for chunk in range(len(ref.index)):
+            columns = ref.columns_of(chunk)
+            ref_times.append(np.asarray(columns["t"], dtype=np.float64))
+            ref_values.append(np.asarray(columns[args.ref_column], dtype=np.float64))
+            del columns
+        # Both recordings carry their wall-clock start time
+        shift = ref.metadata["started_at"] - metadata["started_at"]
+        ref.close()
+        ref_times = np.concatenate(ref_times) + shift
+        ref_values = np.concatenate(ref_values)
+    else:
+        with open(args.reference, newline="") as f:
+            rows = list(csv.DictReader(f))
+        ref_times = np.asarray([float(r[args.ref_time_column]) for r in rows])
+        ref_values = [float(r[args.ref_column]) for r in rows]
+        if ref_times.min() > 1e9:
+            # Unix timestamps: align on the capture's wall-clock start
+            ref_times = ref_times - metadata["started_at"]
+
+    ref_times = ref_times + args.ref_shift
+    return np.interp(times, ref_times, np.asarray(ref_values, dtype=np.float64)), None
+
+
+def parse_field(text):
+    offset, _, code = text.partition(":")
+    code = code or "f"
+    if code not in TYPES:
+        raise SystemExit(f"Unknown type '{code}' (expected one of {', '.join(TYPES)})")
+    return int(offset), code
+
+
+def write_layout(path, picks, page_size):
+    """Adds/replaces fields in a layout file the rFactor provider can load"""
+    fields = {}
+    size = page_size
+    if os.path.exists(path):
+        existing = Layout.load(path)
+        size = max(size, existing.size)
+        fields = {name: (name, offset, code, count) for name, offset, code, count in existing.fields}
+    for name, (offset, code) in picks.items():
+        fields[name] = (name, offset, code, 1)
+    Layout(list(fields.values()), size=size).save(path)
+    print(f"Wrote {len(fields)} fields to {path}")
+
 
 def main():
-    map_name = "$rFactorShared$"
-    # Try different map names if this fails? 
-    # rF1 MapPlugin usually uses $rFactorShared$
-    
-    print(f"Attempting to open Shared Memory: {map_name}")
-    print("Please make sure rFactor is running and in a race/practice session.")
-    print("Also ensure you have the 'MapPlugin' or 'rFactorSharedMemoryMap' plugin installed.")
-    
-    try:
-        # Open mmap
-        # Size approx 24KB is common for these plugins
-        try:
-            mm = mmap.mmap(-1, 1024, "$rFactorShared$")
-            print(f"Connected to $rFactorShared$")
-        except FileNotFoundError:
-            print("Could not find $rFactorShared$, trying rFactor 2 name...")
-            map_name = "$rFactor2Shared$"
-            mm = mmap.mmap(-1, 1024, map_name)
-            print(f"Connected to {map_name}!") 
-        except FileNotFoundError:
-            print(f"Could not find {map_name}, trying Iron Wolf Telemetry...")
-            map_name = "$rFactor2SMMP_Telemetry$"
-            mm = mmap.mmap(-1, 1024, map_name)
-            print(f"Connected to {map_name}!") 
-        
-        print("Connected! Reading first 64 floats...")
-        print("Drive the car to see which values change and look like Speed (m/s).")
-        
-        while True:
-            mm.seek(0)
-            data = mm.read(256) # Read first 256 bytes (64 floats)
-            
-            floats = []
-            for i in range(0, len(data), 4):
-                val = struct.unpack('f', data[i:i+4])[0]
-                floats.append(val)
-                
-            # Clear screen (hacky)
-            # print("\033[H\033[J", end="") 
-            print("-" * 50)
-            for i, val in enumerate(floats):
-                print(f"Offset {i*4}: {val:.3f}", end="\t")
-                if (i+1) % 4 == 0:
-                    print()
-            
-            # Heuristic for speed:
-            # Usually offset 20 or similar.
-            # Convert m/s to km/h (~ * 3.6)
-            
-            time.sleep(0.5)
-            
-    except FileNotFoundError:
-        print(f"Could not find Shared Memory: {map_name}")
-        print("1. Is rFactor running?")
-        print("2. Is the Shared Memory Plugin installed?")
-    except Exception as e:
-        print(f"Error: {e}")
+    parser = argparse.ArgumentParser(description="Rank shared-memory offsets in a raw page capture")
+    parser.add_argument("capture", help="Raw page recording (.strec)")
+    parser.add_argument("--types", default="fibd", help="Types to try: f=float32 i=int32 b=int8 d=double")
+    parser.add_argument("--reference", help="Known signal: CSV file or normalized .strec recording")
+    parser.add_argument("--ref-column", default="speed_kmh", help="Column of the reference signal")
+    parser.add_argument("--ref-time-column", default="t", help="Time column in a CSV reference (s or unix time)")
+    parser.add_argument("--ref-shift", type=float, default=0.0, help="Seconds to shift the reference by")
+    parser.add_argument("--ref-channel", help="Use a known offset of the capture as reference, e.g. 236:f")
+    parser.add_argument("--range", nargs=2, type=float, metavar=("MIN", "MAX"), help="Plausible value range")
+    parser.add_argument("--top", type=int, default=25, help="Number of candidates to print")
+    parser.add_argument("--max-frames", type=int, default=20000, help="Subsample longer captures")
+    parser.add_argument("--pick", action="append", default=[], metavar="NAME=OFFSET:TYPE",
+                        help="Field to store in --out, e.g. speed_ms=236:f (repeatable)")
+    parser.add_argument("--out", help="Layout file to write (merged with an existing one)")
+    args = parser.parse_args()
+
+    times, pages, metadata = load_capture(args.capture, args.max_frames)
+    print(f"{args.capture}: {len(times)} frames of {pages.shape[1]} bytes "
+          f"({metadata.get('game_name') or 'unknown game'}, {times[-1] - times[0]:.1f}s)")
+
+    reference, channel = load_reference(args, times, metadata)
+    if channel is not None:
+        offset, code = channel
+        reference = interpret(pages[:, offset:offset + np.dtype(TYPES[code]).itemsize], code)[:, 0].astype(np.float64)
+
+    candidates = rank(analyze(pages, args.types, reference, args.range), reference)
+
+    header = f"{'offset':>7} {'type':>4} {'min':>12} {'max':>12} {'changes':>8} {'monotonic':>9} {'smooth':>6}"
+    if reference is not None:
+        header += f" {'corr':>7} {'scale':>9}"
+    print(header)
+    for c in candidates[:args.top]:
+        line = (f"{c['offset']:>7} {c['type']:>4} {c['min']:>12.4g} {c['max']:>12.4g} "
+                f"{c['change_freq']:>8.2%} {c['monotonic']:>9.2f} {c['smooth']:>6.2f}")
+        if reference is not None:
+            line += f" {c['corr']:>7.3f} {c['slope']:>9.4g}"
+        print(line)
+
+    if args.out:
+        picks = {}
+        for pick in args.pick:
+            name, _, field = pick.partition("=")
+            if not field:
+                raise SystemExit(f"--pick expects NAME=OFFSET:TYPE, got '{pick}'")
+            picks[name] = parse_field(field)
+        if not picks:
+            print("Nothing to write: choose fields with --pick NAME=OFFSET:TYPE")
+            sys.exit(1)
+        write_layout(args.out, picks, pages.shape[1])
+
 
 if __name__ == "__main__":
     main()